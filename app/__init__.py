@@ -4,7 +4,6 @@ from flask import Flask
 from config import Config
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from apscheduler.schedulers.background import BackgroundScheduler
 
 # 1. Initialize extensions at the global level
 db = SQLAlchemy()
@@ -17,21 +16,45 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
-    # 3. Initialize the extensions with the app instance
+    # 3. Initialize the extensions with the app instance (engine options and pragmas: app/database.py)
+    from .database import configure_database, init_database
+    configure_database(app)
     db.init_app(app)
+    init_database(app)
     migrate.init_app(app, db)
 
+    # Structured logs, request timing and SQL profiling (served at /metrics)
+    from .instrumentation import init_instrumentation
+    init_instrumentation(app)
+
+    # Shared Gemini/Serper clients, created once per process
+    from .clients import init_clients
+    init_clients(app)
+
+    # Mail backend for the notification outbox (SendGrid, console or in-memory)
+    from .mail import init_mail
+    init_mail(app)
+
     # 4. Import and register blueprints inside the factory
     # This is crucial to prevent circular imports with routes.
     from .routes import bp as main_bp
     app.register_blueprint(main_bp)
 
-    # 5. Setup the background scheduler
-    from .scheduler import check_expiring_products
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(id='expiry_check_job', func=check_expiring_products, args=[app], trigger="interval", hours=24)
-    if not scheduler.running:
-        scheduler.start()
+    from .commands import register_commands
+    register_commands(app)
+
+    # Node id for RFID tags allocated in this process
+    from . import tags
+    tags.configure(app.config['RFID_HOST_ID'])
+
+    # Analytics data is loaded lazily on the first question, not at startup.
+    from .data_handler import data_store
+    data_store.configure(app.config['DATA_DIR'], app.config['DATA_CHECK_INTERVAL'])
+
+    # 5. Setup the background scheduler (at most one process runs it, see SCHEDULER_MODE)
+    if app.config['SCHEDULER_MODE'] != 'off':
+        from .scheduler import init_scheduler
+        init_scheduler(app)
 
     return app
 
@@ -0,0 +1,34 @@
+# app/archive.py
+# Moves sold items out of inventory_item into inventory_item_archive, so the hot table (and its
+# indexes) hold the stock on hand plus recent sales instead of every unit ever sold. Run by
+# `flask archive-sold`. Unsold stock and the stock ledger are untouched.
+
+from datetime import datetime
+from . import db
+from .models import InventoryItem, InventoryItemArchive
+
+_COLUMNS = ['id', 'unique_rfid_tag', 'price', 'stock_in_date', 'expiry_date', 'location', 'sold_date', 'product_type_id']
+
+
+def archive_sold_items(sold_before, batch_size):
+    """Moves items sold before `sold_before` in batches of `batch_size`, one transaction per batch
+    (copy, then delete the same id range). Returns how many were moved."""
+    items, archive = InventoryItem.__table__, InventoryItemArchive.__table__
+    moved = 0
+    while True:
+        ids = db.session.execute(
+            db.select(items.c.id).where(items.c.is_sold == True, items.c.sold_date < sold_before)
+            .order_by(items.c.id).limit(batch_size)
+        ).scalars().all()
+        if not ids: return moved
+        in_batch = db.and_(items.c.is_sold == True, items.c.sold_date < sold_before, items.c.id.between(ids[0], ids[-1]))
+        try:
+            db.session.execute(archive.insert().from_select(
+                _COLUMNS + ['archived_at'],
+                db.select(*(items.c[column] for column in _COLUMNS), db.literal(datetime.utcnow(), db.DateTime)).where(in_batch)))
+            deleted = db.session.execute(items.delete().where(in_batch))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        moved += deleted.rowcount
@@ -0,0 +1,226 @@
+# app/carbon.py
+# Carbon-footprint lookups, cached in memory (LRU + TTL) and persisted in the carbon_factor table,
+# so the dashboard and the daily expiry alert only ask Gemini about a product once per TTL.
+
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from flask import current_app
+from . import db
+from .cache import TTLCache
+from .clients import get_clients
+from .models import CarbonFactor, ProductType
+
+log = logging.getLogger(__name__)
+
+_MISSING = object()
+_memory_cache = None
+_stats = {'memory_hits': 0, 'db_hits': 0, 'misses': 0, 'model_calls': 0, 'negative_hits': 0, 'failed_lookups': 0,
+          'last_batch_size': 0, 'last_batch_seconds': 0.0}
+_stats_lock = threading.Lock()  # the lookup threads of resolve_carbon_factors count model calls too
+
+
+def _count(stat, n=1):
+    with _stats_lock:
+        _stats[stat] += n
+
+
+def normalize_product_name(product_name):
+    return ' '.join(product_name.split()).lower()[:100]
+
+
+def _get_memory_cache():
+    global _memory_cache
+    if _memory_cache is None:
+        _memory_cache = TTLCache(maxsize=current_app.config['CARBON_CACHE_SIZE'],
+                                 ttl=current_app.config['CARBON_CACHE_TTL_HOURS'] * 3600)
+    return _memory_cache
+
+
+def _ttl_for(kg_co2e):
+    hours = current_app.config['CARBON_CACHE_TTL_HOURS'] if kg_co2e is not None else current_app.config['CARBON_NEGATIVE_TTL_HOURS']
+    return timedelta(hours=hours)
+
+
+def _gemini_model():
+    model = get_clients().gemini
+    if model is None: raise RuntimeError("Gemini API key is not configured.")
+    return model
+
+
+def _ask_model(model, product_name, timeout=None):
+    prompt = f"What is the estimated average carbon footprint (in kg of CO2 equivalent) for one unit of '{product_name}'? Provide only the number."
+    _count('model_calls')
+    if timeout is None:
+        response = model.generate_content(prompt)
+    else:
+        response = model.generate_content(prompt, request_options={'timeout': timeout})
+    match = re.search(r'(\d+\.?\d*)', response.text)
+    return float(match.group(1)) if match else None
+
+
+def fetch_carbon_footprint_from_gemini(product_name):
+    """Asks Gemini directly (no caching). Returns the parsed number, or None if the answer had none.
+    Raises if the API key is missing or the call itself fails, so callers can tell an outage from
+    an unknown product."""
+    return _ask_model(_gemini_model(), product_name)
+
+
+def _ask_with_retry(model, product_name, timeout, retries, backoff):
+    for attempt in range(retries + 1):
+        try:
+            return _ask_model(model, product_name, timeout=timeout)
+        except Exception:
+            if attempt == retries: raise
+            time.sleep(backoff * (2 ** attempt))
+
+
+def _remember(key, kg_co2e, commit=True, rows=None):
+    """Stores a fetched factor in the table and the memory cache. `rows` are the CarbonFactor rows
+    already loaded by _cached_factors, so a batch doesn't look each key up again."""
+    row = rows.get(key) if rows is not None else db.session.get(CarbonFactor, key)
+    if row is None:
+        row = CarbonFactor(name_key=key)
+        db.session.add(row)
+    row.kg_co2e = kg_co2e
+    row.fetched_at = datetime.utcnow()
+    if commit: db.session.commit()
+    _get_memory_cache().set(key, kg_co2e, ttl=_ttl_for(kg_co2e).total_seconds())
+
+
+def _cached_factors(keys, refresh=False):
+    """Looks normalized keys up in the memory cache, then the misses in the carbon_factor table with
+    one query. Returns ({key: value} for the fresh entries, values possibly None for negative ones,
+    {key: CarbonFactor} for every row loaded, fresh or expired). With `refresh` nothing counts as
+    fresh, but the rows are still loaded for _remember."""
+    cache = _get_memory_cache()
+    found, misses = {}, []
+    for key in dict.fromkeys(keys):
+        value = _MISSING if refresh else cache.get(key, _MISSING)
+        if value is _MISSING:
+            misses.append(key)
+            continue
+        _count('memory_hits')
+        if value is None: _count('negative_hits')
+        found[key] = value
+    rows = {row.name_key: row for row in CarbonFactor.query.filter(CarbonFactor.name_key.in_(misses))} if misses else {}
+    now = datetime.utcnow()
+    for key, row in rows.items():
+        remaining = _ttl_for(row.kg_co2e) - (now - row.fetched_at)
+        if not refresh and remaining.total_seconds() > 0:
+            _count('db_hits')
+            if row.kg_co2e is None: _count('negative_hits')
+            cache.set(key, row.kg_co2e, ttl=remaining.total_seconds())
+            found[key] = row.kg_co2e
+    return found, rows
+
+
+def _model_unavailable(keys, error):
+    # Without a model nothing can be fetched until a restart with one, so remember the misses as
+    # unknown in memory only, instead of querying the table for them on every dashboard render.
+    log.warning("Carbon lookup unavailable", extra={'error': str(error), 'products': len(keys)})
+    ttl = _ttl_for(None).total_seconds()
+    for key in keys: _get_memory_cache().set(key, None, ttl=ttl)
+
+
+def _lookup_failed(keys):
+    # An outage or timeout: remember the products as unknown in memory for CARBON_FAILURE_TTL_SECONDS,
+    # so the next dashboard or alert run doesn't wait out the timeouts and retries again. Nothing is
+    # written to the table, so the lookup is retried once the entry expires.
+    _count('failed_lookups', len(keys))
+    ttl = current_app.config['CARBON_FAILURE_TTL_SECONDS']
+    if ttl:
+        for key in keys: _get_memory_cache().set(key, None, ttl=ttl)
+
+
+def get_carbon_factor(product_name, refresh=False):
+    """Returns kg CO2e per unit for a product, or None if unknown. Checks the in-process LRU,
+    then the carbon_factor table, and only calls Gemini on a miss or an expired entry."""
+    key = normalize_product_name(product_name)
+    found, rows = _cached_factors([key], refresh)
+    if key in found: return found[key]
+    _count('misses')
+    try:
+        model = _gemini_model()
+    except Exception as e:
+        _model_unavailable([key], e)
+        return None
+    try:
+        kg_co2e = _ask_model(model, product_name)
+    except Exception as e:
+        log.warning("Carbon lookup failed", extra={'product': product_name, 'error': str(e)})
+        _lookup_failed([key])
+        return None
+    try:
+        _remember(key, kg_co2e, rows=rows)
+    except Exception as e:
+        db.session.rollback()
+        log.warning("Could not persist carbon factor", extra={'product': product_name, 'error': str(e)})
+    return kg_co2e
+
+
+def resolve_carbon_factors(product_names, model=None, refresh=False):
+    """Resolves many carbon factors at once. Cache hits are answered immediately; the misses are
+    sent to the model in parallel (bounded by CARBON_LOOKUP_CONCURRENCY), each call with a timeout
+    and retry/backoff, and persisted in one commit. `model` can be any object with a Gemini-style
+    generate_content(prompt, **kwargs) method. Returns {product_name: kg_co2e or None}."""
+    config = current_app.config
+    started = time.perf_counter()
+    results, pending = {}, {}
+    keys = {name: normalize_product_name(name) for name in product_names}
+    found, rows = _cached_factors(keys.values(), refresh)
+    for name, key in keys.items():
+        if key in found: results[name] = found[key]
+        else: pending.setdefault(key, name)
+    if pending:
+        _count('misses', len(pending))
+        fetched = {}
+        try:
+            model = model or _gemini_model()
+        except Exception as e:
+            _model_unavailable(pending, e)
+        else:
+            with ThreadPoolExecutor(max_workers=config['CARBON_LOOKUP_CONCURRENCY']) as pool:
+                futures = {pool.submit(_ask_with_retry, model, name, config['CARBON_LOOKUP_TIMEOUT'],
+                                       config['CARBON_LOOKUP_RETRIES'], config['CARBON_LOOKUP_BACKOFF']): key
+                           for key, name in pending.items()}
+                for future in as_completed(futures):
+                    key = futures[future]
+                    try:
+                        fetched[key] = future.result()
+                    except Exception as e:
+                        log.warning("Carbon lookup failed", extra={'product': pending[key], 'error': str(e)})
+            failed = [key for key in pending if key not in fetched]
+            if failed: _lookup_failed(failed)
+            try:
+                for key, kg_co2e in fetched.items(): _remember(key, kg_co2e, commit=False, rows=rows)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                log.warning("Could not persist carbon factors", extra={'products': len(fetched), 'error': str(e)})
+        for name in product_names:
+            if name not in results: results[name] = fetched.get(keys[name])
+    elapsed = time.perf_counter() - started
+    with _stats_lock:
+        _stats['last_batch_size'] = len(pending)
+        _stats['last_batch_seconds'] = round(elapsed, 3)
+    if pending:
+        log.info("Resolved carbon factors", extra={'products': len(results), 'from_model': len(fetched),
+                                                   'duration_ms': round(elapsed * 1000, 1)})
+    return results
+
+
+def prewarm_carbon_cache(refresh=False):
+    """Looks up (and caches) the carbon factor for every ProductType. Returns {name: kg_co2e}."""
+    names = [name for (name,) in db.session.query(ProductType.name).order_by(ProductType.name)]
+    return resolve_carbon_factors(names, refresh=refresh)
+
+
+def carbon_cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['memory_size'] = len(_memory_cache) if _memory_cache is not None else 0
+    return stats
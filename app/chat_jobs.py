@@ -0,0 +1,129 @@
+# app/chat_jobs.py
+# Background chatbot answers. /api/chatbot submits a job and returns at once; a small per-process
+# thread pool runs the ReAct loop, and the browser polls /api/chatbot/<job_id>. Jobs live in the
+# chat_job table, so any gunicorn worker can answer a poll and a recent answer for the same question
+# and inventory is reused by every worker. Identical questions are coalesced onto a job only while
+# this process is running it, so a job orphaned by a dead worker never absorbs new questions.
+# stream_answer() is the streaming alternative: it runs the loop in the request and yields text.
+
+import hashlib
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from . import db
+from .cache import TTLCache
+from .chatbot import AgentError, context_version, process_query_with_gemini, stream_query_with_gemini
+from .models import ChatJob
+
+PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+
+_executor = None
+_answer_cache = None
+_submit_lock = threading.Lock()
+_in_flight = {}  # question_key -> id of the job this process is running for it
+_last_purge = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=current_app.config['CHAT_WORKERS'], thread_name_prefix='chat')
+    return _executor
+
+
+def _get_answer_cache():
+    global _answer_cache
+    if _answer_cache is None:
+        _answer_cache = TTLCache(maxsize=256, ttl=current_app.config['CHAT_ANSWER_TTL'])
+    return _answer_cache
+
+
+def question_key(question, version):
+    normalized = ' '.join(question.lower().split())
+    return hashlib.sha256(f"{version}|{normalized}".encode()).hexdigest()
+
+
+def _run_job(app, job_id, question, version):
+    with app.app_context():
+        job = db.session.get(ChatJob, job_id)
+        job.status = RUNNING
+        db.session.commit()
+        try:
+            job.answer = process_query_with_gemini(question, version)
+            job.status = DONE
+        except AgentError as e:
+            job.answer, job.status = str(e), FAILED
+        except Exception as e:
+            job.answer, job.status = f"An error occurred in the AI agent loop: {e}", FAILED
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        # Failures are neither cached nor reused: the next identical question tries again.
+        if job.status == DONE: _get_answer_cache().set(job.question_key, job.answer)
+        with _submit_lock:
+            if _in_flight.get(job.question_key) == job_id: del _in_flight[job.question_key]
+
+
+def submit_question(question):
+    """Returns a finished job's answer straight away when one is cached, otherwise the job to poll.
+    Result: (job, answer_or_None)."""
+    version = context_version()
+    key = question_key(question, version)
+    answer = _get_answer_cache().get(key)
+    if answer is not None: return None, answer
+    # The lock coalesces simultaneous submits within this worker; the table covers the other workers.
+    with _submit_lock:
+        return _find_or_create_job(key, question, version)
+
+
+def _find_or_create_job(key, question, version):
+    config = current_app.config
+    now = datetime.utcnow()
+    if key in _in_flight:
+        running = db.session.get(ChatJob, _in_flight[key])
+        if running is not None and running.status in (PENDING, RUNNING): return running, None
+    recent = ChatJob.query.filter(ChatJob.question_key == key, ChatJob.status == DONE,
+                                  ChatJob.finished_at >= now - timedelta(seconds=config['CHAT_ANSWER_TTL'])
+                                  ).order_by(ChatJob.finished_at.desc()).first()
+    if recent is not None:
+        _get_answer_cache().set(key, recent.answer)
+        return recent, recent.answer
+    global _last_purge
+    if _last_purge is None or now - _last_purge >= timedelta(minutes=5):  # not on every submit: it holds the write lock
+        ChatJob.query.filter(ChatJob.created_at < now - timedelta(hours=config['CHAT_JOB_RETENTION_HOURS'])).delete(synchronize_session=False)
+        _last_purge = now
+    job = ChatJob(id=uuid.uuid4().hex, question_key=key, question=question, status=PENDING, created_at=now)
+    db.session.add(job)
+    db.session.commit()
+    _in_flight[key] = job.id
+    _get_executor().submit(_run_job, current_app._get_current_object(), job.id, question, version)
+    return job, None
+
+
+def stream_answer(question):
+    """Yields the answer to `question` in pieces as the model writes it (or all at once when cached).
+    The complete answer is cached like a finished job's; AgentError propagates and nothing is cached."""
+    version = context_version()
+    key = question_key(question, version)
+    answer = _get_answer_cache().get(key)
+    if answer is not None:
+        yield answer
+        return
+    pieces = []
+    for piece in stream_query_with_gemini(question, version):
+        pieces.append(piece)
+        yield piece
+    answer = ''.join(pieces)
+    if answer: _get_answer_cache().set(key, answer)
+
+
+def get_job(job_id):
+    """The job, marked failed first if it has been pending or running longer than CHAT_JOB_TIMEOUT
+    (its worker died or restarted)."""
+    job = db.session.get(ChatJob, job_id)
+    if job is not None and job.status in (PENDING, RUNNING) and \
+            job.created_at < datetime.utcnow() - timedelta(seconds=current_app.config['CHAT_JOB_TIMEOUT']):
+        job.status, job.answer, job.finished_at = FAILED, "The answer took too long; please ask again.", datetime.utcnow()
+        db.session.commit()
+    return job
@@ -1,68 +1,159 @@
 # app/chatbot.py (Final Corrected Version)
 
-import google.generativeai as genai
+import logging
 from flask import current_app
-from .models import InventoryItem, ProductType
-from . import db
-from datetime import date
+from . import queries, search_tool
 import pandas as pd
-import requests
-import json
 from .data_handler import get_sales_insights_from_cache, get_customer_insights_from_cache
+from .cache import TTLCache
+from .clients import get_clients
+from .inventory_version import current_inventory_version
 
-# --- Tool 1: Web Search Function (remains the same) ---
+log = logging.getLogger(__name__)
+
+# --- Tool 1: Web Search Function (cached, trimmed observations from search_tool.py) ---
 def search_the_web(query):
-    # ... (code is unchanged)
-    serper_api_key = current_app.config['SERPER_API_KEY']
-    if not serper_api_key: return "Error: Serper API key not configured."
-    url = "https://google.serper.dev/search"
-    payload = json.dumps({"q": query})
-    headers = {'X-API-KEY': serper_api_key, 'Content-Type': 'application/json'}
-    try:
-        response = requests.request("POST", url, headers=headers, data=payload)
-        return response.text
-    except Exception as e: return f"An error occurred during web search: {e}"
+    return search_tool.search(query)
 
-# --- The Main AI Agent Logic (UPDATED) ---
-def process_query_with_gemini(question):
-    api_key = current_app.config['GEMINI_API_KEY']
-    if not api_key: return "Error: Gemini API key is not configured."
-    genai.configure(api_key=api_key)
-    
-    # THE FIX IS HERE: Use the universal 'gemini-pro' model
-    model = genai.GenerativeModel('gemini-pro')
-
-    # --- Data Fetching (remains the same) ---
-    try:
-        unsold_items = db.session.query(ProductType.name, InventoryItem.expiry_date).join(ProductType).filter(InventoryItem.is_sold == False).all()
-        if not unsold_items: inventory_data_string = "The inventory is currently empty."
-        else:
-            df = pd.DataFrame(unsold_items, columns=['Product_Name', 'Expiry_Date'])
-            summary_df = df.groupby(['Product_Name', 'Expiry_Date']).size().reset_index(name='Quantity')
-            inventory_data_string = summary_df.to_string(index=False)
-    except Exception as e: return f"Error fetching data from the database: {e}"
+# --- Inventory context for the prompt ---
+_context_cache = TTLCache(maxsize=8, ttl=300)
+
+def context_version():
+    """The inventory version questions are answered against right now. That is the current one,
+    except while the tills are busy: the version changes with every sale, so the version of a
+    context up to CHATBOT_CONTEXT_MAX_AGE seconds old is used rather than rebuilding the context
+    for each question. Answers are keyed by this version (see chat_jobs.question_key), so an
+    answer from an older context is never cached under a newer version."""
+    version = current_inventory_version()
+    if _context_cache.get(version) is None:
+        latest = _context_cache.get('latest')
+        if latest is not None: return latest
+    return version
 
-    # --- The Final, Polished "Master" Prompt (remains the same) ---
+def build_inventory_context(version=None):
+    """Summarizes unsold stock for the prompt: the CHATBOT_CONTEXT_MAX_ROWS soonest-expiring
+    (product, expiry date) batches plus totals. Grouping happens in SQL, and the text is cached
+    per inventory version, so repeated questions cost one small query. Returns the context cached
+    for `version` (from context_version()) if there is one, else one for the current version."""
+    if version is not None:
+        cached = _context_cache.get(version)
+        if cached is not None: return cached
+    version = current_inventory_version()
+    cached = _context_cache.get(version)
+    if cached is not None: return cached
+    rows = queries.unsold_summary_query().all()
+    if not rows:
+        context = "The inventory is currently empty."
+    else:
+        max_rows = current_app.config['CHATBOT_CONTEXT_MAX_ROWS']
+        summary_df = pd.DataFrame(rows[:max_rows], columns=['Product_Name', 'Expiry_Date', 'Quantity'])
+        total_units = sum(quantity for _, _, quantity in rows)
+        total_products = len({name for name, _, _ in rows})
+        context = summary_df.to_string(index=False)
+        if len(rows) > max_rows:
+            context += f"\n(Showing the {max_rows} soonest-expiring of {len(rows)} batches.)"
+        context += f"\nTotals: {total_units} units in stock across {total_products} products."
+    _context_cache.set(version, context)
+    max_age = current_app.config['CHATBOT_CONTEXT_MAX_AGE']
+    if max_age: _context_cache.set('latest', version, ttl=max_age)
+    return context
+
+# --- The Final, Polished "Master" Prompt (remains the same) ---
+def _initial_prompt(question, inventory_data_string):
     initial_prompt = f"""
     ### YOUR PERSONA ###
     You are 'Green-Ops AI', a friendly, sharp, and helpful business assistant.
     # ... (rest of the prompt is unchanged)
     """
+    return initial_prompt
+
+# --- ReAct helpers shared by the blocking and streaming paths ---
+TOOL_MARKER = "<tool_code>"
+# How much of the first reply to hold back before deciding it isn't a tool call
+TOOL_DECISION_CHARS = 40
+
+def _parse_tool_call(text):
+    tool_call = text.strip()
+    query_start = tool_call.find('"') + 1
+    query_end = tool_call.rfind('"')
+    return tool_call[query_start:query_end]
+
+def _second_prompt(initial_prompt, search_query, search_result):
+    return f"{initial_prompt}\n\n<tool_code>search_the_web(\"{search_query}\")</tool_code>\n\n<observation>\n{search_result}\n</observation>\n\nNow, use the observation to provide a final, conversational answer."
+
+class AgentError(RuntimeError):
+    """The agent loop couldn't produce an answer; the message is meant for the user."""
+
+
+def _prepare(question, version):
+    """Returns (model, initial_prompt); raises AgentError when either is unavailable."""
+    # The model is configured once per process in create_app (see clients.py)
+    model = get_clients().gemini
+    if model is None: raise AgentError("Error: Gemini API key is not configured.")
+
+    # --- Data Fetching (grouped in SQL, cached per inventory version) ---
+    try:
+        inventory_data_string = build_inventory_context(version)
+    except Exception as e: raise AgentError(f"Error fetching data from the database: {e}") from e
+    return model, _initial_prompt(question, inventory_data_string)
+
+# --- The Main AI Agent Logic (UPDATED) ---
+def process_query_with_gemini(question, version=None):
+    """Returns the answer, or raises AgentError. `version` is the inventory version the question was
+    keyed under (see context_version)."""
+    model, initial_prompt = _prepare(question, version)
 
     # --- The ReAct Loop (remains the same) ---
     try:
         response = model.generate_content(initial_prompt)
-        if "<tool_code>" in response.text:
-            tool_call = response.text.strip()
-            query_start = tool_call.find('"') + 1
-            query_end = tool_call.rfind('"')
-            search_query = tool_call[query_start:query_end]
-            print(f"--- AI is searching the web for: '{search_query}' ---")
+        if TOOL_MARKER in response.text:
+            search_query = _parse_tool_call(response.text)
+            log.info("AI is searching the web", extra={'query': search_query})
             search_result = search_the_web(search_query)
-            second_prompt = f"{initial_prompt}\n\n<tool_code>search_the_web(\"{search_query}\")</tool_code>\n\n<observation>\n{search_result}\n</observation>\n\nNow, use the observation to provide a final, conversational answer."
-            final_response = model.generate_content(second_prompt)
+            final_response = model.generate_content(_second_prompt(initial_prompt, search_query, search_result))
             return final_response.text
         else:
             return response.text
     except Exception as e:
-        return f"An error occurred in the AI agent loop: {e}"
+        raise AgentError(f"An error occurred in the AI agent loop: {e}") from e
+
+def _stream_text(model, prompt):
+    try:
+        response = model.generate_content(prompt, stream=True)
+    except TypeError:  # a client without streaming support: one piece with the whole answer
+        yield model.generate_content(prompt).text
+        return
+    if not hasattr(response, '__iter__'):  # ...or one that ignores the flag and answers in full
+        yield response.text
+        return
+    for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:  # a chunk with no text part (e.g. only safety metadata)
+            continue
+        if text: yield text
+
+def stream_query_with_gemini(question, version=None):
+    """Same ReAct loop as process_query_with_gemini, but yields the answer as the model writes it.
+    The first few characters are held back until it is clear the reply isn't a tool call.
+    Raises AgentError (possibly after some text has been yielded)."""
+    model, initial_prompt = _prepare(question, version)
+    try:
+        first, forwarded = '', False
+        for piece in _stream_text(model, initial_prompt):
+            first += piece
+            if TOOL_MARKER in first: continue
+            if forwarded:
+                yield piece
+            elif len(first.lstrip()) >= TOOL_DECISION_CHARS:
+                forwarded = True
+                yield first
+        if TOOL_MARKER in first:
+            search_query = _parse_tool_call(first[first.index(TOOL_MARKER):])
+            log.info("AI is searching the web", extra={'query': search_query})
+            search_result = search_the_web(search_query)
+            yield from _stream_text(model, _second_prompt(initial_prompt, search_query, search_result))
+        elif not forwarded:
+            yield first
+    except Exception as e:
+        raise AgentError(f"An error occurred in the AI agent loop: {e}") from e
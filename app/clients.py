@@ -0,0 +1,98 @@
+# app/clients.py
+# Outbound clients (Gemini, Serper), created once per process in create_app and shared by every
+# request and background job. Each call is timed into app.metrics. With AI_BACKEND = 'stub' the
+# same interfaces are served by offline fakes, for tests and benchmarks.
+
+import json
+import re
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app
+from . import metrics
+
+SERPER_URL = "https://google.serper.dev/search"
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class GeminiClient:
+    """A configured GenerativeModel plus a default per-call timeout. Exposes generate_content()
+    with the model's signature, so it can be passed anywhere a model is expected."""
+
+    def __init__(self, api_key, model_name, timeout):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+        self.timeout = timeout
+
+    def generate_content(self, prompt, **kwargs):
+        """With stream=True the timing covers the wait for the first chunk only."""
+        kwargs.setdefault('request_options', {'timeout': self.timeout})
+        started = time.perf_counter()
+        try:
+            return self.model.generate_content(prompt, **kwargs)
+        finally:
+            metrics.observe('outbound_request_seconds', time.perf_counter() - started, service='gemini')
+
+
+class StubGeminiClient:
+    """Offline stand-in for GeminiClient: numbers for carbon prompts, a canned answer otherwise.
+    With stream=True the answer comes back word by word, like the real streaming response."""
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        started = time.perf_counter()
+        text = "0.5" if "carbon footprint" in prompt else "This is a stub answer from the offline model."
+        metrics.observe('outbound_request_seconds', time.perf_counter() - started, service='gemini')
+        if stream: return [_Response(word) for word in re.findall(r'\S+\s*', text)]
+        return _Response(text)
+
+
+class SerperClient:
+    """Google search through Serper over a pooled keep-alive session."""
+
+    def __init__(self, api_key, timeout, pool_size):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'X-API-KEY': api_key, 'Content-Type': 'application/json'})
+
+    def search(self, query):
+        """Returns the raw JSON text of the search response."""
+        started = time.perf_counter()
+        try:
+            response = self.session.post(SERPER_URL, data=json.dumps({"q": query}), timeout=self.timeout)
+            return response.text
+        finally:
+            metrics.observe('outbound_request_seconds', time.perf_counter() - started, service='serper')
+
+
+class StubSerperClient:
+    def search(self, query):
+        started = time.perf_counter()
+        text = json.dumps({'searchParameters': {'q': query}, 'organic': [
+            {'title': f'Stub result for {query}', 'link': 'https://example.com/stub', 'snippet': 'Offline search result.'}]})
+        metrics.observe('outbound_request_seconds', time.perf_counter() - started, service='serper')
+        return text
+
+
+class Clients:
+    def __init__(self, config):
+        stub = config['AI_BACKEND'] == 'stub'
+        self.gemini = StubGeminiClient() if stub else (
+            GeminiClient(config['GEMINI_API_KEY'], config['GEMINI_MODEL'], config['GEMINI_TIMEOUT']) if config['GEMINI_API_KEY'] else None)
+        self.serper = StubSerperClient() if stub else (
+            SerperClient(config['SERPER_API_KEY'], config['SERPER_TIMEOUT'], config['HTTP_POOL_SIZE']) if config['SERPER_API_KEY'] else None)
+
+
+def init_clients(app):
+    app.extensions['clients'] = Clients(app.config)
+
+
+def get_clients():
+    return current_app.extensions['clients']
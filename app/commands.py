@@ -0,0 +1,96 @@
+# app/commands.py
+# Maintenance commands, available as `flask <command>` once the app is created.
+
+from datetime import date, datetime, timedelta
+import click
+
+
+def register_commands(app):
+
+    @app.cli.command('prewarm-carbon')
+    @click.option('--refresh', is_flag=True, help='Ask Gemini again even for entries that are still fresh.')
+    def prewarm_carbon(refresh):
+        """Fill the carbon-footprint cache for every product type."""
+        from .carbon import prewarm_carbon_cache, carbon_cache_stats
+        factors = prewarm_carbon_cache(refresh=refresh)
+        for name, kg_co2e in factors.items():
+            click.echo(f"{name}: {kg_co2e if kg_co2e is not None else 'unknown'}")
+        click.echo(f"Cache stats: {carbon_cache_stats()}")
+
+    @app.cli.command('web-search')
+    @click.argument('query')
+    def web_search(query):
+        """Run the chatbot's search tool and print the observation the model would see."""
+        from .search_tool import search, search_cache_stats
+        click.echo(search(query))
+        click.echo(f"Search stats: {search_cache_stats()}")
+
+    @app.cli.command('drain-outbox')
+    def drain_outbox_command():
+        """Send the due emails in the notification outbox now."""
+        from .notifications import drain_outbox, outbox_stats
+        click.echo(f"Drained: {drain_outbox()}")
+        click.echo(f"Outbox: {outbox_stats()}")
+
+    @app.cli.command('check-ledger')
+    @click.option('--rebuild', is_flag=True, help='Recompute the ledger from inventory_item when it has drifted.')
+    def check_ledger_command(rebuild):
+        """Compare the stock ledger with inventory_item; fail (or --rebuild) if they differ."""
+        from . import db
+        from .inventory_version import bump_inventory_version
+        from .ledger import check_ledger, rebuild_ledger
+        drift = check_ledger()
+        for (type_id, location, expiry), (units, value), (booked_units, booked_value) in drift[:20]:
+            click.echo(f"product {type_id} at '{location}' expiring {expiry}: {units} units / {value:.2f} "
+                       f"in inventory_item, {booked_units} / {booked_value:.2f} in the ledger")
+        if not drift:
+            click.echo("The stock ledger matches inventory_item.")
+        elif rebuild:
+            batches = rebuild_ledger()
+            bump_inventory_version()
+            db.session.commit()
+            click.echo(f"{len(drift)} batches differed; rebuilt the ledger ({batches} batches).")
+        else:
+            raise click.ClickException(f"{len(drift)} batches differ; run with --rebuild to recompute the ledger.")
+
+    @app.cli.command('archive-sold')
+    @click.option('--days', type=int, default=None, help='Archive items sold more than this many days ago (default: ARCHIVE_SOLD_AFTER_DAYS).')
+    def archive_sold(days):
+        """Move old sold items from inventory_item to inventory_item_archive."""
+        from .archive import archive_sold_items
+        days = app.config['ARCHIVE_SOLD_AFTER_DAYS'] if days is None else days
+        moved = archive_sold_items(datetime.utcnow() - timedelta(days=days), app.config['ARCHIVE_BATCH_SIZE'])
+        click.echo(f"Archived {moved} items sold more than {days} days ago.")
+
+    @app.cli.command('convert-data')
+    @click.option('--data-dir', default=None, help='Directory holding the analytics CSVs (default: DATA_DIR).')
+    def convert_data(data_dir):
+        """Write memory-mappable Feather copies of the analytics CSVs."""
+        from .data_handler import convert_to_columnar
+        for name, (csv_bytes, feather_bytes) in convert_to_columnar(data_dir or app.config['DATA_DIR']).items():
+            click.echo(f"{name}: {csv_bytes / 1e6:.1f} MB CSV -> {feather_bytes / 1e6:.1f} MB Feather")
+
+    @app.cli.command('analyze-db')
+    def analyze_db():
+        """Refresh the query planner's table statistics (ANALYZE, then PRAGMA optimize on SQLite)."""
+        from . import db
+        db.session.execute(db.text('ANALYZE'))
+        if db.engine.dialect.name == 'sqlite': db.session.execute(db.text('PRAGMA optimize'))
+        db.session.commit()
+        click.echo("Planner statistics updated.")
+
+    @app.cli.command('check-query-plans')
+    def check_query_plans():
+        """EXPLAIN QUERY PLAN every hot inventory query (SQLite only); fail if one scans inventory_item,
+        searches it on is_sold alone, or sorts where it should read in index order."""
+        from . import db
+        from .queries import check_query_plans
+        if db.engine.dialect.name != 'sqlite':
+            raise click.ClickException("check-query-plans only understands SQLite query plans.")
+        regressions = []
+        for name, (plan, problems) in check_query_plans(date.today()).items():
+            click.echo(f"{'FAIL' if problems else 'ok  '} {name}: {' | '.join(plan)}")
+            for problem in problems: click.echo(f"       {problem}")
+            if problems: regressions.append(name)
+        if regressions:
+            raise click.ClickException(f"Bad query plans: {', '.join(regressions)}")
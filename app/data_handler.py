@@ -1,42 +1,420 @@
 # app/data_handler.py
+import copy
+import io
+import logging
+import os
+import threading
+import time
+import zlib
+from datetime import datetime
 import pandas as pd
 
-products_df = None
-customers_df = None
-transactions_df = None
+try:
+    import pyarrow.feather as pa_feather
+except ImportError:  # Feather support is optional; the CSVs are always readable.
+    pa_feather = None
 
-def load_data():
-    global products_df, customers_df, transactions_df
-    try:
-        products_df = pd.read_csv('products.csv')
-        customers_df = pd.read_csv('customers.csv')
-        transactions_df = pd.read_csv('transactions.csv')
-        print("--- CSV data loaded into memory successfully. ---")
-    except FileNotFoundError:
-        print("--- WARNING: CSV data files not found. Sales insights will be unavailable. ---")
-    except Exception as e:
-        print(f"--- ERROR loading CSV data: {e} ---")
+log = logging.getLogger(__name__)
+
+
+AGE_BINS = [18, 30, 45, 60, 100]
+AGE_LABELS = ['18-30', '31-45', '46-60', '60+']
+
+# Explicit, compact dtypes: 32-bit ids, small ints for ages/quantities, categoricals for repeated labels.
+DATASET_DTYPES = {
+    'products': {'ProductID': 'int32', 'ProductName': 'category', 'Category': 'category',
+                 'CostPrice': 'float32', 'SellingPrice': 'float32'},
+    'customers': {'CustomerID': 'int32', 'Name': 'string', 'Age': 'int16', 'Gender': 'category',
+                  'JoinDate': 'datetime64[ns]'},
+    'transactions': {'TransactionID': 'int32', 'CustomerID': 'int32', 'ProductID': 'int32', 'Quantity': 'int16',
+                     'TransactionDate': 'datetime64[ns]'},
+}
+
+
+class InsightsEngine:
+    """Sales and customer aggregates, computed once at load and updated incrementally.
+
+    Only per-product and per-group counters are kept (a few hundred numbers), so answering a
+    question never touches the raw transactions again, and appending new transactions costs
+    a groupby over the new rows only (see appended())."""
+
+    def __init__(self, products, customers=None, transactions=None):
+        self.product_names = products.set_index('ProductID')['ProductName'].astype(object)
+        self.units_by_product = pd.Series(dtype='int64')
+        self.lines_by_product = pd.Series(dtype='int64')
+        self.age_counts = pd.Series(0, index=pd.CategoricalIndex(AGE_LABELS, categories=AGE_LABELS), dtype='int64')
+        self.gender_counts = pd.Series(dtype='int64')
+        self._sales_text = None
+        self._customer_text = None
+        if transactions is not None: self.add_transactions(transactions)
+        if customers is not None: self.add_customers(customers)
+
+    def add_transactions(self, transactions):
+        # Transactions for products we don't know about are ignored, like the inner merge used to.
+        if not isinstance(transactions, pd.DataFrame):
+            # A (memory-mapped) Arrow table: aggregate in Arrow so the rows never become pandas copies.
+            grouped = transactions.group_by('ProductID').aggregate([('Quantity', 'sum'), ('Quantity', 'count')]).to_pandas()
+            grouped = grouped[grouped['ProductID'].isin(self.product_names.index)].set_index('ProductID')
+            units, lines = grouped['Quantity_sum'], grouped['Quantity_count']
+        else:
+            known = transactions[transactions['ProductID'].isin(self.product_names.index)]
+            units = known.groupby('ProductID')['Quantity'].sum()
+            lines = known['ProductID'].value_counts()
+        self.units_by_product = self.units_by_product.add(units, fill_value=0).astype('int64')
+        self.lines_by_product = self.lines_by_product.add(lines, fill_value=0).astype('int64')
+        self._sales_text = None
+
+    def appended(self, transactions):
+        """A copy with `transactions` added. This engine is left as it is: the snapshot readers
+        hold keeps answering from it (add_transactions replaces the Series, never edits them)."""
+        engine = copy.copy(self)
+        engine.add_transactions(transactions)
+        return engine
+
+    def add_customers(self, customers):
+        age_groups = pd.cut(customers['Age'], bins=AGE_BINS, labels=AGE_LABELS, right=False)
+        self.age_counts = self.age_counts.add(age_groups.value_counts(), fill_value=0).astype('int64')
+        self.gender_counts = self.gender_counts.add(customers['Gender'].astype(object).value_counts(), fill_value=0).astype('int64')
+        self._customer_text = None
+
+    def top_sellers(self, n=5):
+        units = self.units_by_product.groupby(self.product_names.reindex(self.units_by_product.index)).sum()
+        return units.nlargest(n).rename_axis('ProductName').reset_index(name='Quantity')
+
+    def slow_movers(self, n=5, threshold=5):
+        counts = self.lines_by_product.groupby(self.product_names.reindex(self.lines_by_product.index)).sum()
+        counts = counts.sort_values(ascending=False, kind='stable')
+        return counts[counts < threshold].head(n).rename_axis('ProductName').reset_index(name='UnitsSold')
+
+    def sales_text(self):
+        if self._sales_text is None:
+            self._sales_text = f"Top Sellers:\n{self.top_sellers().to_string(index=False)}\n\nSlow Movers:\n{self.slow_movers().to_string(index=False)}"
+        return self._sales_text
+
+    def customer_text(self):
+        if self._customer_text is None:
+            age_distribution = self.age_counts.sort_values(ascending=False, kind='stable').rename_axis('Age_Group').reset_index(name='Count')
+            gender_distribution = self.gender_counts.sort_values(ascending=False, kind='stable').rename_axis('Gender').reset_index(name='Count')
+            self._customer_text = f"Customer Ages:\n{age_distribution.to_string(index=False)}\n\nCustomer Genders:\n{gender_distribution.to_string(index=False)}"
+        return self._customer_text
+
+
+def _dataset_path(data_dir, name, ext):
+    return os.path.join(data_dir, f"{name}.{ext}")
+
+
+def _source(data_dir, name):
+    """'feather' when the Feather copy exists and is at least as new as the CSV, else 'csv'."""
+    csv_path, feather_path = _dataset_path(data_dir, name, 'csv'), _dataset_path(data_dir, name, 'feather')
+    if pa_feather is not None and os.path.exists(feather_path) and \
+            (not os.path.exists(csv_path) or os.path.getmtime(feather_path) >= os.path.getmtime(csv_path)):
+        return 'feather'
+    return 'csv'
+
+
+def _read_dataset(data_dir, name, as_table=False):
+    """Reads one dataset with compact dtypes. Prefers the Feather copy written by convert_to_columnar()
+    when it is at least as new as the CSV: it is memory-mapped, so the pages come straight from the
+    OS page cache (shared by every worker) instead of being parsed from text in each process.
+    With as_table=True a Feather dataset is returned as the mapped pyarrow Table itself."""
+    if _source(data_dir, name) == 'feather':
+        table = pa_feather.read_table(_dataset_path(data_dir, name, 'feather'), memory_map=True)
+        return table if as_table else table.to_pandas()
+    return _read_csv(_dataset_path(data_dir, name, 'csv'), name)
+
+
+def _read_csv(csv_path, name, **kwargs):
+    dtypes = {column: dtype for column, dtype in DATASET_DTYPES[name].items() if dtype != 'datetime64[ns]'}
+    dates = [column for column, dtype in DATASET_DTYPES[name].items() if dtype == 'datetime64[ns]']
+    return pd.read_csv(csv_path, dtype=dtypes, parse_dates=dates, **kwargs)
+
+
+def convert_to_columnar(data_dir='.'):
+    """Writes an uncompressed Feather (Arrow IPC) copy of each CSV next to it, with compact dtypes.
+    Uncompressed is deliberate: only uncompressed Arrow buffers can be memory-mapped without copying.
+    Returns {name: (csv_bytes, feather_bytes)}."""
+    if pa_feather is None: raise RuntimeError("pyarrow is required to write Feather files (pip install pyarrow).")
+    sizes = {}
+    for name in DATASET_DTYPES:
+        csv_path, feather_path = _dataset_path(data_dir, name, 'csv'), _dataset_path(data_dir, name, 'feather')
+        _read_csv(csv_path, name).to_feather(feather_path, compression='uncompressed')
+        sizes[name] = (os.path.getsize(csv_path), os.path.getsize(feather_path))
+    return sizes
+
+
+
+
+# --- Appends ---
+# A transactions file that only grew at the end is folded into the insights instead of reloaded.
+# The rows loaded are fingerprinted with a running CRC-32 (with their length, this catches any edit
+# that isn't a malicious one): of the CSV's bytes, which is far cheaper than parsing them, or of the
+# Feather table's column values, as a rewritten Arrow file shares no bytes with the old one.
+
+class _ChecksummingReader(io.RawIOBase):
+    """The first `size` bytes of a file, checksummed as they are read (parse and fingerprint in one pass)."""
+
+    def __init__(self, path, size):
+        self._file = open(path, 'rb')
+        self._remaining = size
+        self._position = 0
+        self.crc = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        view = memoryview(buffer)[:self._remaining]
+        n = self._file.readinto(view) if len(view) else 0
+        self.crc = zlib.crc32(view[:n], self.crc)
+        self._remaining -= n
+        self._position += n
+        return n
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def _complete_size(path):
+    """The size of a file up to its last newline: a line still being written is left for later."""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.seek(max(size - (1 << 16), 0))
+        tail = f.read()
+    return size - len(tail) + tail.rfind(b'\n') + 1 if b'\n' in tail else size
+
+
+def _read_csv_prefix(path, size, name, **kwargs):
+    """(rows in the first `size` bytes of a CSV, their CRC-32)."""
+    with _ChecksummingReader(path, size) as raw:
+        rows = _read_csv(io.BufferedReader(raw, 1 << 20), name, **kwargs)
+        return rows, raw.crc
+
+
+def _csv_crc(path, size):
+    with _ChecksummingReader(path, size) as raw:
+        while raw.read(1 << 20): pass
+        return raw.crc if raw.tell() == size else None
+
+
+def _table_mark(table, rows):
+    """(rows, CRC-32 of the values in the first `rows` rows) of an Arrow table, or None if a column
+    isn't a flat numeric or timestamp array."""
+    crc = 0
+    for column in table.slice(0, rows).columns:
+        for chunk in column.chunks:  # chunk by chunk: no copy, and the CRC doesn't depend on the chunking
+            try:
+                values = chunk.to_numpy(zero_copy_only=False)
+            except Exception:
+                return None
+            if values.dtype == object: return None
+            crc = zlib.crc32(values.view('u1'), crc)
+    return rows, crc
+
+
+def _read_transactions(data_dir):
+    """(source, transactions, mark): where they were read from ('csv' or 'feather'), the DataFrame or
+    mapped Table, and the fingerprint _appended_transactions compares the file with later."""
+    if _source(data_dir, 'transactions') == 'feather':
+        table = _read_dataset(data_dir, 'transactions', as_table=True)
+        return 'feather', table, _table_mark(table, table.num_rows)
+    path = _dataset_path(data_dir, 'transactions', 'csv')
+    size = _complete_size(path)
+    rows, crc = _read_csv_prefix(path, size, 'transactions')
+    return 'csv', rows, (size, crc)
+
+
+def _appended_transactions(data_dir, source, mark):
+    """What was appended to the transactions file since `mark`: (mapped Table or None, new rows,
+    new mark). The Table is the whole new Feather file; for a CSV only the new rows are read, and
+    they are None when the new bytes don't complete a line yet. None if the file changed in any
+    other way."""
+    if mark is None or _source(data_dir, 'transactions') != source: return None
+    if source == 'feather':
+        table = _read_dataset(data_dir, 'transactions', as_table=True)
+        if table.num_rows <= mark[0] or _table_mark(table, mark[0]) != mark: return None
+        return table, table.slice(mark[0]), _table_mark(table, table.num_rows)
+    path = _dataset_path(data_dir, 'transactions', 'csv')
+    old_size, size = mark[0], _complete_size(path)
+    if size < old_size or _csv_crc(path, old_size) != mark[1]: return None
+    if size == old_size: return None, None, mark
+    with open(path, 'rb') as f:
+        f.seek(old_size)
+        added = f.read(size - old_size)
+    rows = _read_csv(io.BytesIO(added), 'transactions', header=None, names=list(DATASET_DTYPES['transactions']))
+    return None, rows, (size, zlib.crc32(added, mark[1]))
+
+
+class DataSnapshot:
+    """One immutable, fully-loaded view of the analytics datasets. Readers keep whichever
+    snapshot they grabbed; a reload builds a new one and swaps the reference."""
+
+    def __init__(self, signature, products=None, customers=None, transactions=None, error=None, source=None, mark=None):
+        self.signature = signature
+        self.products_df = products
+        self.customers_df = customers
+        self.transactions_df = transactions if isinstance(transactions, pd.DataFrame) else None
+        self.transactions_table = None if isinstance(transactions, pd.DataFrame) else transactions
+        self.transactions_frames = [transactions] if isinstance(transactions, pd.DataFrame) else []
+        self.transactions_source, self.transactions_mark = source, mark
+        self.insights = InsightsEngine(products, customers, transactions) if products is not None else None
+        self.error = error
+
+    def append_transactions(self, signature, table, rows, mark):
+        """A new snapshot with `rows` appended (see _appended_transactions for the arguments). The
+        insights are updated with a groupby over the new rows only; this snapshot, which readers
+        may still hold, is left untouched (copy-on-write)."""
+        snapshot = copy.copy(self)
+        snapshot.signature, snapshot.transactions_mark = signature, mark
+        if table is not None:
+            snapshot.transactions_table, snapshot.transactions_df = table, None
+        elif rows is not None:
+            snapshot.transactions_frames = self.transactions_frames + [rows]
+            snapshot.transactions_df = None
+        if rows is not None and len(rows): snapshot.insights = self.insights.appended(rows)
+        return snapshot
+
+    def get_transactions_df(self):
+        """The transactions as a DataFrame, materialized (from the mapped table, or the CSV rows
+        loaded and appended since) only when asked."""
+        if self.transactions_df is None:
+            if self.transactions_table is not None:
+                self.transactions_df = self.transactions_table.to_pandas()
+            elif self.transactions_frames:
+                self.transactions_df = pd.concat(self.transactions_frames, ignore_index=True)
+        return self.transactions_df
+
+
+class DataStore:
+    """Loads the analytics data lazily on first use and reloads it when the files change.
+
+    The first reader waits for the initial load; after that readers never block. At most every
+    `check_interval` seconds a reader stats the data files, and if their mtimes or sizes changed
+    one background thread builds a new snapshot and swaps it in atomically. When the only change
+    is rows appended to the transactions file (CSV or Feather), only those rows are read and
+    folded into the insights; any other change, and reload(), rebuild the snapshot from scratch."""
+
+    def __init__(self, data_dir='.', check_interval=5.0):
+        self.data_dir = data_dir
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._next_check = 0.0
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()  # guards the change check and _reloading; never held while loading
+        self._reloading = False
+        self.metrics = {'loads': 0, 'failed_loads': 0, 'appends': 0, 'appended_rows': 0, 'last_load_seconds': 0.0,
+                        'total_load_seconds': 0.0, 'last_loaded_at': None, 'change_checks': 0}
+
+    def configure(self, data_dir, check_interval):
+        self.data_dir, self.check_interval = data_dir, check_interval
+        self._snapshot, self._next_check = None, 0.0
+
+    def _signature(self):
+        signature = []
+        for name in DATASET_DTYPES:
+            for ext in ('csv', 'feather'):
+                try:
+                    stat = os.stat(_dataset_path(self.data_dir, name, ext))
+                    signature.append((name, ext, stat.st_mtime_ns, stat.st_size))
+                except FileNotFoundError:
+                    pass
+        return tuple(signature)
+
+    def _append(self, previous, signature):
+        """The previous snapshot with the appended transactions, or None when a full load is needed."""
+        if previous is None or previous.insights is None: return None
+        changed = {(name, ext) for name, ext, *_ in set(signature) ^ set(previous.signature)}
+        if changed != {('transactions', previous.transactions_source)}: return None
+        try:
+            appended = _appended_transactions(self.data_dir, previous.transactions_source, previous.transactions_mark)
+        except Exception as e:  # e.g. the new lines don't parse; the full load reports it properly
+            log.warning("Could not append the new transactions; reloading", extra={'error': str(e)})
+            return None
+        if appended is None: return None
+        table, rows, mark = appended
+        self.metrics['appends'] += 1
+        self.metrics['appended_rows'] += len(rows) if rows is not None else 0
+        return previous.append_transactions(signature, table, rows, mark)
+
+    def _load(self, incremental=False):
+        signature = self._signature()
+        started = time.perf_counter()
+        try:
+            snapshot = self._append(self._snapshot, signature) if incremental else None
+            if snapshot is not None:
+                log.info("Analytics transactions appended", extra={'data_dir': self.data_dir, 'seconds': round(time.perf_counter() - started, 3)})
+            else:
+                source, transactions, mark = _read_transactions(self.data_dir)
+                snapshot = DataSnapshot(signature, _read_dataset(self.data_dir, 'products'), _read_dataset(self.data_dir, 'customers'),
+                                        transactions, source=source, mark=mark)
+                log.info("Analytics data loaded", extra={'data_dir': self.data_dir, 'seconds': round(time.perf_counter() - started, 3)})
+        except FileNotFoundError:
+            snapshot = DataSnapshot(signature, error="data files not found")
+            self.metrics['failed_loads'] += 1
+            log.warning("Analytics data files not found; sales insights will be unavailable", extra={'data_dir': self.data_dir})
+        except Exception as e:
+            snapshot = DataSnapshot(signature, error=str(e))
+            self.metrics['failed_loads'] += 1
+            log.exception("Error loading the analytics data", extra={'data_dir': self.data_dir})
+        elapsed = time.perf_counter() - started
+        self.metrics['loads'] += 1
+        self.metrics['last_load_seconds'] = round(elapsed, 3)
+        self.metrics['total_load_seconds'] = round(self.metrics['total_load_seconds'] + elapsed, 3)
+        self.metrics['last_loaded_at'] = datetime.utcnow().isoformat()
+        self._snapshot = snapshot
+        self._next_check = time.monotonic() + self.check_interval
+        return snapshot
+
+    def _reload_in_background(self):
+        try:
+            with self._load_lock:
+                self._load(incremental=True)
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._load_lock:
+                snapshot = self._snapshot or self._load()
+            return snapshot
+        if time.monotonic() >= self._next_check and not self._reloading:
+            with self._lock:  # one reader checks; the rest go on with the snapshot they have
+                if time.monotonic() < self._next_check or self._reloading: return snapshot
+                self._next_check = time.monotonic() + self.check_interval
+                self.metrics['change_checks'] += 1
+                if self._signature() == snapshot.signature: return snapshot
+                self._reloading = True
+            threading.Thread(target=self._reload_in_background, name='data-reload', daemon=True).start()
+        return snapshot
+
+    def reload(self):
+        """Reloads synchronously and returns the new snapshot."""
+        with self._load_lock:
+            return self._load()
+
+
+data_store = DataStore()
+
+def load_data(data_dir=None):
+    """Forces a (re)load now, instead of waiting for the first question."""
+    if data_dir is not None: data_store.data_dir = data_dir
+    return data_store.reload()
 
 def get_sales_insights_from_cache():
-    if transactions_df is None or products_df is None: return "Sales data is not available."
+    insights = data_store.snapshot().insights
+    if insights is None: return "Sales data is not available."
     try:
-        sales_data = pd.merge(transactions_df, products_df, on='ProductID')
-        top_sellers = sales_data.groupby('ProductName')['Quantity'].sum().nlargest(5).reset_index()
-        sales_counts = sales_data['ProductName'].value_counts()
-        slow_movers = sales_counts[sales_counts < 5].head(5).reset_index()
-        slow_movers.columns = ['ProductName', 'UnitsSold']
-        return f"Top Sellers:\n{top_sellers.to_string(index=False)}\n\nSlow Movers:\n{slow_movers.to_string(index=False)}"
+        return insights.sales_text()
     except Exception as e: return f"Error analyzing sales data: {e}"
 
 def get_customer_insights_from_cache():
-    if customers_df is None: return "Customer data is not available."
+    insights = data_store.snapshot().insights
+    if insights is None: return "Customer data is not available."
     try:
-        age_bins = [18, 30, 45, 60, 100]
-        age_labels = ['18-30', '31-45', '46-60', '60+']
-        customers_df['AgeGroup'] = pd.cut(customers_df['Age'], bins=age_bins, labels=age_labels, right=False)
-        age_distribution = customers_df['AgeGroup'].value_counts().reset_index()
-        age_distribution.columns = ['Age_Group', 'Count']
-        gender_distribution = customers_df['Gender'].value_counts().reset_index()
-        gender_distribution.columns = ['Gender', 'Count']
-        return f"Customer Ages:\n{age_distribution.to_string(index=False)}\n\nCustomer Genders:\n{gender_distribution.to_string(index=False)}"
+        return insights.customer_text()
     except Exception as e: return f"Error analyzing customer data: {e}"
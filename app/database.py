@@ -0,0 +1,76 @@
+# app/database.py
+# Engine profile per database. SQLite (the single-node default) runs in WAL mode, so readers never
+# block the one writer, with a busy timeout so concurrent writers wait for the lock instead of
+# failing with "database is locked". Postgres (DATABASE_URL) gets a sized, pre-pinged pool and an
+# optional statement timeout; checkout there locks rows with SKIP LOCKED (see app/sales.py).
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def normalize_database_url(url):
+    # Heroku-style URLs use the scheme SQLAlchemy dropped in 1.4.
+    return 'postgresql://' + url[len('postgres://'):] if url.startswith('postgres://') else url
+
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database; explicit options in the config win."""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = {}
+    if url.get_backend_name() == 'sqlite':
+        if not _is_memory_sqlite(url):  # an in-memory database is one shared connection (StaticPool)
+            options.update(pool_size=config['DB_POOL_SIZE'], max_overflow=config['DB_MAX_OVERFLOW'],
+                           pool_timeout=config['DB_POOL_TIMEOUT'])
+        # Python's sqlite3 waits this long for a lock itself, before the busy_timeout pragma is set.
+        options['connect_args'] = {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}
+    else:
+        options.update(pool_size=config['DB_POOL_SIZE'], max_overflow=config['DB_MAX_OVERFLOW'],
+                       pool_timeout=config['DB_POOL_TIMEOUT'], pool_recycle=config['DB_POOL_RECYCLE'], pool_pre_ping=True)
+        if url.get_backend_name() == 'postgresql' and config['DB_STATEMENT_TIMEOUT_MS']:
+            options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def _sqlite_pragmas(config, memory):
+    pragmas = [f"busy_timeout = {config['SQLITE_BUSY_TIMEOUT_MS']}", f"synchronous = {config['SQLITE_SYNCHRONOUS']}",
+               f"cache_size = -{config['SQLITE_CACHE_SIZE_KB']}", "temp_store = MEMORY"]
+    if config['SQLITE_WAL'] and not memory: pragmas.insert(0, "journal_mode = WAL")
+    return pragmas
+
+
+def configure_database(app):
+    """Call before db.init_app: fixes the URL scheme and sets the engine options."""
+    app.config['SQLALCHEMY_DATABASE_URI'] = normalize_database_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+
+def init_database(app):
+    """Call after db.init_app: sets the SQLite pragmas on every new connection."""
+    from . import db
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite': return
+    pragmas = _sqlite_pragmas(app.config, _is_memory_sqlite(engine.url))
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas: cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+
+    @event.listens_for(engine, 'close')
+    def _optimize(dbapi_connection, connection_record):
+        # Lets SQLite refresh the planner statistics the connection's queries would benefit from.
+        try:
+            dbapi_connection.execute("PRAGMA optimize")
+        except Exception:
+            pass
+
+
+def supports_skip_locked(session):
+    return session.get_bind().dialect.name == 'postgresql'
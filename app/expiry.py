@@ -0,0 +1,102 @@
+# app/expiry.py
+# The expiry engine: one range query over the unsold stock expiring within the longest horizon,
+# grouped by expiry date, product type and location, then bucketed by days left. The dashboard and
+# the daily alert read the same report, cached per (day, inventory version).
+
+from collections import namedtuple
+from datetime import date, timedelta
+from flask import current_app
+from . import queries
+from .cache import TTLCache
+from .inventory_version import current_inventory_version
+
+ExpiringBatch = namedtuple('ExpiringBatch', 'product_type_id name location expiry days_left count')
+
+_report_cache = TTLCache(maxsize=16, ttl=300)
+
+
+def bucket_label(days):
+    return 'today' if days == 0 else 'tomorrow' if days == 1 else f'in {days} days'
+
+
+class ExpiryReport:
+    """Unsold batches expiring between `today` and today + the longest horizon, soonest first."""
+
+    def __init__(self, today, horizons, rows, names):
+        # rows are (expiry_date, product_type_id, location, count); names maps type ids to names.
+        # There are tens of thousands of rows at 1M items, so the per-row work is kept to lookups.
+        self.today = today
+        self.horizons = tuple(sorted(set(horizons)))
+        # The first horizon that covers each day count: with horizons (0, 3, 7), 2 days left is in 3.
+        self._bucket_of_days = {days: next(horizon for horizon in self.horizons if days <= horizon)
+                                for days in range(self.horizons[-1] + 1)}
+        days_left = {}
+        for expiry, _, _, _ in rows:
+            if expiry not in days_left: days_left[expiry] = (expiry - today).days
+        make = ExpiringBatch._make
+        self.batches = sorted((make((type_id, names[type_id], location, expiry, days_left[expiry], count))
+                               for expiry, type_id, location, count in rows if type_id in names),
+                              key=lambda batch: (batch.expiry, batch.name, batch.location or ''))
+        self._by_product = None
+
+    def bucket_of(self, batch):
+        return self._bucket_of_days[batch.days_left]
+
+    def buckets(self, batches=None):
+        """{horizon: [batches]}, one entry per horizon (possibly empty)."""
+        result = {horizon: [] for horizon in self.horizons}
+        bucket_of_days = self._bucket_of_days
+        for batch in (self.batches if batches is None else batches): result[bucket_of_days[batch.days_left]].append(batch)
+        return result
+
+    def by_product(self, batches=None):
+        """{product_name: {'count', 'location', 'locations', 'expiry'}} ordered by soonest expiry,
+        where 'expiry' is the soonest date and 'location' the first of the sorted 'locations'.
+        The summary of the whole report is computed once; don't modify it in place."""
+        if batches is None and self._by_product is not None: return self._by_product
+        summary = {}
+        for batch in (self.batches if batches is None else batches):
+            entry = summary.setdefault(batch.name, {'count': 0, 'locations': set(), 'expiry': batch.expiry})
+            entry['count'] += batch.count
+            if batch.location: entry['locations'].add(batch.location)
+        for entry in summary.values():
+            entry['locations'] = sorted(entry['locations'])
+            entry['location'] = entry['locations'][0] if entry['locations'] else None
+        if batches is None: self._by_product = summary
+        return summary
+
+    def by_location(self):
+        """{location: [batches]}, locations in name order."""
+        result = {}
+        for batch in self.batches: result.setdefault(batch.location, []).append(batch)
+        return dict(sorted(result.items(), key=lambda item: item[0] or ''))
+
+    def product_names(self):
+        return list(dict.fromkeys(batch.name for batch in self.batches))
+
+
+def expiry_report(today=None):
+    """The ExpiryReport for `today` over the configured EXPIRY_HORIZONS: one scan plus a lookup of the
+    product names found, or only the inventory-version lookup when nothing has changed since the
+    last report for the same day."""
+    today = today or date.today()
+    horizons = tuple(sorted(set(current_app.config['EXPIRY_HORIZONS'])))
+    key = (today, current_inventory_version(), horizons)
+    report = _report_cache.get(key)
+    if report is None:
+        rows = queries.expiry_scan_query(today, today + timedelta(days=horizons[-1])).all()
+        report = ExpiryReport(today, horizons, rows, queries.product_names({type_id for _, type_id, _, _ in rows}))
+        _report_cache.set(key, report)
+    return report
+
+
+def alert_recipients(report):
+    """Groups the report by who gets the alert: {email: {location: [batches]}}. Locations listed in
+    LOCATION_MANAGERS go to their manager, the rest to STORE_MANAGER_EMAIL (skipped if unset)."""
+    managers = current_app.config['LOCATION_MANAGERS']
+    fallback = current_app.config.get('STORE_MANAGER_EMAIL')
+    recipients = {}
+    for location, batches in report.by_location().items():
+        email = managers.get(location, fallback)
+        if email: recipients.setdefault(email, {})[location] = batches
+    return recipients
@@ -0,0 +1,35 @@
+# app/export.py
+# Streaming CSV export: rows are fetched in batches and written out chunk by chunk,
+# so memory stays flat and the first bytes leave before the query has finished.
+
+import csv
+import zlib
+from io import StringIO
+
+EXPORT_COLUMNS = ['RFID_Tag', 'Product_Name', 'Price', 'Stock_In_Date', 'Expiry_Date', 'Location']
+
+
+def iter_csv(query, columns=EXPORT_COLUMNS, batch_size=1000):
+    """Yields the CSV text for `query` (header first) in chunks of roughly `batch_size` rows."""
+    buffer = StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(columns)
+    pending = 0
+    for row in query.yield_per(batch_size):
+        writer.writerow(row)
+        pending += 1
+        if pending >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def gzip_chunks(chunks, level=6):
+    """Compresses a stream of text chunks into a single gzip member, chunk by chunk."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data: yield data
+    yield compressor.flush()
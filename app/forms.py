@@ -1,5 +1,6 @@
 # app/forms.py
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import StringField, FloatField, DateField, SubmitField, IntegerField
 from wtforms.validators import DataRequired, NumberRange
 from wtforms_sqlalchemy.fields import QuerySelectField
@@ -19,4 +20,8 @@ class AddStockForm(FlaskForm):
 class CreateProductTypeForm(FlaskForm):
     name = StringField('Product Name (e.g., 1L Organic Milk)', validators=[DataRequired()])
     default_price = FloatField('Default Price', validators=[DataRequired()])
-    submit = SubmitField('Create Product Type')
\ No newline at end of file
+    submit = SubmitField('Create Product Type')
+
+class DeliveryUploadForm(FlaskForm):
+    delivery_file = FileField('Delivery CSV (product_name or product_type_id, quantity, stock_in_date, expiry_date, location)', validators=[FileRequired(), FileAllowed(['csv'], 'CSV files only.')])
+    submit = SubmitField('Receive Delivery')
\ No newline at end of file
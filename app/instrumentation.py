@@ -0,0 +1,174 @@
+# app/instrumentation.py
+# Request timing, SQL profiling and structured logs, wired in by create_app. Every request records
+# its duration and the statements it sent (count, time, and the most repeated one) into app.metrics
+# and one log line; a request that sends the same statement more than SQL_REPEAT_THRESHOLD times is
+# logged as a likely N+1. render_metrics() is what /metrics serves.
+
+import json
+import logging
+import time
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from . import db, metrics
+
+log = logging.getLogger(__name__)
+
+SQL_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 1000)
+# Attributes every LogRecord has; anything else on a record came from `extra=` and is logged as a field.
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def _extra_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and the record's extra fields."""
+
+    def format(self, record):
+        entry = {'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'), 'level': record.levelname,
+                 'logger': record.name, 'message': record.getMessage()}
+        entry.update(_extra_fields(record))
+        if record.exc_info: entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Human-readable lines with the extra fields appended as key=value."""
+
+    def format(self, record):
+        line = super().format(record)
+        fields = ' '.join(f"{key}={value}" for key, value in _extra_fields(record).items())
+        return f"{line} {fields}" if fields else line
+
+
+def configure_logging(app):
+    """Logs of the app package go to stderr at LOG_LEVEL, as JSON lines or key=value text (LOG_FORMAT)."""
+    logger = logging.getLogger('app')
+    logger.setLevel(app.config['LOG_LEVEL'])
+    if not any(getattr(handler, '_green_inventory', False) for handler in logger.handlers):
+        handler = logging.StreamHandler()
+        handler._green_inventory = True
+        logger.addHandler(handler)
+        logger.propagate = False
+    for handler in logger.handlers:
+        if getattr(handler, '_green_inventory', False):
+            handler.setFormatter(JsonFormatter() if app.config['LOG_FORMAT'] == 'json'
+                                 else KeyValueFormatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+
+# --- SQL statements ---
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    metrics.observe('sql_statement_seconds', elapsed)
+    if has_request_context() and 'sql_statements' in g:
+        g.sql_statements[statement] += 1
+        g.sql_seconds += elapsed
+
+
+def _listen_to_engine(app):
+    with app.app_context():
+        engine = db.engine
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+# --- Requests ---
+def _start_request():
+    g.request_started = time.perf_counter()
+    g.sql_statements = Counter()
+    g.sql_seconds = 0.0
+
+
+def _finish_request(response):
+    # For streamed responses (CSV export, chat over SSE) this measures the time to the first byte;
+    # the statements sent while the body streams are counted in sql_statement_seconds only.
+    if 'request_started' not in g: return response
+    elapsed = time.perf_counter() - g.request_started
+    endpoint = request.endpoint or 'unmatched'
+    statements = sum(g.sql_statements.values())
+    metrics.observe('http_request_seconds', elapsed, endpoint=endpoint, method=request.method)
+    metrics.inc('http_requests_total', endpoint=endpoint, method=request.method, status=str(response.status_code))
+    metrics.histogram('http_request_sql_statements', SQL_COUNT_BUCKETS, endpoint=endpoint).observe(statements)
+    response.headers['Server-Timing'] = f"app;dur={elapsed * 1000:.1f}, db;dur={g.sql_seconds * 1000:.1f}"
+
+    fields = {'method': request.method, 'path': request.path, 'endpoint': endpoint, 'status': response.status_code,
+              'duration_ms': round(elapsed * 1000, 1), 'sql_count': statements, 'sql_ms': round(g.sql_seconds * 1000, 1)}
+    if statements:
+        statement, repeats = g.sql_statements.most_common(1)[0]
+        threshold = current_app.config['SQL_REPEAT_THRESHOLD']
+        if threshold and repeats > threshold:
+            metrics.inc('sql_repeated_statement_requests_total', endpoint=endpoint)
+            log.warning("Possible N+1 query", extra=dict(fields, repeats=repeats, statement=' '.join(statement.split())[:300]))
+    slow_ms = current_app.config['REQUEST_SLOW_MS']
+    log.log(logging.WARNING if slow_ms and elapsed * 1000 >= slow_ms else logging.INFO, "Request", extra=fields)
+    return response
+
+
+def init_instrumentation(app):
+    configure_logging(app)
+    _listen_to_engine(app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+# --- Job timing ---
+def timed_job(name, func, *args, log_level=logging.INFO):
+    """Runs a scheduled job, recording its duration and outcome. Failures are always logged;
+    the "Job finished" line goes out at `log_level`."""
+    started = time.perf_counter()
+    status = 'failed'
+    try:
+        result = func(*args)
+        status = 'done'
+        return result
+    except Exception:
+        log.exception("Job failed", extra={'job': name})
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe('job_seconds', elapsed, job=name)
+        metrics.inc('job_runs_total', job=name, status=status)
+        log.log(log_level, "Job finished", extra={'job': name, 'status': status, 'duration_ms': round(elapsed * 1000, 1)})
+
+
+# --- /metrics ---
+def _stats_gauges(prefix, stats):
+    return [(prefix + key, {}, value) for key, value in stats.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)]
+
+
+def collect_gauges():
+    """Point-in-time values from the caches, the analytics store and the notification outbox."""
+    from . import chat_jobs, chatbot, expiry
+    from .carbon import carbon_cache_stats
+    from .data_handler import data_store
+    from .notifications import outbox_stats
+    from .search_tool import search_cache_stats
+
+    gauges = _stats_gauges('search_', search_cache_stats()) + _stats_gauges('carbon_', carbon_cache_stats())
+    gauges += _stats_gauges('analytics_', data_store.metrics)
+    for cache_name, cache in (('expiry_report', expiry._report_cache), ('chat_context', chatbot._context_cache),
+                              ('chat_answer', chat_jobs._answer_cache)):
+        if cache is None: continue
+        gauges += [('cache_' + key, {'cache': cache_name}, value) for key, value in cache.stats().items()]
+    try:
+        outbox = outbox_stats()
+    except Exception as e:  # e.g. the notification table isn't migrated yet
+        db.session.rollback()
+        log.warning("Outbox stats unavailable", extra={'error': str(e)})
+    else:
+        gauges.append(('notification_outbox_depth', {}, outbox['depth']))
+        gauges.append(('notification_outbox_oldest_pending_seconds', {}, outbox['oldest_pending_seconds']))
+        gauges += [('notifications', {'status': status}, count) for status, count in outbox['by_status'].items()]
+    return gauges
+
+
+def render_metrics():
+    return metrics.render_prometheus(collect_gauges())
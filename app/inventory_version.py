@@ -0,0 +1,39 @@
+# app/inventory_version.py
+# A database-backed version number for the unsold inventory. Writers bump it inside their own
+# transaction, except checkout, which bumps it right after committing (see bump_inventory_version_now);
+# readers (chatbot context, answer caches) use it as a cache key, so every gunicorn worker sees a
+# change as soon as it is committed.
+
+import logging
+from . import db
+from .models import InventoryCounter
+
+log = logging.getLogger(__name__)
+
+INVENTORY = 'inventory'
+
+
+def bump_inventory_version():
+    """Increments the inventory version as part of the caller's transaction (does not commit)."""
+    counters = InventoryCounter.__table__
+    updated = db.session.execute(counters.update().where(counters.c.name == INVENTORY).values(value=counters.c.value + 1))
+    if updated.rowcount == 0:
+        db.session.execute(counters.insert().values(name=INVENTORY, value=1))
+
+
+def bump_inventory_version_now():
+    """Increments the inventory version in a short transaction of its own, for a writer that has
+    just committed. Checkout lanes run concurrently, and bumping inside their transactions would
+    hold the one counter row's lock until each commit, queueing every lane behind the others. A
+    reader between the two commits sees the new stock under the old version, which is harmless:
+    that version is about to be retired. A failure is logged, not raised, as the sale stands."""
+    try:
+        bump_inventory_version()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        log.warning("Could not bump the inventory version", extra={'error': str(e)})
+
+
+def current_inventory_version():
+    return db.session.execute(db.select(InventoryCounter.value).where(InventoryCounter.name == INVENTORY)).scalar() or 0
@@ -0,0 +1,95 @@
+# app/ledger.py
+# The stock ledger: unsold units and value per (product type, location, expiry date). Every writer
+# of inventory_item updates it in its own transaction, so "how much X is in stock, and what is it
+# worth" is a read of one row per batch. check_ledger() compares it with inventory_item and
+# rebuild_ledger() recomputes it (`flask check-ledger [--rebuild]`), e.g. after a bulk import.
+
+from sqlalchemy import bindparam
+from sqlalchemy.dialects import postgresql, sqlite
+from . import db
+from .models import InventoryItem, StockLedger
+
+_KEY = ('product_type_id', 'location', 'expiry_date')
+
+
+def _location(location):
+    return location or ''
+
+
+def _upsert(rows):
+    """Adds rows of {product_type_id, location, expiry_date, units, value} to the ledger."""
+    ledger = StockLedger.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = (sqlite.insert if dialect == 'sqlite' else postgresql.insert)(ledger)
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=list(_KEY),
+            set_={'units': ledger.c.units + insert.excluded.units, 'value': ledger.c.value + insert.excluded.value}), rows)
+        return
+    for row in rows:  # no portable upsert elsewhere
+        updated = db.session.execute(
+            ledger.update().where(*(ledger.c[column] == row[column] for column in _KEY))
+            .values(units=ledger.c.units + row['units'], value=ledger.c.value + row['value']))
+        if updated.rowcount == 0: db.session.execute(ledger.insert().values(**row))
+
+
+def record_stock_in(product_type_id, location, expiry_date, units, value):
+    """Books received units (does not commit)."""
+    _upsert([{'product_type_id': product_type_id, 'location': _location(location), 'expiry_date': expiry_date,
+              'units': units, 'value': value}])
+
+
+def record_sales(sold_rows):
+    """Takes sold units off the ledger (does not commit). `sold_rows` are (product_type_id, location,
+    expiry_date, price), one per unit; batches that run out are removed."""
+    deltas = {}
+    for type_id, location, expiry_date, price in sold_rows:
+        key = (type_id, _location(location), expiry_date)
+        units, value = deltas.get(key, (0, 0.0))
+        deltas[key] = (units + 1, value + price)
+    if not deltas: return
+    ledger = StockLedger.__table__
+    matches_key = [ledger.c.product_type_id == bindparam('b_type'), ledger.c.location == bindparam('b_location'),
+                   ledger.c.expiry_date == bindparam('b_expiry')]
+    params = [{'b_type': type_id, 'b_location': location, 'b_expiry': expiry_date, 'b_units': units, 'b_value': value}
+              for (type_id, location, expiry_date), (units, value) in deltas.items()]
+    db.session.execute(ledger.update().where(*matches_key)
+                       .values(units=ledger.c.units - bindparam('b_units'), value=ledger.c.value - bindparam('b_value')), params)
+    db.session.execute(ledger.delete().where(*matches_key, ledger.c.units <= 0),
+                       [{key: value for key, value in p.items() if key in ('b_type', 'b_location', 'b_expiry')} for p in params])
+
+
+def remove_product(product_type_id):
+    """Drops a product type's batches (does not commit)."""
+    ledger = StockLedger.__table__
+    db.session.execute(ledger.delete().where(ledger.c.product_type_id == product_type_id))
+
+
+def _unsold_batches():
+    items = InventoryItem.__table__
+    location = db.func.coalesce(items.c.location, '').label('location')
+    return (db.select(items.c.product_type_id, location, items.c.expiry_date,
+                      db.func.count(items.c.id).label('units'), db.func.sum(items.c.price).label('value'))
+            .where(items.c.is_sold == False)
+            .group_by(items.c.product_type_id, location, items.c.expiry_date))
+
+
+def rebuild_ledger():
+    """Recomputes the whole ledger from inventory_item (does not commit). Returns the batch count."""
+    ledger = StockLedger.__table__
+    db.session.execute(ledger.delete())
+    db.session.execute(ledger.insert().from_select(list(_KEY) + ['units', 'value'], _unsold_batches()))
+    return db.session.execute(db.select(db.func.count()).select_from(ledger)).scalar()
+
+
+def check_ledger(tolerance=0.005):
+    """Differences between the ledger and inventory_item, as [(key, (units, value) expected, (units, value) booked)]."""
+    expected = {tuple(row[:3]): (row.units, row.value or 0.0) for row in db.session.execute(_unsold_batches())}
+    ledger = StockLedger.__table__
+    booked = {tuple(row[:3]): (row.units, row.value) for row in db.session.execute(
+        db.select(ledger.c.product_type_id, ledger.c.location, ledger.c.expiry_date, ledger.c.units, ledger.c.value))}
+    drift = []
+    for key in sorted(set(expected) | set(booked), key=lambda key: (key[0], key[1], key[2])):
+        want, have = expected.get(key, (0, 0.0)), booked.get(key, (0, 0.0))
+        if want[0] != have[0] or abs(want[1] - have[1]) > tolerance: drift.append((key, want, have))
+    return drift
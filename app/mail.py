@@ -0,0 +1,71 @@
+# app/mail.py
+# Mail backends, chosen by MAIL_BACKEND and created once per process in create_app:
+# 'sendgrid' sends through SendGrid, 'console' logs each message, 'memory' keeps them in a list
+# (a local fake sink for tests and benchmarks). Every backend has send(recipient, subject, html).
+
+import logging
+import time
+from flask import current_app
+from . import metrics
+
+log = logging.getLogger(__name__)
+
+
+class SendGridBackend:
+    def __init__(self, api_key, sender):
+        self.api_key = api_key
+        self.sender = sender
+        self.client = None  # created on the first send, so web workers never import sendgrid
+
+    def send(self, recipient, subject, html):
+        """Raises if SendGrid refuses the message, so the outbox retries it."""
+        from sendgrid import SendGridAPIClient
+        from sendgrid.helpers.mail import Mail
+        if self.client is None: self.client = SendGridAPIClient(self.api_key)
+        message = Mail(from_email=self.sender, to_emails=recipient, subject=subject, html_content=html)
+        started = time.perf_counter()
+        try:
+            response = self.client.send(message)
+        finally:
+            metrics.observe('outbound_request_seconds', time.perf_counter() - started, service='sendgrid')
+        if response.status_code >= 300: raise RuntimeError(f"SendGrid answered {response.status_code}")
+        return response.status_code
+
+
+class ConsoleBackend:
+    def send(self, recipient, subject, html):
+        log.info("Email", extra={'recipient': recipient, 'subject': subject, 'html_bytes': len(html)})
+        return 'logged'
+
+
+class MemoryBackend:
+    """Keeps sent messages in `outbox`. `fail_next` makes the next N sends raise, to exercise retries."""
+
+    def __init__(self):
+        self.outbox = []
+        self.fail_next = 0
+
+    def send(self, recipient, subject, html):
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            raise RuntimeError("Simulated mail failure")
+        self.outbox.append({'to': recipient, 'subject': subject, 'html': html})
+        return 'stored'
+
+
+def create_mail_backend(config):
+    """The configured backend, or None when SendGrid is selected but not configured."""
+    backend = config['MAIL_BACKEND']
+    if backend == 'console': return ConsoleBackend()
+    if backend == 'memory': return MemoryBackend()
+    if config.get('SENDGRID_API_KEY') and config.get('SENDER_EMAIL'):
+        return SendGridBackend(config['SENDGRID_API_KEY'], config['SENDER_EMAIL'])
+    return None
+
+
+def init_mail(app):
+    app.extensions['mail'] = create_mail_backend(app.config)
+
+
+def get_mail():
+    return current_app.extensions['mail']
@@ -0,0 +1,119 @@
+# app/metrics.py
+# In-process metrics: latency histograms (cumulative buckets, like Prometheus) and counters, keyed by
+# name plus optional labels, and their Prometheus text rendering for the /metrics endpoint.
+
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PREFIX = 'green_inventory_'
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.sum += seconds
+            for i, upper in enumerate(self.buckets):
+                if seconds <= upper:
+                    self.counts[i] += 1
+                    break
+            else:
+                self.counts[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            cumulative, running = {}, 0
+            for upper, count in zip(self.buckets + (float('inf'),), self.counts):
+                running += count
+                cumulative['+Inf' if upper == float('inf') else str(upper)] = running
+            return {'count': self.count, 'sum': round(self.sum, 6), 'buckets': cumulative}
+
+
+_histograms = {}
+_counters = {}
+_lock = threading.Lock()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def histogram(name, buckets=DEFAULT_BUCKETS, **labels):
+    """The histogram for `name` and `labels`, created with `buckets` on first use."""
+    key = _key(name, labels)
+    with _lock:
+        if key not in _histograms: _histograms[key] = Histogram(buckets)
+        return _histograms[key]
+
+
+def observe(name, seconds, **labels):
+    histogram(name, **labels).observe(seconds)
+
+
+def inc(name, amount=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def histograms_snapshot():
+    """{name: snapshot} for unlabelled histograms, {name{label="value"}: snapshot} for the others."""
+    with _lock:
+        items = list(_histograms.items())
+    return {name + _format_labels(labels): hist.snapshot() for (name, labels), hist in items}
+
+
+def counters_snapshot():
+    with _lock:
+        items = list(_counters.items())
+    return {name + _format_labels(labels): value for (name, labels), value in items}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}' if labels else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(gauges=()):
+    """Every histogram and counter, plus `gauges` given as (name, {labels}, value), in the
+    Prometheus text exposition format. Names get the green_inventory_ prefix."""
+    with _lock:
+        histograms, counters = sorted(_histograms.items()), sorted(_counters.items())
+    lines, typed = [], set()
+
+    def declare(name, kind):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), hist in histograms:
+        name = PREFIX + name
+        declare(name, 'histogram')
+        snapshot = hist.snapshot()
+        for upper, count in snapshot['buckets'].items():
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', upper),))} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_number(snapshot['sum'])}")
+        lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+    for (name, labels), value in counters:
+        name = PREFIX + name
+        declare(name, 'counter')
+        lines.append(f"{name}{_format_labels(labels)} {_number(value)}")
+    for name, labels, value in sorted(gauges, key=lambda gauge: gauge[0]):
+        name = PREFIX + name
+        declare(name, 'gauge')
+        lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {_number(value)}")
+    return '\n'.join(lines) + '\n'
@@ -22,5 +22,121 @@ class InventoryItem(db.Model):
     sold_date = db.Column(db.DateTime, nullable=True)
     product_type_id = db.Column(db.Integer, db.ForeignKey('product_type.id'), nullable=False)
 
+    # The paginated list and the CSV export read (is_sold, product, expiry) in index order. Expiry
+    # and value totals come from the stock ledger, so their indexes here were dropped (b9d4e2f7a613).
+    __table_args__ = (
+        db.Index('ix_inventory_item_unsold_product', 'is_sold', 'product_type_id', 'expiry_date'),
+    )
+
+    def __repr__(self):
+        return f'<InventoryItem {self.unique_rfid_tag}>'
+
+class CarbonFactor(db.Model):
+    # Cached Gemini estimate (kg CO2e per unit), keyed by the normalized product name.
+    # A NULL kg_co2e is a negative entry: the model answered but no number could be parsed.
+    name_key = db.Column(db.String(100), primary_key=True)
+    kg_co2e = db.Column(db.Float, nullable=True)
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CarbonFactor {self.name_key}={self.kg_co2e}>'
+
+
+class InventoryCounter(db.Model):
+    # Named counters bumped in the same transaction as the change they track, e.g. 'inventory' is
+    # incremented on every stock-in, sale and product delete so caches can key on it.
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<InventoryCounter {self.name}={self.value}>'
+
+
+class ChatJob(db.Model):
+    # One chatbot question answered in the background. Identical questions asked against the same
+    # inventory version share a question_key, which is how in-flight requests are coalesced and
+    # recent answers reused.
+    id = db.Column(db.String(32), primary_key=True)
+    question_key = db.Column(db.String(64), nullable=False, index=True)
+    question = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    answer = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<ChatJob {self.id} {self.status}>'
+
+
+class JobRun(db.Model):
+    # One run of a scheduled job for one period (run_key, e.g. the date). The primary key makes
+    # claiming a run an atomic insert, so a restarted or second scheduler can't repeat a finished run.
+    job_name = db.Column(db.String(50), primary_key=True)
+    run_key = db.Column(db.String(50), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='running')
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    detail = db.Column(db.Text, nullable=True)
+
+    def __repr__(self):
+        return f'<JobRun {self.job_name} {self.run_key} {self.status}>'
+
+
+class Notification(db.Model):
+    # The outbound email queue. Alerts are written here and sent by drain_outbox(); dedupe_key is
+    # unique, so enqueueing the same alert twice keeps one row. A row is due when next_attempt_at has
+    # passed: that covers new rows, retries after a backoff, and rows whose sender died mid-send.
+    id = db.Column(db.Integer, primary_key=True)
+    dedupe_key = db.Column(db.String(100), nullable=False, unique=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    html = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_notification_due', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f'<Notification {self.id} {self.recipient} {self.status}>'
+
+
+class StockLedger(db.Model):
+    # Unsold units and their value per (product type, location, expiry date), kept in step with
+    # inventory_item in the same transaction by receive_stock, sell_items and the product delete
+    # (see app/ledger.py). Totals and summaries read this, one row per batch instead of per unit.
+    # Items without a location are booked under '' (a primary key column can't be NULL).
+    product_type_id = db.Column(db.Integer, db.ForeignKey('product_type.id'), primary_key=True)
+    location = db.Column(db.String(120), primary_key=True, default='')
+    expiry_date = db.Column(db.Date, primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    value = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        db.Index('ix_stock_ledger_expiry', 'expiry_date', 'product_type_id', 'location', 'units'),
+    )
+
+    def __repr__(self):
+        return f'<StockLedger {self.product_type_id} {self.location!r} {self.expiry_date} x{self.units}>'
+
+
+class InventoryItemArchive(db.Model):
+    # Sold items moved out of inventory_item by `flask archive-sold`, so the hot table only grows
+    # with stock on hand. No foreign key: the sales history outlives a deleted product type.
+    id = db.Column(db.Integer, primary_key=True)
+    unique_rfid_tag = db.Column(db.String(100), unique=True, nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    stock_in_date = db.Column(db.Date, nullable=False)
+    expiry_date = db.Column(db.Date, nullable=False)
+    location = db.Column(db.String(120))
+    sold_date = db.Column(db.DateTime, nullable=True, index=True)
+    product_type_id = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
     def __repr__(self):
-        return f'<InventoryItem {self.unique_rfid_tag}>'
\ No newline at end of file
+        return f'<InventoryItemArchive {self.unique_rfid_tag}>'
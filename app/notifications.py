@@ -0,0 +1,114 @@
+# app/notifications.py
+# The notification outbox. enqueue() stores an email in the notification table (one row per
+# dedupe_key) and returns at once; drain_outbox() claims a batch of due rows, sends them through the
+# mail backend (app/mail.py) and reschedules failures with exponential backoff. A slow or failing
+# SendGrid therefore never blocks the job that raised the alert, and nothing is lost on a failure.
+
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from . import db, metrics
+from .mail import get_mail
+from .models import Notification
+
+log = logging.getLogger(__name__)
+
+PENDING, SENDING, SENT, DEAD = 'pending', 'sending', 'sent', 'dead'
+
+
+def enqueue(recipient, subject, html, dedupe_key):
+    """Adds an email to the outbox and commits. If an email with the same dedupe_key was queued
+    before (whatever its status), nothing is added and that one is returned instead."""
+    existing = Notification.query.filter_by(dedupe_key=dedupe_key).first()
+    if existing is not None: return existing
+    now = datetime.utcnow()
+    retention = now - timedelta(days=current_app.config['NOTIFY_RETENTION_DAYS'])
+    Notification.query.filter(Notification.status.in_([SENT, DEAD]), Notification.created_at < retention).delete(synchronize_session=False)
+    notification = Notification(dedupe_key=dedupe_key, recipient=recipient, subject=subject, html=html,
+                                status=PENDING, attempts=0, next_attempt_at=now, created_at=now)
+    db.session.add(notification)
+    try:
+        db.session.commit()
+    except IntegrityError:  # queued concurrently by another process
+        db.session.rollback()
+        return Notification.query.filter_by(dedupe_key=dedupe_key).one()
+    return notification
+
+
+def _claim_due(limit):
+    """Marks up to `limit` due rows as sending and returns their ids. The UPDATE re-checks that each
+    row is still due, so two drainers never claim the same row; a claim expires after
+    NOTIFY_SENDING_TIMEOUT, which is how rows left behind by a crashed sender are picked up again."""
+    now = datetime.utcnow()
+    due = db.session.execute(
+        db.select(Notification.id)
+        .where(Notification.status.in_([PENDING, SENDING]), Notification.next_attempt_at <= now)
+        .order_by(Notification.next_attempt_at).limit(limit)
+    ).scalars().all()
+    if not due: return []
+    table = Notification.__table__
+    claimed = db.session.execute(
+        table.update()
+        .where(table.c.id.in_(due), table.c.status.in_([PENDING, SENDING]), table.c.next_attempt_at <= now)
+        .values(status=SENDING, next_attempt_at=now + timedelta(seconds=current_app.config['NOTIFY_SENDING_TIMEOUT']))
+        .returning(table.c.id)
+    ).scalars().all()
+    db.session.commit()
+    return claimed
+
+
+def _backoff(attempts):
+    config = current_app.config
+    return timedelta(seconds=min(config['NOTIFY_BACKOFF_SECONDS'] * 2 ** (attempts - 1), config['NOTIFY_BACKOFF_MAX_SECONDS']))
+
+
+def drain_outbox(limit=None):
+    """Sends up to `limit` (default NOTIFY_BATCH_SIZE) due emails. Each result is committed as soon
+    as it is known, so a crash mid-batch doesn't re-send what already went out.
+    Returns {'sent', 'retrying', 'dead'} counts."""
+    result = {'sent': 0, 'retrying': 0, 'dead': 0}
+    mail = get_mail()
+    if mail is None:
+        log.warning("Email configuration is missing; the outbox is not being drained")
+        return result
+    ids = _claim_due(limit or current_app.config['NOTIFY_BATCH_SIZE'])
+    if not ids: return result
+    for notification in Notification.query.filter(Notification.id.in_(ids)).order_by(Notification.id):
+        notification.attempts += 1
+        try:
+            mail.send(notification.recipient, notification.subject, notification.html)
+        except Exception as e:
+            notification.last_error = str(e)[:1000]
+            if notification.attempts >= current_app.config['NOTIFY_MAX_ATTEMPTS']:
+                notification.status = DEAD
+                result['dead'] += 1
+                log.warning("Giving up on email", extra={'notification_id': notification.id, 'recipient': notification.recipient,
+                                                         'attempts': notification.attempts, 'error': str(e)})
+            else:
+                notification.status = PENDING
+                notification.next_attempt_at = datetime.utcnow() + _backoff(notification.attempts)
+                result['retrying'] += 1
+                log.warning("Email failed, will retry", extra={'notification_id': notification.id, 'recipient': notification.recipient,
+                                                               'attempts': notification.attempts, 'retry_at': notification.next_attempt_at.isoformat(timespec='seconds'),
+                                                               'error': str(e)})
+        else:
+            notification.status = SENT
+            notification.sent_at = datetime.utcnow()
+            result['sent'] += 1
+            metrics.observe('notification_delivery_seconds', (notification.sent_at - notification.created_at).total_seconds())
+        db.session.commit()
+    return result
+
+
+def outbox_stats():
+    """Queue depth (pending + sending), counts per status, the age of the oldest undelivered email
+    in seconds, and the enqueue-to-sent latency histogram."""
+    counts = dict(db.session.query(Notification.status, db.func.count(Notification.id)).group_by(Notification.status).all())
+    oldest = db.session.query(db.func.min(Notification.created_at)).filter(Notification.status.in_([PENDING, SENDING])).scalar()
+    return {
+        'depth': counts.get(PENDING, 0) + counts.get(SENDING, 0),
+        'by_status': counts,
+        'oldest_pending_seconds': round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else 0.0,
+        'delivery_latency': metrics.histogram('notification_delivery_seconds').snapshot(),
+    }
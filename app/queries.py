@@ -0,0 +1,151 @@
+# app/queries.py
+# Aggregate queries shared by the routes, done in the database instead of over ORM objects.
+# Each *_query() builder is also checked by `flask check-query-plans`, so keep them index-friendly.
+# Counts and values of unsold stock come from the stock ledger (app/ledger.py): one row per
+# (product, location, expiry) batch instead of one per unit.
+
+import base64
+import json
+import re
+from datetime import date
+from . import db
+from .models import ProductType, InventoryItem, StockLedger
+
+
+def expiry_scan_query(start_date, end_date):
+    # Unsold units per (expiry date, product type id, location) in the window: a range scan of the
+    # ledger's covering index ix_stock_ledger_expiry, already one row per batch. The product names
+    # are looked up separately for the ids found (a join makes SQLite loop per product and sort).
+    return db.session.query(
+        StockLedger.expiry_date,
+        StockLedger.product_type_id,
+        db.func.nullif(StockLedger.location, '').label('location'),
+        StockLedger.units,
+    ).filter(
+        StockLedger.expiry_date >= start_date,
+        StockLedger.expiry_date <= end_date,
+    )
+
+
+def product_names(type_ids):
+    """{product_type_id: name} for the given ids, in one query."""
+    if not type_ids: return {}
+    return dict(db.session.query(ProductType.id, ProductType.name).filter(ProductType.id.in_(list(type_ids))).all())
+
+
+def stock_totals_query():
+    return db.session.query(db.func.sum(StockLedger.units), db.func.sum(StockLedger.value))
+
+
+def stock_totals():
+    """(number of unsold items, their total value) in one query."""
+    count, value = stock_totals_query().one()
+    return count or 0, value or 0
+
+
+def unsold_export_query(product=None, location=None, expires_before=None):
+    query = db.session.query(InventoryItem.unique_rfid_tag, ProductType.name, InventoryItem.price, InventoryItem.stock_in_date, InventoryItem.expiry_date, InventoryItem.location).join(ProductType).filter(InventoryItem.is_sold == False)
+    if product: query = query.filter(ProductType.name == product)
+    if location: query = query.filter(InventoryItem.location == location)
+    if expires_before: query = query.filter(InventoryItem.expiry_date <= expires_before)
+    return query.order_by(ProductType.name, InventoryItem.expiry_date)
+
+
+def unsold_summary_query():
+    # Unsold units per (product, expiry date), soonest first, summed over the locations in the ledger.
+    return db.session.query(ProductType.name, StockLedger.expiry_date, db.func.sum(StockLedger.units)).join(ProductType).group_by(ProductType.name, StockLedger.expiry_date).order_by(StockLedger.expiry_date, ProductType.name)
+
+
+def hot_queries(today):
+    """The per-route queries whose plans must stay on an index, by name."""
+    return {
+        'expiry.scan': expiry_scan_query(today, today),
+        'dashboard.stock_totals': stock_totals_query(),
+        'download_inventory': unsold_export_query(),
+        'chatbot.inventory_summary': unsold_summary_query(),
+        'full_inventory': _inventory_page_query(False, None, 50),
+        'full_inventory.next_page': _inventory_page_query(False, ('', today, 0), 50),
+        'full_inventory.sold': _inventory_page_query(True, ('', today, 0), 50),
+    }
+
+
+# Hot queries that return rows in index order (paginated pages, the streamed CSV export): a sort
+# would read every matching row before returning the first.
+SORT_FREE_QUERIES = {'download_inventory', 'full_inventory', 'full_inventory.next_page', 'full_inventory.sold'}
+
+
+def plan_problems(name, plan):
+    """What is wrong with a hot query's SQLite plan, given the detail column of EXPLAIN QUERY PLAN:
+    a full scan of inventory_item, an index search on is_sold alone (half the table either way), or
+    a sort in a query that must stream in index order."""
+    problems = []
+    for step in plan:
+        if re.match(r'SCAN inventory_item\b', step):
+            problems.append('full scan of inventory_item')
+        elif re.match(r'SEARCH inventory_item USING (COVERING )?INDEX \w+ \(is_sold=\?\)$', step):
+            problems.append('index search on is_sold alone')
+        elif name in SORT_FREE_QUERIES and re.match(r'USE TEMP B-TREE FOR (\w+ \w+ OF )?ORDER BY', step):
+            problems.append('sorts instead of reading in index order')
+    return problems
+
+
+def check_query_plans(today):
+    """{name: (plan steps, problems)} for every hot query (SQLite only)."""
+    results = {}
+    for name, query in hot_queries(today).items():
+        sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        plan = [row[-1] for row in db.session.execute(db.text('EXPLAIN QUERY PLAN ' + sql))]
+        results[name] = (plan, plan_problems(name, plan))
+    return results
+
+
+def encode_cursor(row):
+    return base64.urlsafe_b64encode(json.dumps([bool(row.is_sold), row.product_name, row.expiry_date.isoformat(), row.id]).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Returns (is_sold, product_name, expiry_date, id), or raises ValueError for a malformed cursor."""
+    try:
+        is_sold, name, expiry, item_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return bool(is_sold), str(name), date.fromisoformat(expiry), int(item_id)
+    except Exception:
+        raise ValueError("Invalid pagination cursor.")
+
+
+def _inventory_page_query(is_sold, after, limit, search=None, location=None, tag=None):
+    # With is_sold fixed the order is (name, expiry, id): the planner walks product_type by its unique
+    # name index and each product's items through ix_inventory_item_unsold_product, so a page costs
+    # about `limit` index reads wherever it starts. SQLite only picks that plan once it has table
+    # statistics, so run `flask analyze-db` after large imports.
+    query = db.session.query(
+        InventoryItem.id, InventoryItem.unique_rfid_tag, InventoryItem.expiry_date, InventoryItem.location,
+        InventoryItem.is_sold, ProductType.name.label('product_name'),
+    ).join(ProductType, InventoryItem.product_type_id == ProductType.id).filter(InventoryItem.is_sold == is_sold)
+    if search: query = query.filter(ProductType.name.ilike(f'%{search}%'))
+    if location: query = query.filter(InventoryItem.location == location)
+    if tag: query = query.filter(InventoryItem.unique_rfid_tag == tag)
+    if after is not None:
+        name, expiry, item_id = after
+        query = query.filter(ProductType.name >= name, db.or_(
+            ProductType.name > name,
+            db.and_(ProductType.name == name, db.or_(
+                InventoryItem.expiry_date > expiry,
+                db.and_(InventoryItem.expiry_date == expiry, InventoryItem.id > item_id)))))
+    return query.order_by(ProductType.name, InventoryItem.expiry_date, InventoryItem.id).limit(limit)
+
+
+def inventory_page(cursor=None, limit=50, status='all', search=None, location=None, tag=None):
+    """One page of the full inventory in (is_sold, product name, expiry, id) order, using keyset
+    pagination. `status` is 'all', 'in_stock' or 'sold'. Returns (rows, next_cursor or None)."""
+    phases = {'in_stock': [False], 'sold': [True]}.get(status, [False, True])
+    after_sold, after = None, None
+    if cursor:
+        after_sold, *after = decode_cursor(cursor)
+        phases = [phase for phase in phases if phase >= after_sold]
+    rows = []
+    for is_sold in phases:
+        resume = after if is_sold == after_sold else None
+        rows += _inventory_page_query(is_sold, resume, limit + 1 - len(rows), search, location, tag).all()
+        if len(rows) > limit: break
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
@@ -1,15 +1,22 @@
 # app/routes.py
 
-from flask import render_template, flash, redirect, url_for, request, jsonify, Blueprint, Response
+from flask import render_template, flash, redirect, url_for, request, jsonify, Blueprint, Response, current_app, stream_with_context, abort
 from app import db
 from .models import ProductType, InventoryItem
-from .forms import AddStockForm, CreateProductTypeForm
-from datetime import date, timedelta, datetime
-import time
-import pandas as pd
-from io import StringIO
-from .chatbot import process_query_with_gemini
-from .scheduler import get_carbon_footprint_from_gemini
+from .forms import AddStockForm, CreateProductTypeForm, DeliveryUploadForm
+from .sales import sell_items, CheckoutError, SOLD, ALREADY_SOLD, UNKNOWN, BUSY
+from .inventory_version import bump_inventory_version
+from .export import iter_csv, gzip_chunks
+from .stock import receive_stock, receive_delivery, parse_delivery_upload, DeliveryError
+from datetime import date, timedelta
+import json
+from .chatbot import AgentError
+from .chat_jobs import submit_question, stream_answer, get_job, DONE, FAILED
+from .carbon import resolve_carbon_factors
+from .expiry import expiry_report
+from .instrumentation import render_metrics
+from .ledger import remove_product
+from . import queries
 
 bp = Blueprint('main', __name__)
 
@@ -17,20 +24,17 @@ bp = Blueprint('main', __name__)
 @bp.route('/')
 @bp.route('/dashboard')
 def dashboard():
-    # ... (code is correct)
-    expiring_items = InventoryItem.query.filter(InventoryItem.expiry_date <= date.today() + timedelta(days=2), InventoryItem.expiry_date >= date.today(), InventoryItem.is_sold == False).all()
-    expiring_summary = {}
-    for item in expiring_items:
-        product_name = item.product_type.name
-        if product_name not in expiring_summary:
-            expiring_summary[product_name] = {'count': 0, 'location': item.location, 'expiry': item.expiry_date, 'carbon': 0}
-        expiring_summary[product_name]['count'] += 1
+    # Grouped in SQL: the expiry report (shared with the daily alert, cached per inventory version)
+    # and one query for the stock totals.
+    report = expiry_report()
+    expiring_summary = {name: dict(data) for name, data in report.by_product().items()}
+    carbon_factors = resolve_carbon_factors(list(expiring_summary))
     for name, data in expiring_summary.items():
-        carbon_per_item = get_carbon_footprint_from_gemini(name)
-        if carbon_per_item: data['carbon'] = carbon_per_item * data['count']
-    total_items = InventoryItem.query.filter_by(is_sold=False).count()
-    total_value = db.session.query(db.func.sum(InventoryItem.price)).filter_by(is_sold=False).scalar() or 0
-    return render_template('index.html', title='Dashboard', expiring_summary=expiring_summary, total_items=total_items, total_value=total_value)
+        carbon_per_item = carbon_factors.get(name)
+        data['carbon'] = carbon_per_item * data['count'] if carbon_per_item else 0
+    total_items, total_value = queries.stock_totals()
+    return render_template('index.html', title='Dashboard', expiring_summary=expiring_summary, total_items=total_items, total_value=total_value,
+                           horizon=report.horizons[-1])
 
 # --- NEW ROUTE for the Power BI Dashboard ---
 @bp.route('/analytics_dashboard')
@@ -60,7 +64,11 @@ def delete_product_type(product_type_id):
     # ... (code is correct)
     product_to_delete = ProductType.query.get_or_404(product_type_id)
     try:
+        # Bulk deletes: the items one statement, the ledger batches another (the ORM cascade would load every item).
+        InventoryItem.query.filter_by(product_type_id=product_type_id).delete(synchronize_session=False)
+        remove_product(product_type_id)
         db.session.delete(product_to_delete)
+        bump_inventory_version()
         db.session.commit()
         flash(f'Product Type "{product_to_delete.name}" and all its inventory have been successfully deleted.', 'success')
     except Exception as e:
@@ -72,16 +80,45 @@ def delete_product_type(product_type_id):
 def add_stock():
     # ... (code is correct)
     form = AddStockForm()
+    upload_form = DeliveryUploadForm()
     if form.validate_on_submit():
         product_type = form.product_type.data
-        for i in range(form.quantity.data):
-            unique_tag = f"{product_type.id}-{int(time.time())}-{i+1}"
-            new_item = InventoryItem(unique_rfid_tag=unique_tag, price=product_type.default_price, stock_in_date=form.stock_in_date.data, expiry_date=form.expiry_date.data, location=form.location.data, product_type_id=product_type.id)
-            db.session.add(new_item)
+        receive_stock(product_type, form.quantity.data, form.stock_in_date.data, form.expiry_date.data, form.location.data)
         db.session.commit()
         flash(f'{form.quantity.data} items for "{product_type.name}" have been added.', 'success')
         return redirect(url_for('main.dashboard'))
-    return render_template('add_stock.html', title='Receive Stock', form=form)
+    return render_template('add_stock.html', title='Receive Stock', form=form, upload_form=upload_form)
+
+@bp.route('/add_delivery', methods=['POST'])
+def add_delivery():
+    upload_form = DeliveryUploadForm()
+    if upload_form.validate_on_submit():
+        try:
+            received = receive_delivery(parse_delivery_upload(upload_form.delivery_file.data.read()))
+        except DeliveryError as e:
+            flash(f'Error: {e}', 'danger')
+            return redirect(url_for('main.add_stock'))
+        flash(f'{sum(line["quantity"] for line in received)} items across {len(received)} delivery lines have been added.', 'success')
+        return redirect(url_for('main.dashboard'))
+    for errors in upload_form.errors.values():
+        flash(f'Error: {errors[0]}', 'danger')
+    return redirect(url_for('main.add_stock'))
+
+@bp.route('/api/stock_intake', methods=['POST'])
+def stock_intake():
+    # Accepts {"items": [{product_type_id | product_name, quantity, stock_in_date, expiry_date, location}, ...]}
+    # or a text/csv body with those columns, and returns every generated tag in one response.
+    try:
+        if request.mimetype == 'text/csv':
+            lines = parse_delivery_upload(request.get_data())
+        else:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict): raise DeliveryError('Expected a JSON object {"items": [...]} or a text/csv body.')
+            lines = data.get('items') or []
+        received = receive_delivery(lines)
+    except DeliveryError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'received': sum(line['quantity'] for line in received), 'lines': received}), 201
 
 @bp.route('/sales_terminal', methods=['GET', 'POST'])
 def sales_terminal():
@@ -91,42 +128,131 @@ def sales_terminal():
         if not rfid_tag:
             flash('Please enter an RFID Tag.', 'danger')
             return redirect(url_for('main.sales_terminal'))
-        item = InventoryItem.query.filter_by(unique_rfid_tag=rfid_tag).first()
-        if not item:
+        result = sell_items([rfid_tag])[0]
+        if result['status'] == UNKNOWN:
             flash(f'Error: RFID Tag "{rfid_tag}" not found.', 'danger')
-        elif item.is_sold:
+        elif result['status'] == ALREADY_SOLD:
             flash(f'Warning: Item with tag "{rfid_tag}" was already sold.', 'warning')
+        elif result['status'] == BUSY:
+            flash(f'Warning: Item with tag "{rfid_tag}" is being checked out at another till; please scan it again.', 'warning')
         else:
-            item.is_sold = True
-            item.sold_date = datetime.utcnow()
-            db.session.commit()
-            flash(f'Success: Sold "{item.product_type.name}" (Tag: {rfid_tag})', 'success')
+            flash(f'Success: Sold "{result["product"]}" (Tag: {rfid_tag})', 'success')
         return redirect(url_for('main.sales_terminal'))
     return render_template('sales_terminal.html', title='Sales Terminal')
 
-# --- NEW FUNCTION TO DISPLAY ALL INVENTORY ---
+@bp.route('/api/sales/checkout', methods=['POST'])
+def checkout():
+    # Accepts {"tags": [...]} for a whole basket and reports an outcome per tag.
+    data = request.get_json(silent=True)
+    tags = data.get('tags') if isinstance(data, dict) else None
+    if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        return jsonify({'error': 'Expected {"tags": [<rfid tag>, ...]}.'}), 400
+    try:
+        results = sell_items(tags)
+    except CheckoutError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'sold': sum(1 for r in results if r['status'] == SOLD), 'results': results})
+
+# --- FULL INVENTORY (paginated page + JSON for infinite scroll) ---
+def _inventory_page_args():
+    filters = {
+        'status': request.args.get('status', 'all'),
+        'search': request.args.get('q', '').strip() or None,
+        'location': request.args.get('location', '').strip() or None,
+        'tag': request.args.get('tag', '').strip() or None,
+    }
+    page_size = current_app.config['FULL_INVENTORY_PAGE_SIZE']
+    limit = max(1, min(request.args.get('limit', page_size, type=int), 4 * page_size))
+    return request.args.get('cursor') or None, limit, filters
+
 @bp.route('/full_inventory')
 def full_inventory():
-    # Query all items, join with their product type, and order them
-    # This puts all the "In Stock" items at the top
-    items = InventoryItem.query.join(ProductType).order_by(InventoryItem.is_sold, ProductType.name, InventoryItem.expiry_date).all()
-    return render_template('full_inventory.html', title='Full Inventory List', items=items)
+    # Keyset-paginated: in-stock items first, then by product name and expiry date.
+    cursor, limit, filters = _inventory_page_args()
+    try:
+        items, next_cursor = queries.inventory_page(cursor, limit, **filters)
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('main.full_inventory'))
+    return render_template('full_inventory.html', title='Full Inventory List', items=items, next_cursor=next_cursor, filters=filters)
+
+@bp.route('/api/inventory')
+def inventory_api():
+    # JSON variant of /full_inventory for infinite scroll; pass back next_cursor to get the next page.
+    cursor, limit, filters = _inventory_page_args()
+    try:
+        items, next_cursor = queries.inventory_page(cursor, limit, **filters)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'items': [{'id': item.id, 'rfid_tag': item.unique_rfid_tag, 'product_name': item.product_name,
+                   'expiry_date': item.expiry_date.isoformat(), 'location': item.location, 'is_sold': bool(item.is_sold)}
+                  for item in items],
+        'next_cursor': next_cursor,
+    })
 
 # --- (Download and Chatbot routes are unchanged) ---
 @bp.route('/download_inventory')
 def download_inventory():
-    # ... (code is correct)
-    items_in_stock = db.session.query(InventoryItem.unique_rfid_tag, ProductType.name, InventoryItem.price, InventoryItem.stock_in_date, InventoryItem.expiry_date, InventoryItem.location).join(ProductType).filter(InventoryItem.is_sold == False).order_by(ProductType.name, InventoryItem.expiry_date).all()
-    df = pd.DataFrame(items_in_stock, columns=['RFID_Tag', 'Product_Name', 'Price', 'Stock_In_Date', 'Expiry_Date', 'Location'])
-    csv_output = StringIO()
-    df.to_csv(csv_output, index=False)
-    csv_output.seek(0)
-    return Response(csv_output, mimetype="text/csv", headers={"Content-Disposition": "attachment;filename=inventory_report.csv"})
+    # Streams the CSV instead of building it in memory. Optional filters: ?product=, ?location=,
+    # ?expires_within=<days>; add ?gzip=1 for a compressed download.
+    expires_within = request.args.get('expires_within', type=int)
+    query = queries.unsold_export_query(
+        product=request.args.get('product') or None,
+        location=request.args.get('location') or None,
+        expires_before=date.today() + timedelta(days=expires_within) if expires_within is not None else None,
+    )
+    chunks = iter_csv(query, batch_size=current_app.config['EXPORT_BATCH_SIZE'])
+    filename = 'inventory_report.csv'
+    if request.args.get('gzip') in ('1', 'true', 'yes'):
+        chunks, filename = gzip_chunks(chunks), filename + '.gz'
+        mimetype = 'application/gzip'
+    else:
+        mimetype = 'text/csv'
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers={"Content-Disposition": f"attachment;filename={filename}"})
+
+def _sse(payload):
+    return f"data: {json.dumps(payload)}\n\n"
+
+def _chat_event_stream(question):
+    try:
+        for piece in stream_answer(question):
+            yield _sse({'delta': piece})
+        yield _sse({'done': True})
+    except AgentError as e:
+        yield _sse({'error': str(e)})
+    except Exception as e:
+        yield _sse({'error': f"An error occurred in the AI agent loop: {e}"})
 
 @bp.route('/api/chatbot', methods=['POST'])
 def chatbot_response():
-    # ... (code is correct)
-    data = request.get_json()
-    question = data.get('question')
-    response = process_query_with_gemini(question)
-    return jsonify({'answer': response})
\ No newline at end of file
+    # Clients that accept text/event-stream get the answer streamed as it is written. Otherwise:
+    # answers from cache when possible, or queues the question and returns 202 with a job to poll.
+    data = request.get_json(silent=True)
+    question = data.get('question') if isinstance(data, dict) else None
+    question = question.strip() if isinstance(question, str) else ''
+    if not question: return jsonify({'error': 'Please ask a question.'}), 400
+    wants_stream = 'text/event-stream' in request.headers.get('Accept', '') or request.args.get('stream') == '1'
+    if wants_stream and current_app.config['CHAT_STREAMING']:
+        return Response(stream_with_context(_chat_event_stream(question)), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    job, answer = submit_question(question)
+    if answer is not None:
+        return jsonify({'status': 'done', 'answer': answer, 'job_id': job.id if job else None})
+    return jsonify({'status': job.status, 'job_id': job.id, 'poll_url': url_for('main.chatbot_job', job_id=job.id)}), 202
+
+@bp.route('/api/chatbot/<job_id>')
+def chatbot_job(job_id):
+    job = get_job(job_id)
+    if job is None: return jsonify({'error': 'Unknown chat job.'}), 404
+    body = {'job_id': job.id, 'status': job.status}
+    if job.status in (DONE, FAILED): body['answer'] = job.answer
+    return jsonify(body)
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    # Prometheus scrape target: request/SQL/outbound/job histograms and counters, cache and outbox gauges.
+    if not current_app.config['METRICS_ENABLED']: abort(404)
+    token = current_app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}': abort(401)
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
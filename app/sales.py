@@ -0,0 +1,91 @@
+# app/sales.py
+# Checkout: marks a basket of RFID tags as sold with one set-based UPDATE in a single transaction.
+
+from datetime import datetime
+from flask import current_app
+from . import db
+from .models import ProductType, InventoryItem, InventoryItemArchive
+from .inventory_version import bump_inventory_version_now
+from .database import supports_skip_locked
+from .ledger import record_sales
+
+SOLD, ALREADY_SOLD, UNKNOWN, DUPLICATE, BUSY = 'sold', 'already_sold', 'unknown', 'duplicate', 'busy'
+
+
+class CheckoutError(ValueError):
+    """A basket that can't be processed at all (empty or too large)."""
+
+
+def sell_statement(basket, skip_locked):
+    """The UPDATE that sells the still-unsold tags of `basket`, RETURNing what each sold row takes
+    off the stock ledger. With `skip_locked` (Postgres) the rows are locked first, skipping those
+    another lane has locked (it is selling them), so concurrent checkouts never queue behind each
+    other's row locks."""
+    items = InventoryItem.__table__
+    in_stock = db.and_(items.c.unique_rfid_tag.in_(basket), items.c.is_sold == False)
+    if skip_locked:
+        in_stock = items.c.id.in_(db.select(items.c.id).where(in_stock).with_for_update(skip_locked=True).scalar_subquery())
+    return (items.update()
+            .where(in_stock)
+            .values(is_sold=True, sold_date=datetime.utcnow())
+            .returning(items.c.unique_rfid_tag, items.c.product_type_id, items.c.location, items.c.expiry_date, items.c.price))
+
+
+def sell_items(tags):
+    """Sells every tag in the basket that is still in stock. Returns [{'tag', 'status', 'product'}],
+    one per scan in basket order, where status is 'sold', 'already_sold' or 'unknown'; a tag scanned
+    again later in the same basket is reported as 'duplicate'.
+
+    The UPDATE only matches rows that are still unsold and RETURNs the ones it changed, so when two
+    lanes scan the same tag concurrently exactly one of them reports it as sold. On Postgres a tag
+    locked by another lane is skipped rather than waited for; it is reported as 'busy' (scan it
+    again) unless that lane's sale has already committed, as the other lane may yet roll back."""
+    scans = [tag.strip() for tag in tags if tag and tag.strip()]
+    if not scans: raise CheckoutError("No RFID tags were scanned.")
+    max_tags = current_app.config['SALES_BATCH_MAX_TAGS']
+    if len(scans) > max_tags: raise CheckoutError(f"A checkout can contain at most {max_tags} tags.")
+    basket = list(dict.fromkeys(scans))
+    items = InventoryItem.__table__
+    try:
+        sold_rows = db.session.execute(sell_statement(basket, supports_skip_locked(db.session))).all()
+        sold = {row.unique_rfid_tag: row.product_type_id for row in sold_rows}
+        rest = [tag for tag in basket if tag not in sold]
+        existing, busy = {}, set()
+        if rest:
+            for tag, product_type_id, is_sold in db.session.execute(
+                    db.select(items.c.unique_rfid_tag, items.c.product_type_id, items.c.is_sold).where(items.c.unique_rfid_tag.in_(rest))):
+                existing[tag] = product_type_id
+                # Still unsold after our UPDATE: only a row another lane holds locked (Postgres) is skipped.
+                if not is_sold: busy.add(tag)
+        missing = [tag for tag in rest if tag not in existing]
+        if missing:  # sold long ago and archived (see app/archive.py)
+            existing.update(db.session.execute(
+                db.select(InventoryItemArchive.unique_rfid_tag, InventoryItemArchive.product_type_id)
+                .where(InventoryItemArchive.unique_rfid_tag.in_(missing))
+            ).all())
+        type_ids = set(sold.values()) | set(existing.values())
+        names = dict(db.session.execute(
+            db.select(ProductType.id, ProductType.name).where(ProductType.id.in_(type_ids))
+        ).all()) if type_ids else {}
+        if sold: record_sales([(row.product_type_id, row.location, row.expiry_date, row.price) for row in sold_rows])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if sold: bump_inventory_version_now()  # outside the locked transaction, see bump_inventory_version_now
+    results, seen = [], set()
+    for tag in scans:
+        if tag in seen:
+            product_type_id = sold.get(tag, existing.get(tag))
+            results.append({'tag': tag, 'status': DUPLICATE, 'product': names.get(product_type_id)})
+            continue
+        seen.add(tag)
+        if tag in sold:
+            results.append({'tag': tag, 'status': SOLD, 'product': names.get(sold[tag])})
+        elif tag in busy:
+            results.append({'tag': tag, 'status': BUSY, 'product': names.get(existing[tag])})
+        elif tag in existing:
+            results.append({'tag': tag, 'status': ALREADY_SOLD, 'product': names.get(existing[tag])})
+        else:
+            results.append({'tag': tag, 'status': UNKNOWN, 'product': None})
+    return results
@@ -1,64 +1,165 @@
 # app/scheduler.py (Final Corrected Version)
+# Scheduled jobs and where they run. With SCHEDULER_MODE = 'leader' each process tries a
+# non-blocking lock on SCHEDULER_LOCK_FILE and only the winner starts a scheduler thread, so N
+# gunicorn workers mean one scheduler, not N. Each run is also claimed in the job_run table under
+# its date, and alerts go through the notification outbox with a per-day dedupe key, so a restart,
+# a second host or worker.py can't send the same alert twice.
 
-from datetime import date, timedelta
-from .models import InventoryItem
-import google.generativeai as genai
-from flask import current_app
-import re
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+import logging
+import os
+from datetime import datetime, timedelta
+from flask import current_app, render_template
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from . import db
+from .carbon import resolve_carbon_factors
+from .expiry import expiry_report, alert_recipients, bucket_label
+from .instrumentation import timed_job
+from .mail import get_mail
+from .models import JobRun
+from .notifications import enqueue, drain_outbox
 
-def get_carbon_footprint_from_gemini(product_name):
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, every process counts as the leader (job_run still dedupes).
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+RUNNING, DONE, FAILED = 'running', 'done', 'failed'
+EXPIRY_JOB = 'expiry_alert'
+
+_lock_handle = None
+
+
+def _acquire_leader_lock(path):
+    """True if this process now holds the scheduler lock. The lock lives as long as the process."""
+    global _lock_handle
+    if fcntl is None: return True
+    handle = open(path, 'a+')
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    handle.seek(0)
+    handle.truncate()
+    handle.write(str(os.getpid()))
+    handle.flush()
+    _lock_handle = handle
+    return True
+
+
+def add_jobs(scheduler, app, run_now=False):
+    # Checked every SCHEDULER_INTERVAL_MINUTES: the job itself decides whether today's run is due,
+    # so a late start, a restart or a failed send is picked up on the next check.
+    options = {'next_run_time': datetime.now()} if run_now else {}
+    scheduler.add_job(id='expiry_check_job', func=timed_job, args=['expiry_check', check_expiring_products, app], trigger="interval",
+                      minutes=app.config['SCHEDULER_INTERVAL_MINUTES'], coalesce=True, max_instances=1, **options)
+    # Without a mail backend there is nothing to drain into; queued alerts wait for a restart with one.
+    if app.extensions.get('mail') is None:
+        log.warning("Email configuration is missing; the notification outbox will not be drained")
+        return
+    # Runs every few seconds, so its routine "Job finished" lines are logged at DEBUG.
+    scheduler.add_job(id='outbox_drain_job', func=timed_job, args=['outbox_drain', drain_outbox_job, app],
+                      kwargs={'log_level': logging.DEBUG}, trigger="interval",
+                      seconds=app.config['NOTIFY_DRAIN_SECONDS'], coalesce=True, max_instances=1, **options)
+
+
+def init_scheduler(app):
+    """Starts the background scheduler in this process if SCHEDULER_MODE allows it. Returns it, or None."""
+    mode = app.config['SCHEDULER_MODE']
+    if mode == 'off': return None
+    if mode == 'leader' and not _acquire_leader_lock(app.config['SCHEDULER_LOCK_FILE']): return None
+    from apscheduler.schedulers.background import BackgroundScheduler
+    scheduler = BackgroundScheduler(daemon=True)
+    add_jobs(scheduler, app)
+    scheduler.start()
+    log.info("Scheduler started", extra={'pid': os.getpid(), 'mode': mode})
+    return scheduler
+
+
+def claim_job_run(job_name, run_key):
+    """True if the caller should perform (job_name, run_key): nobody has claimed it yet, or the
+    earlier attempt failed or went stale (still 'running' after SCHEDULER_STALE_MINUTES)."""
+    now = datetime.utcnow()
     try:
-        api_key = current_app.config['GEMINI_API_KEY']
-        if not api_key: return None
-        genai.configure(api_key=api_key)
-        
-        # THE FIX IS HERE: Use the universal 'gemini-pro' model
-        model = genai.GenerativeModel('gemini-pro')
-        
-        prompt = f"What is the estimated average carbon footprint (in kg of CO2 equivalent) for one unit of '{product_name}'? Provide only the number."
-        response = model.generate_content(prompt)
-        match = re.search(r'(\d+\.?\d*)', response.text)
-        return float(match.group(1)) if match else None
-    except Exception: return None
-
-def check_expiring_products(app):
+        db.session.add(JobRun(job_name=job_name, run_key=run_key, status=RUNNING, started_at=now))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+    stale = now - timedelta(minutes=current_app.config['SCHEDULER_STALE_MINUTES'])
+    result = db.session.execute(
+        db.update(JobRun)
+        .where(JobRun.job_name == job_name, JobRun.run_key == run_key,
+               or_(JobRun.status == FAILED, and_(JobRun.status == RUNNING, JobRun.started_at < stale)))
+        .values(status=RUNNING, started_at=now, finished_at=None, detail=None)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def finish_job_run(job_name, run_key, status, detail=None):
+    run = db.session.get(JobRun, (job_name, run_key))
+    run.status, run.finished_at, run.detail = status, datetime.utcnow(), detail
+    db.session.commit()
+
+
+def drain_outbox_job(app):
     with app.app_context():
-        # ... (The rest of this function is correct and does not need changes)
-        # ... (it will now use the corrected get_carbon_footprint_from_gemini function)
-        sender_email = app.config.get('SENDER_EMAIL')
-        store_manager_email = app.config.get('STORE_MANAGER_EMAIL')
-        sendgrid_api_key = app.config.get('SENDGRID_API_KEY')
-        if not all([sender_email, store_manager_email, sendgrid_api_key]):
-            print("--- Email configuration is missing. ---")
-            return
-        target_date = date.today() + timedelta(days=2)
-        expiring_items = InventoryItem.query.filter(InventoryItem.expiry_date == target_date, InventoryItem.is_sold == False).all()
-        if not expiring_items:
-            print("--- No expiring items to report today. ---")
+        drain_outbox()
+
+
+def check_expiring_products(app, now=None):
+    """Queues today's expiry alerts, one email per recipient covering their locations bucketed by
+    days left, then drains the outbox so they go out straight away when the mail service is up."""
+    with app.app_context():
+        now = now or datetime.now()
+        if now.hour < app.config['EXPIRY_ALERT_HOUR']: return
+        if get_mail() is None:
+            log.warning("Email configuration is missing; expiry alerts are not being sent")
             return
-        print("\n--- Preparing Daily Expiry & Carbon Alert ---")
-        expiring_summary = {}
-        for item in expiring_items:
-            name = item.product_type.name
-            if name not in expiring_summary: expiring_summary[name] = {'count': 0}
-            expiring_summary[name]['count'] += 1
-        email_subject = f"Urgent: Expiry Alert for {target_date.strftime('%B %d, %Y')}"
-        email_body_html = "<h1>Daily Green IT Expiry Alert</h1><p>The following items require your immediate attention:</p><hr>"
-        for name, data in expiring_summary.items():
-            carbon = get_carbon_footprint_from_gemini(name)
-            email_body_html += f"<h3>{data['count']}x {name}</h3>"
-            if carbon:
-                total_carbon = carbon * data['count']
-                email_body_html += f"<p style='color:green;'><b>Action:</b> Prioritize selling this batch to prevent a potential waste of <b>{total_carbon:.2f} kg of CO2e</b>.</p>"
-            else:
-                email_body_html += "<p><b>Action:</b> Prioritize selling this batch to prevent product waste.</p>"
-        email_body_html += "<hr><p>This is an automated alert from your Green Inventory Pro system.</p>"
-        message = Mail(from_email=sender_email, to_emails=store_manager_email, subject=email_subject, html_content=email_body_html)
+        run_key = now.date().isoformat()
+        if not claim_job_run(EXPIRY_JOB, run_key): return
         try:
-            sg = SendGridAPIClient(sendgrid_api_key)
-            response = sg.send(message)
-            print(f"--- Expiry alert email sent successfully! Status Code: {response.status_code} ---")
+            queued = queue_expiry_alerts(now.date())
+            status, detail = DONE, f"queued {queued} alert(s)"
         except Exception as e:
-            print(f"--- FAILED TO SEND EMAIL via SendGrid: {e} ---")
+            status, detail = FAILED, str(e)
+            log.exception("Expiry alert failed", extra={'run_key': run_key})
+        finish_job_run(EXPIRY_JOB, run_key, status, detail)
+        if status == DONE and queued: drain_outbox()
+
+
+def queue_expiry_alerts(today):
+    """Renders and enqueues one alert per recipient for `today`. Returns how many were queued.
+    The dedupe key is the day and recipient, so a retried run only adds the ones still missing."""
+    report = expiry_report(today)
+    if not report.batches:
+        log.info("No expiring items to report today")
+        return 0
+    recipients = alert_recipients(report)
+    if not recipients:
+        log.warning("No alert recipient for the expiring locations (set STORE_MANAGER_EMAIL or LOCATION_MANAGERS)")
+        return 0
+    log.info("Preparing the daily expiry and carbon alert", extra={'date': today.isoformat(), 'batches': len(report.batches)})
+    carbon_factors = resolve_carbon_factors(report.product_names())
+    subject = f"Urgent: Expiry Alert for {today.strftime('%B %d, %Y')}"
+    for recipient, locations in recipients.items():
+        sections = []
+        for location, batches in locations.items():
+            buckets = []
+            for horizon, bucket in report.buckets(batches).items():
+                if not bucket: continue
+                products = report.by_product(bucket)
+                for name, data in products.items():
+                    carbon = carbon_factors.get(name)
+                    data['carbon'] = carbon * data['count'] if carbon else 0
+                buckets.append((bucket_label(horizon), products))
+            sections.append((location, buckets))
+        email_subject = subject + (f" ({next(iter(locations)) or 'no location'})" if len(locations) == 1 else "")
+        html = render_template('email/expiry_alert.html', sections=sections)
+        enqueue(recipient, email_subject, html, dedupe_key=f"{EXPIRY_JOB}:{today.isoformat()}:{recipient}"[:100])
+    log.info("Queued expiry alerts", extra={'alerts': len(recipients)})
+    return len(recipients)
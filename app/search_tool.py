@@ -0,0 +1,83 @@
+# app/search_tool.py
+# The chatbot's web-search tool. Results are cached by normalized query (LRU + TTL) and cut down
+# to a compact observation (answer box, then the top-K titles, snippets and links) before they
+# go into the second ReAct prompt, instead of the whole raw Serper JSON.
+
+import json
+from flask import current_app
+from .cache import TTLCache
+from .clients import get_clients
+
+_cache = None
+# raw_chars/observation_chars count every observation handed to the model, cached or not, so
+# their difference is the prompt text the trimming saved; 'searches' counts actual Serper calls.
+_stats = {'searches': 0, 'errors': 0, 'observations': 0, 'raw_chars': 0, 'observation_chars': 0}
+
+
+def normalize_query(query):
+    return ' '.join(query.lower().split())
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = TTLCache(maxsize=current_app.config['SEARCH_CACHE_SIZE'], ttl=current_app.config['SEARCH_CACHE_TTL'])
+    return _cache
+
+
+def _clip(text, limit):
+    text = ' '.join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + '…'
+
+
+def compact_observation(raw, top_k=5, snippet_chars=300):
+    """Turns a raw Serper response (JSON text) into a few short lines for the prompt.
+    Text that isn't JSON is returned clipped, so an unexpected body still reaches the model."""
+    try:
+        data = json.loads(raw)
+    except (TypeError, ValueError):
+        return _clip(raw, snippet_chars * top_k)
+    lines = []
+    answer_box = data.get('answerBox') or {}
+    answer = answer_box.get('answer') or answer_box.get('snippet')
+    if answer: lines.append(f"Answer: {_clip(answer, snippet_chars)}")
+    graph = data.get('knowledgeGraph') or {}
+    if graph.get('description'): lines.append(f"{graph.get('title', 'Summary')}: {_clip(graph['description'], snippet_chars)}")
+    for i, result in enumerate((data.get('organic') or [])[:top_k], 1):
+        lines.append(f"{i}. {_clip(result.get('title', ''), 120)} - {_clip(result.get('snippet', ''), snippet_chars)} ({result.get('link', '')})")
+    return '\n'.join(lines) if lines else "No results found."
+
+
+def search(query):
+    """Returns a compact observation for `query`, from the cache when a fresh one exists.
+    Errors are returned as text (the model sees them) and are not cached."""
+    key = normalize_query(query)
+    cache = _get_cache()
+    entry = cache.get(key)
+    if entry is not None: return _observed(*entry)
+    serper = get_clients().serper
+    if serper is None: return "Error: Serper API key not configured."
+    try:
+        raw = serper.search(query)
+    except Exception as e:
+        _stats['errors'] += 1
+        return f"An error occurred during web search: {e}"
+    config = current_app.config
+    observation = compact_observation(raw, config['SEARCH_TOP_K'], config['SEARCH_SNIPPET_CHARS'])
+    _stats['searches'] += 1
+    cache.set(key, (observation, len(raw)))
+    return _observed(observation, len(raw))
+
+
+def _observed(observation, raw_chars):
+    _stats['observations'] += 1
+    _stats['raw_chars'] += raw_chars
+    _stats['observation_chars'] += len(observation)
+    return observation
+
+
+def search_cache_stats():
+    stats = dict(_stats)
+    stats.update(_cache.stats() if _cache is not None else {'size': 0, 'hits': 0, 'misses': 0, 'hit_rate': 0.0})
+    stats['prompt_chars_saved'] = stats['raw_chars'] - stats['observation_chars']
+    return stats
@@ -44,6 +44,51 @@ document.addEventListener('DOMContentLoaded', function() {
     addMessage("Hello! I'm Green-Ops AI. Ask me about your inventory, or any other topic!", 'bot');
 
 
+    /**
+     * Polls a chat job until it has an answer (or gives up after about two minutes).
+     * @param {string} pollUrl - The job URL returned by /api/chatbot.
+     */
+    async function waitForAnswer(pollUrl) {
+        for (let attempt = 0; attempt < 160; attempt++) {
+            await new Promise(resolve => setTimeout(resolve, attempt < 10 ? 300 : 1000));
+            const response = await fetch(pollUrl);
+            if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+            const data = await response.json();
+            if (data.status === 'done' || data.status === 'failed') return data;
+        }
+        throw new Error('Timed out waiting for the answer');
+    }
+
+    /**
+     * Reads a Server-Sent Events answer, writing each piece into the bubble as it arrives.
+     * @param {Response} response - The streaming response from /api/chatbot.
+     * @param {HTMLElement} content - The bot message's content element.
+     */
+    async function readAnswerStream(response, content) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let answer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+            for (const event of events) {
+                if (!event.startsWith('data: ')) continue;
+                const data = JSON.parse(event.slice(6));
+                if (data.error) throw new Error(data.error);
+                if (data.done) return answer;
+                answer += data.delta;
+                content.innerText = answer;
+                chatWindow.scrollTop = chatWindow.scrollHeight;
+            }
+        }
+        if (!answer) throw new Error('The answer stream ended early');
+        return answer;
+    }
+
     async function handleUserMessage() {
         const question = chatInput.value.trim();
         if (!question) return;
@@ -58,13 +103,22 @@ document.addEventListener('DOMContentLoaded', function() {
         try {
             const response = await fetch('/api/chatbot', {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream, application/json' },
                 body: JSON.stringify({ question: question })
             });
 
-            if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+            if (!response.ok && response.status !== 202) throw new Error(`HTTP error! status: ${response.status}`);
+
+            // Streamed answer: the "typing" bubble becomes the answer and fills in as it is written
+            const contentType = response.headers.get('Content-Type') || '';
+            if (contentType.startsWith('text/event-stream') && response.body) {
+                await readAnswerStream(response, typingIndicator.querySelector('.message-content'));
+                return;
+            }
             
-            const data = await response.json();
+            let data = await response.json();
+            // The answer is computed in the background: poll the job until it is finished
+            if (data.status !== 'done') data = await waitForAnswer(data.poll_url);
             
             // Remove the "typing" indicator and add the real response
             typingIndicator.remove();
@@ -0,0 +1,112 @@
+# app/stock.py
+# Stock intake: set-based inserts for a whole delivery (one or many product types) in one transaction.
+
+import csv
+from datetime import date
+from io import StringIO
+from flask import current_app
+from . import db
+from .models import ProductType, InventoryItem
+from .tags import allocate_tags
+from .inventory_version import bump_inventory_version
+from .ledger import record_stock_in
+
+DELIVERY_FIELDS = ['product_type_id', 'product_name', 'quantity', 'stock_in_date', 'expiry_date', 'location']
+
+
+class DeliveryError(ValueError):
+    """A delivery line that can't be received (unknown product, bad quantity or date)."""
+
+
+def _insert_items(rows):
+    chunk_size = current_app.config['STOCK_INTAKE_CHUNK_SIZE']
+    for start in range(0, len(rows), chunk_size):
+        db.session.execute(InventoryItem.__table__.insert(), rows[start:start + chunk_size])
+
+
+def receive_stock(product_type, quantity, stock_in_date, expiry_date, location):
+    """Inserts `quantity` units of one product type with executemany, in chunks, and books them in
+    the stock ledger. Does not commit. Returns the generated RFID tags."""
+    tags = allocate_tags(product_type.id, quantity)
+    rows = [{'unique_rfid_tag': tag, 'price': product_type.default_price, 'stock_in_date': stock_in_date,
+             'expiry_date': expiry_date, 'location': location, 'is_sold': False, 'product_type_id': product_type.id}
+            for tag in tags]
+    _insert_items(rows)
+    record_stock_in(product_type.id, location, expiry_date, quantity, quantity * product_type.default_price)
+    bump_inventory_version()
+    return tags
+
+
+def _parse_date(value, field):
+    if isinstance(value, date): return value
+    try:
+        return date.fromisoformat(str(value).strip())
+    except ValueError:
+        raise DeliveryError(f"{field} must be a YYYY-MM-DD date, got '{value}'.")
+
+
+def _resolve_lines(lines):
+    """Validates raw delivery lines (dicts) and looks all their product types up in one query."""
+    raw_ids = {str(line.get('product_type_id') or '').strip() for line in lines} - {''}
+    if any(not raw_id.isdigit() for raw_id in raw_ids):
+        raise DeliveryError("product_type_id must be a whole number.")
+    ids = {int(raw_id) for raw_id in raw_ids}
+    names = {str(line['product_name']).strip().title() for line in lines if str(line.get('product_name') or '').strip()}
+    product_types = ProductType.query.filter(db.or_(ProductType.id.in_(ids), ProductType.name.in_(names))).all()
+    by_id = {pt.id: pt for pt in product_types}
+    by_name = {pt.name: pt for pt in product_types}
+    max_units = current_app.config['STOCK_INTAKE_MAX_UNITS']
+    resolved, total = [], 0
+    for number, line in enumerate(lines, start=1):
+        raw_id, raw_name = str(line.get('product_type_id') or '').strip(), str(line.get('product_name') or '').strip()
+        product_type = by_id.get(int(raw_id)) if raw_id else by_name.get(raw_name.title())
+        if product_type is None:
+            raise DeliveryError(f"Line {number}: unknown product type '{raw_id or raw_name}'.")
+        try:
+            quantity = int(line.get('quantity'))
+        except (TypeError, ValueError):
+            raise DeliveryError(f"Line {number}: quantity must be a whole number.")
+        if quantity < 1:
+            raise DeliveryError(f"Line {number}: quantity must be at least 1.")
+        total += quantity
+        if total > max_units:
+            raise DeliveryError(f"A delivery can contain at most {max_units} units.")
+        resolved.append((product_type, quantity, _parse_date(line.get('stock_in_date') or date.today(), 'stock_in_date'),
+                         _parse_date(line.get('expiry_date'), 'expiry_date'), str(line.get('location') or '').strip()))
+    return resolved
+
+
+def receive_delivery(lines):
+    """Receives a multi-product delivery in a single transaction.
+    Returns [{'product_type', 'quantity', 'tags'}], one entry per line, or raises DeliveryError."""
+    if not lines: raise DeliveryError("The delivery has no lines.")
+    if not isinstance(lines, list) or not all(isinstance(line, dict) for line in lines):
+        raise DeliveryError("Delivery lines must be a list of objects.")
+    resolved = _resolve_lines(lines)
+    received = []
+    try:
+        for product_type, quantity, stock_in_date, expiry_date, location in resolved:
+            tags = receive_stock(product_type, quantity, stock_in_date, expiry_date, location)
+            received.append({'product_type': product_type.name, 'quantity': quantity, 'tags': tags})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return received
+
+
+def parse_delivery_csv(text):
+    """Reads delivery lines from CSV with a header row using the DELIVERY_FIELDS column names."""
+    reader = csv.DictReader(StringIO(text))
+    if not reader.fieldnames or not {'quantity', 'expiry_date'} <= set(reader.fieldnames):
+        raise DeliveryError(f"CSV header must include quantity and expiry_date (columns: {', '.join(DELIVERY_FIELDS)}).")
+    return list(reader)
+
+
+def parse_delivery_upload(data):
+    """parse_delivery_csv for the bytes of an uploaded file (UTF-8, with or without a BOM)."""
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise DeliveryError("The delivery file must be a UTF-8 encoded CSV.") from None
+    return parse_delivery_csv(text)
@@ -0,0 +1,63 @@
+# app/tags.py
+# RFID tag allocation without a database round trip per tag.
+#
+# A tag is "<product_type_id>-<ms>-<node>-<seq>" (hex parts): the millisecond the block was
+# reserved, a node id for this process, and a per-process sequence that only restarts when the
+# clock moves forward. The node is the pid followed by 24 bits: RFID_HOST_ID when the deployment
+# gives each host its own, random bits otherwise. It is re-rolled after fork, so every gunicorn
+# worker gets its own. One process never reuses (ms, seq), and live processes on one host never
+# share a node, so tags are unique across its workers. Across hosts that is guaranteed only with
+# distinct RFID_HOST_IDs; with random bits two hosts share a node only if a pid coincides and the
+# 24 random bits match too (about 1 in 16 million), and even then only tags reserved in the same
+# millisecond can collide.
+
+import os
+import threading
+import time
+
+_lock = threading.Lock()
+_node = None
+_host_id = None
+_last_ms = 0
+_seq = 0
+
+
+def _new_node():
+    global _node, _last_ms, _seq
+    suffix = _host_id if _host_id is not None else int.from_bytes(os.urandom(3), 'big')
+    _node = f"{os.getpid():x}{suffix:06x}"
+    _last_ms, _seq = 0, 0
+
+
+_new_node()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_new_node)
+
+
+def configure(host_id):
+    """Uses `host_id` (0 to 0xffffff, unique per host) in the node instead of random bits."""
+    global _host_id
+    if host_id is not None and not 0 <= host_id <= 0xffffff:
+        raise ValueError("RFID_HOST_ID must be between 0 and 16777215.")
+    with _lock:
+        _host_id = host_id
+        _new_node()
+
+
+def _reserve(count):
+    """Reserves `count` consecutive sequence numbers. Returns (ms, first_seq)."""
+    global _last_ms, _seq
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms, _seq = now_ms, 0
+        start = _seq
+        _seq += count
+        return _last_ms, start
+
+
+def allocate_tags(product_type_id, count):
+    """Returns `count` new, globally unique RFID tags for one product type."""
+    ms, start = _reserve(count)
+    prefix = f"{product_type_id}-{ms:x}-{_node}-"
+    return [f"{prefix}{seq:x}" for seq in range(start, start + count)]
@@ -0,0 +1 @@
+# benchmarks: end-to-end timings of the routes and jobs (python -m benchmarks.run)
@@ -0,0 +1,202 @@
+# benchmarks/concurrency.py
+# Concurrency check for checkout and stock intake, in separate processes like gunicorn workers.
+# Seeds one product with a pool of tags, then starts --lanes processes that each check out random
+# baskets drawn from that one pool (so lanes race for the same rows) while --intakes processes
+# receive stock. Fails if a request errors, a tag is reported sold by two lanes, the sold count in
+# the database disagrees with the lanes, or the stock ledger drifts from inventory_item. Then
+# --tag-processes forked processes (forked, like gunicorn workers) allocate RFID tags in small
+# blocks alongside the parent, and any tag handed out twice fails the check.
+#
+#   python -m benchmarks.concurrency                           # a temporary SQLite file
+#   python -m benchmarks.concurrency --database-url postgresql://localhost/green_bench --lanes 8
+#
+# A --database-url must point at an empty database: the tables are created in it.
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+import numpy as np
+
+from config import Config
+
+
+def bench_config(database_url):
+    class ConcurrencyConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        WTF_CSRF_ENABLED = False
+        AI_BACKEND = 'stub'
+        MAIL_BACKEND = 'memory'
+        SCHEDULER_MODE = 'off'
+        LOG_LEVEL = 'ERROR'
+        REQUEST_SLOW_MS = 0
+    return ConcurrencyConfig
+
+
+def lane(database_url, pool, baskets, basket_size, seed, ready, results):
+    """Checks out `baskets` random baskets from `pool`; reports its latencies, sold tags and errors."""
+    from app import create_app
+    client = create_app(bench_config(database_url)).test_client()
+    rng = random.Random(seed)
+    latencies, sold, errors = [], [], []
+    ready.wait()
+    for _ in range(baskets):
+        started = time.perf_counter()
+        response = client.post('/api/sales/checkout', json={'tags': rng.sample(pool, basket_size)})
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            errors.append(f"checkout {response.status_code}: {response.get_data(as_text=True)[:200]}")
+            continue
+        sold += [result['tag'] for result in response.get_json()['results'] if result['status'] == 'sold']
+    results.put(('lane', latencies, sold, errors))
+
+
+def intake(database_url, product_id, deliveries, quantity, index, ready, results):
+    """Posts `deliveries` stock intakes of `quantity` units; reports its latencies, tags and errors."""
+    from app import create_app
+    client = create_app(bench_config(database_url)).test_client()
+    latencies, tags, errors = [], [], []
+    ready.wait()
+    for n in range(deliveries):
+        body = {'items': [{'product_type_id': product_id, 'quantity': quantity, 'location': f'Dock {index}',
+                           'expiry_date': (date.today() + timedelta(days=3 + n % 5)).isoformat()}]}
+        started = time.perf_counter()
+        response = client.post('/api/stock_intake', json=body)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 201:
+            errors.append(f"intake {response.status_code}: {response.get_data(as_text=True)[:200]}")
+            continue
+        tags += [tag for line in response.get_json()['lines'] for tag in line['tags']]
+    results.put(('intake', latencies, tags, errors))
+
+
+def allocate(product_type_id, blocks, block_size, results):
+    """Allocates `blocks` blocks of `block_size` tags; reports them."""
+    from app.tags import allocate_tags
+    tags = []
+    for _ in range(blocks): tags += allocate_tags(product_type_id, block_size)
+    results.put(tags)
+
+
+def check_tag_allocation(product_type_id, processes, blocks, block_size):
+    """Allocates tags in the parent and `processes` forked children at once. Returns (tags, duplicates)."""
+    from app.tags import allocate_tags
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    children = [context.Process(target=allocate, args=(product_type_id, blocks, block_size, results)) for _ in range(processes)]
+    for child in children: child.start()
+    tags = []
+    for _ in range(blocks): tags += allocate_tags(product_type_id, block_size)
+    for _ in children: tags += results.get()
+    for child in children: child.join()
+    return len(tags), len(tags) - len(set(tags))
+
+
+def seed(app, pool_size):
+    from app import db
+    from app.models import ProductType
+    from app.stock import receive_stock
+    with app.app_context():
+        db.create_all()
+        if db.session.query(ProductType.id).first() is not None:
+            sys.exit("The database is not empty; point --database-url at a fresh one.")
+        product = ProductType(name='Concurrency Milk', default_price=1.0)
+        db.session.add(product)
+        db.session.flush()
+        pool = receive_stock(product, pool_size, date.today(), date.today() + timedelta(days=2), 'Aisle 1')
+        db.session.commit()
+        product_id = product.id
+        db.engine.dispose()  # don't hand pooled connections to the child processes
+    return product_id, pool
+
+
+def verify(app, pool, sold):
+    """The problems found after the run: double sales, sold counts, ledger drift."""
+    from app import db
+    from app.ledger import check_ledger
+    from app.models import InventoryItem
+    problems = []
+    if len(sold) != len(set(sold)):
+        problems.append(f"{len(sold) - len(set(sold))} tag(s) reported sold by more than one lane")
+    with app.app_context():
+        sold_in_db = db.session.query(db.func.count(InventoryItem.id)).filter(
+            InventoryItem.unique_rfid_tag.in_(pool), InventoryItem.is_sold == True).scalar()
+        if sold_in_db != len(set(sold)):
+            problems.append(f"lanes reported {len(set(sold))} sales, the database has {sold_in_db}")
+        drift = check_ledger()
+        if drift: problems.append(f"stock ledger drifted in {len(drift)} batch(es), e.g. {drift[0]}")
+    return problems
+
+
+def report(name, latencies, per_second):
+    print(f"  {name:<9} {per_second:>7.0f}/s  p50 {np.percentile(latencies, 50) * 1000:>8.2f} ms  "
+          f"p95 {np.percentile(latencies, 95) * 1000:>8.2f} ms  max {max(latencies) * 1000:>8.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check concurrent checkout lanes and stock intake.")
+    parser.add_argument('--database-url', default=None, help='An empty database; default: a temporary SQLite file.')
+    parser.add_argument('--lanes', type=int, default=6)
+    parser.add_argument('--intakes', type=int, default=2)
+    parser.add_argument('--baskets', type=int, default=100, help='Checkouts per lane.')
+    parser.add_argument('--basket-size', type=int, default=5)
+    parser.add_argument('--deliveries', type=int, default=20, help='Stock intakes per intake process.')
+    parser.add_argument('--quantity', type=int, default=500, help='Units per stock intake.')
+    parser.add_argument('--pool', type=int, default=2000, help='Tags the lanes compete for.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--tag-processes', type=int, default=8, help='Forked processes allocating tags at once.')
+    parser.add_argument('--tag-blocks', type=int, default=2000, help='Blocks of 100 tags per process.')
+    args = parser.parse_args(argv)
+
+    workdir = None if args.database_url else tempfile.mkdtemp(prefix='bench-concurrency-')
+    database_url = args.database_url or 'sqlite:///' + os.path.join(workdir, 'concurrency.db')
+    try:
+        from app import create_app
+        app = create_app(bench_config(database_url))
+        product_id, pool = seed(app, args.pool)
+        context = multiprocessing.get_context('spawn')
+        ready, results = context.Barrier(args.lanes + args.intakes + 1), context.Queue()
+        processes = [context.Process(target=lane, args=(database_url, pool, args.baskets, args.basket_size, args.seed + i, ready, results))
+                     for i in range(args.lanes)]
+        processes += [context.Process(target=intake, args=(database_url, product_id, args.deliveries, args.quantity, i, ready, results))
+                      for i in range(args.intakes)]
+        for process in processes: process.start()
+        ready.wait()  # every process has created its app
+        started = time.perf_counter()
+        outcomes = [results.get() for _ in processes]
+        seconds = time.perf_counter() - started
+        for process in processes: process.join()
+
+        lane_latencies = [t for kind, latencies, _, _ in outcomes if kind == 'lane' for t in latencies]
+        intake_latencies = [t for kind, latencies, _, _ in outcomes if kind == 'intake' for t in latencies]
+        sold = [tag for kind, _, tags, _ in outcomes if kind == 'lane' for tag in tags]
+        errors = [error for _, _, _, process_errors in outcomes for error in process_errors]
+        print(f"{args.lanes} lanes and {args.intakes} intake processes on {app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0]}, {seconds:.1f}s:")
+        report('checkout', lane_latencies, len(lane_latencies) / seconds)
+        if intake_latencies: report('intake', intake_latencies, len(intake_latencies) / seconds)
+        # A scan is one tag at a lane, so lanes * baskets * basket size scans in all.
+        print(f"  {len(set(sold)):,} of {len(pool):,} contested tags sold; "
+              f"{len(lane_latencies) * args.basket_size / seconds:.0f} scans/s, {len(sold) / seconds:.0f} sales/s across the lanes")
+
+        problems = [f"{len(errors)} failed request(s), e.g. {errors[0]}"] if errors else []
+        problems += verify(app, pool, sold)
+
+        started = time.perf_counter()
+        allocated, duplicates = check_tag_allocation(product_id, args.tag_processes, args.tag_blocks, 100)
+        print(f"  {allocated:,} tags from {args.tag_processes} forked processes and the parent in "
+              f"{time.perf_counter() - started:.1f}s, {duplicates} duplicate(s)")
+        if duplicates: problems.append(f"{duplicates} RFID tag(s) allocated twice")
+        for problem in problems: print(f"FAIL {problem}")
+        if problems: sys.exit(1)
+        print("ok")
+    finally:
+        if workdir: shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,543 @@
+# benchmarks/run.py
+# End-to-end benchmarks. For each scale it seeds a fresh SQLite database (and the analytics files)
+# with generate_data.py, then drives every route and background job through the Flask test client
+# with the offline AI backend and the in-memory mail sink, recording latency percentiles, SQL
+# statements per operation and peak Python memory. Each scale first asserts that the hot queries
+# pass the `flask check-query-plans` rules on the seeded data. Results go to a JSON file that later
+# runs can be compared against, and a scenario over its BUDGETS limit fails the run. The analytics
+# scales load only the CSV/Feather files, with millions of transactions: a full load of each
+# format, folding APPEND_ROWS appended lines into the loaded insights, and the memory of
+# LOAD_WORKERS separate processes loading each format side by side.
+#
+# The export scales run only the inventory downloads, so their flat-memory budget is checked at a
+# size where buffering the whole export would show.
+#
+#   python -m benchmarks.run                                       # 1k and 100k items, 10m transactions, 1m-item export
+#   python -m benchmarks.run --scales 1k,100k,1m --out benchmarks/baseline.json
+#   python -m benchmarks.run --compare benchmarks/baseline.json --fail-on-regression
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+import numpy as np
+from sqlalchemy import event
+
+import generate_data
+from config import Config
+
+SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+# Transactions in the analytics files for the analytics-only runs (the scales above use 200k).
+ANALYTICS_SCALES = {'200k': 200_000, '10m': 10_000_000}
+APPEND_ROWS = 1_000
+# Web workers that load the same analytics files side by side, per format (see worker_memory).
+LOAD_WORKERS = 2
+
+RECEIPT_UNITS = 20_000
+
+# Limits some scenarios must stay within at every scale, whatever the baseline says. The dashboard
+# aggregates in SQL, so neither its statement count nor its latency may grow with the inventory.
+BUDGETS = {
+    'dashboard': {'queries_per_op': 2, 'p95_ms': 100},
+    'dashboard_cold': {'queries_per_op': 4, 'p95_ms': 250},
+    # The export streams in batches, so its memory must stay flat however many rows it writes.
+    'download_inventory': {'peak_alloc_mb': 16},
+    'download_inventory_gzip': {'peak_alloc_mb': 16},
+    # A scan at the terminal while the chatbot answers questions: it slowed to ~10x its idle p95
+    # when every chat job rebuilt the inventory context. Both the time and the ratio are capped.
+    'sales_terminal_chat_load': {'p95_ms': 50, 'p95_vs_idle': 6},
+}
+
+
+def percentile(samples, pct):
+    return float(np.percentile(samples, pct)) * 1000 if samples else 0.0
+
+
+class QueryCounter:
+    """Counts the SQL statements sent through the engine (from any thread)."""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def bench_config(db_path, data_dir):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+        WTF_CSRF_ENABLED = False
+        AI_BACKEND = 'stub'
+        MAIL_BACKEND = 'memory'
+        SCHEDULER_MODE = 'off'
+        DATA_DIR = data_dir
+        SENDER_EMAIL = 'alerts@example.com'
+        STORE_MANAGER_EMAIL = 'manager@example.com'
+        EXPIRY_ALERT_HOUR = 0
+        LOG_LEVEL = 'WARNING'
+        REQUEST_SLOW_MS = 0
+    return BenchConfig
+
+
+def reset_process_caches():
+    # Module-level caches are keyed by inventory version, which restarts at 1 in every fresh
+    # database, so they must not leak from one scale into the next.
+    from app import chat_jobs, chatbot, expiry
+    expiry._report_cache.clear()
+    chatbot._context_cache.clear()
+    if chat_jobs._answer_cache is not None: chat_jobs._answer_cache.clear()
+
+
+def seed_workdir(workdir, items, seed):
+    from app import create_app, db
+    end_date = datetime.now()
+    args = generate_data.parse_args(['--seed', str(seed), '--out-dir', workdir, '--format', 'both',
+                                     '--products', '200', '--customers', '20000', '--transactions', '200000'])
+    products_df = generate_data.write_files(args, np.random.default_rng(seed), end_date)
+    app = create_app(bench_config(os.path.join(workdir, 'bench.db'), workdir))
+    with app.app_context():
+        db.create_all()
+    generate_data.seed_database(app, np.random.default_rng(seed + 1), products_df, end_date, items,
+                                locations=50 if items >= 100_000 else 10, sold_fraction=0.3)
+    with app.app_context():
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+    return app
+
+
+class Bench:
+    def __init__(self, app, iterations):
+        from app import db
+        self.app = app
+        # No cookie jar: the messages flashed before unfollowed redirects would pile up in the session.
+        self.client = app.test_client(use_cookies=False)
+        self.iterations = iterations
+        self.counter = QueryCounter(db.engine)
+        self.results = {}
+
+    def run(self, name, fn, setup=None, iterations=None, count_queries=True):
+        """Runs `fn` once under tracemalloc for the memory peak, then `iterations` timed times.
+        Pass count_queries=False when other threads are sending statements at the same time."""
+        iterations = iterations or self.iterations
+        samples, queries = [], 0
+        if setup: setup()
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        for _ in range(iterations):
+            if setup: setup()
+            before = self.counter.count
+            started = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - started)
+            queries += self.counter.count - before
+        self.results[name] = {
+            'n': iterations,
+            'p50_ms': round(percentile(samples, 50), 3),
+            'p95_ms': round(percentile(samples, 95), 3),
+            'p99_ms': round(percentile(samples, 99), 3),
+            'mean_ms': round(sum(samples) / len(samples) * 1000, 3),
+            'queries_per_op': round(queries / iterations, 2) if count_queries else None,
+            'peak_alloc_mb': round(peak / 1e6, 2),
+        }
+        print(f"  {name:<26} p50 {self.results[name]['p50_ms']:>9.2f} ms  p95 {self.results[name]['p95_ms']:>9.2f} ms  "
+              f"queries {str(self.results[name]['queries_per_op']):>6}  peak {self.results[name]['peak_alloc_mb']:>7.2f} MB")
+
+    def get(self, url, **kwargs):
+        response = self.client.get(url, **kwargs)
+        assert response.status_code in (200, 302), f"GET {url}: {response.status_code}"
+        return response
+
+    def stream(self, url):
+        """GETs `url` and reads the body chunk by chunk, as a client saving a download would, so the
+        memory peak is the app's own and not a buffered copy of the whole response."""
+        response = self.client.get(url, buffered=False)
+        assert response.status_code == 200, f"GET {url}: {response.status_code}"
+        size = sum(len(chunk) for chunk in response.iter_encoded())
+        response.close()
+        return size
+
+    def post(self, url, **kwargs):
+        response = self.client.post(url, **kwargs)
+        assert response.status_code in (200, 201, 202, 302), f"POST {url}: {response.status_code} {response.get_data(as_text=True)[:200]}"
+        return response
+
+
+class DelayedModel:
+    """Wraps the stub model so every call first waits `seconds`, like a round trip to Gemini."""
+
+    def __init__(self, model, seconds):
+        self.model = model
+        self.seconds = seconds
+
+    def generate_content(self, prompt, **kwargs):
+        time.sleep(self.seconds)
+        return self.model.generate_content(prompt, **kwargs)
+
+
+@contextlib.contextmanager
+def background_load(app, fn, workers):
+    """Calls `fn(client)` in a loop on `workers` threads, each with its own app context and test
+    client, until the block exits. Yields a dict whose 'ops' and 'errors' count the calls."""
+    stop, counts, lock = threading.Event(), {'ops': 0, 'errors': 0}, threading.Lock()
+
+    def loop():
+        from app import db
+        with app.app_context():
+            client = app.test_client()
+            while not stop.is_set():
+                try:
+                    fn(client)
+                    outcome = 'ops'
+                except Exception:
+                    outcome = 'errors'
+                finally:
+                    db.session.remove()
+                with lock: counts[outcome] += 1
+
+    threads = [threading.Thread(target=loop, daemon=True) for _ in range(workers)]
+    for thread in threads: thread.start()
+    try:
+        yield counts
+    finally:
+        stop.set()
+        for thread in threads: thread.join()
+
+
+def heavy_iterations(iterations, items):
+    """Scenarios that touch every row (or rebuild a cache) run fewer times at the bigger scales."""
+    return max(3, iterations // (10 if items >= 1_000_000 else 3 if items >= 100_000 else 1))
+
+
+def run_scale(label, items, iterations, seed):
+    from app import db, expiry, scheduler
+    from app.data_handler import data_store
+    from app.inventory_version import bump_inventory_version
+    from app.models import InventoryItem, JobRun, Notification, ProductType
+    from app.queries import check_query_plans
+    from app.stock import receive_stock
+    from app.tags import allocate_tags
+
+    workdir = tempfile.mkdtemp(prefix=f'bench-{label}-')
+    try:
+        started = time.perf_counter()
+        app = seed_workdir(workdir, items, seed)
+        seed_seconds = time.perf_counter() - started
+        reset_process_caches()
+        print(f"{label}: seeded {items:,} items in {seed_seconds:.1f}s")
+        heavy = heavy_iterations(iterations, items)
+        ctx = app.app_context()
+        ctx.push()
+        try:
+            bench = Bench(app, iterations)
+            product_id = db.session.query(ProductType.id).order_by(ProductType.id).first()[0]
+            today = date.today()
+            bad_plans = {name: problems for name, (plan, problems) in check_query_plans(today).items() if problems}
+            assert not bad_plans, f"Bad query plans at {label}: {bad_plans} (see flask check-query-plans)"
+            db.session.rollback()  # don't hold a read transaction open while the requests write
+
+            def bump():
+                bump_inventory_version()
+                db.session.commit()
+
+            bench.run('dashboard', lambda: bench.get('/'))
+            bench.run('dashboard_cold', lambda: bench.get('/'), setup=bump, iterations=heavy)
+            bench.run('expiry_report_cold', lambda: expiry.expiry_report(today), setup=expiry._report_cache.clear, iterations=heavy)
+            bench.run('full_inventory', lambda: bench.get('/full_inventory'))
+            cursor = bench.get('/api/inventory?limit=200').get_json()['next_cursor']
+            bench.run('inventory_api_next_page', lambda: bench.get(f'/api/inventory?limit=200&cursor={cursor}'))
+            bench.run('inventory_api_search', lambda: bench.get('/api/inventory?q=milk'))
+            bench.run('download_inventory', lambda: bench.stream('/download_inventory'), iterations=heavy)
+            bench.run('download_inventory_gzip', lambda: bench.stream('/download_inventory?gzip=1'), iterations=heavy)
+            stock_form = {'product_type': str(product_id), 'quantity': '10', 'stock_in_date': today.isoformat(),
+                          'expiry_date': (today + timedelta(days=5)).isoformat(), 'location': 'Aisle 1'}
+            bench.run('add_stock', lambda: bench.post('/add_stock', data=stock_form))
+            intake = {'items': [{'product_type_id': product_id, 'quantity': 500, 'expiry_date': (today + timedelta(days=7)).isoformat(),
+                                 'location': 'Dock'}]}
+            bench.run('api_stock_intake_500', lambda: bench.post('/api/stock_intake', json=intake))
+
+            # Units/s of a 20k-unit receipt: receive_stock's chunked executemany against the one ORM
+            # object per unit that add_stock used to build. Both insert, flush and roll back.
+            product = db.session.get(ProductType, product_id)
+
+            def receive_executemany():
+                receive_stock(product, RECEIPT_UNITS, today, today + timedelta(days=9), 'Receiving')
+                db.session.flush()
+                db.session.rollback()
+
+            def receive_per_unit():
+                for i in range(RECEIPT_UNITS):
+                    db.session.add(InventoryItem(unique_rfid_tag=f"per-unit-{i}", price=product.default_price, stock_in_date=today,
+                                                 expiry_date=today + timedelta(days=9), location='Receiving', product_type_id=product_id))
+                db.session.flush()
+                db.session.rollback()
+
+            bench.run('receive_stock_20k', receive_executemany, iterations=5)
+            bench.run('receive_stock_20k_per_unit', receive_per_unit, iterations=3)
+            fast, slow = bench.results['receive_stock_20k'], bench.results['receive_stock_20k_per_unit']
+            fast['units_per_sec'] = round(RECEIPT_UNITS / fast['mean_ms'] * 1000)
+            slow['units_per_sec'] = round(RECEIPT_UNITS / slow['mean_ms'] * 1000)
+            print(f"  {'':<26} {fast['units_per_sec']:,} units/s with executemany, {slow['units_per_sec']:,} per unit "
+                  f"({fast['units_per_sec'] / slow['units_per_sec']:.1f}x)")
+            # Sell the stock received above (newest first), so the seeded stock the expiry scenarios see is untouched.
+            tags = iter([tag for (tag,) in db.session.query(InventoryItem.unique_rfid_tag).filter(InventoryItem.is_sold == False)
+                         .order_by(InventoryItem.id.desc()).limit((iterations + 1) * 26)])
+            db.session.rollback()
+            bench.run('sales_terminal', lambda: bench.post('/sales_terminal', data={'rfid_tag': next(tags)}))
+            bench.run('checkout_basket_20', lambda: bench.post('/api/sales/checkout', json={'tags': [next(tags) for _ in range(20)]}))
+            questions = iter(range(10 ** 9))
+
+            def ask_and_poll():
+                body = bench.post('/api/chatbot', json={'question': f'How many units are left? #{next(questions)}'}).get_json()
+                poll_url = body.get('poll_url')
+                while body['status'] not in ('done', 'failed'):
+                    time.sleep(0.002)
+                    body = bench.get(poll_url).get_json()
+
+            bench.run('chatbot_job', ask_and_poll)
+            bench.run('chatbot_stream', lambda: bench.post('/api/chatbot?stream=1', json={'question': f'What expires soon? #{next(questions)}'}).get_data())
+            bench.run('chatbot_cached', lambda: bench.post('/api/chatbot', json={'question': 'What expires soon?'}))
+
+            # The terminal must not slow down while the assistant is busy: the same scan as
+            # sales_terminal, while four users each ask a new (uncached) question, poll until it is
+            # answered and ask again. The model answers after a fixed wait, like Gemini over the network.
+            def ask_until_answered(client):
+                body = client.post('/api/chatbot', json={'question': f'Which products expire this week? #{next(questions)}'}).get_json()
+                poll_url = body.get('poll_url')
+                while body['status'] not in ('done', 'failed'):
+                    time.sleep(0.05)
+                    body = client.get(poll_url).get_json()
+
+            clients = app.extensions['clients']
+            stub_model = clients.gemini
+            clients.gemini = DelayedModel(stub_model, seconds=0.3)
+            try:
+                with background_load(app, ask_until_answered, workers=4) as load:
+                    bench.run('sales_terminal_chat_load', lambda: bench.post('/sales_terminal', data={'rfid_tag': next(tags)}),
+                              iterations=iterations * 5, count_queries=False)
+            finally:
+                clients.gemini = stub_model
+            loaded, idle = bench.results['sales_terminal_chat_load'], bench.results['sales_terminal']
+            loaded.update(chat_answers=load['ops'], chat_errors=load['errors'],
+                          p50_vs_idle=round(loaded['p50_ms'] / idle['p50_ms'], 2), p95_vs_idle=round(loaded['p95_ms'] / idle['p95_ms'], 2))
+            print(f"  {'':<26} {load['ops']} chat answers alongside; p50 {loaded['p50_vs_idle']}x, p95 {loaded['p95_vs_idle']}x the idle terminal")
+
+            def reset_alerts():
+                JobRun.query.delete()
+                Notification.query.delete()
+                db.session.commit()
+                expiry._report_cache.clear()
+
+            bench.run('check_expiring_products', lambda: scheduler.check_expiring_products(app, datetime.now()),
+                      setup=reset_alerts, iterations=heavy)
+            bench.run('allocate_tags_100k', lambda: allocate_tags(product_id, 100_000), iterations=heavy)
+            bench.run('analytics_reload', data_store.reload, iterations=heavy)
+            bench.run('chatbot_insights', lambda: data_store.snapshot().insights.sales_text())
+        finally:
+            db.session.remove()
+            ctx.pop()
+        return {'items': items, 'seed_seconds': round(seed_seconds, 2), 'scenarios': bench.results}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_export(label, items, iterations, seed):
+    workdir = tempfile.mkdtemp(prefix=f'bench-{label}-export-')
+    try:
+        started = time.perf_counter()
+        app = seed_workdir(workdir, items, seed)
+        seed_seconds = time.perf_counter() - started
+        reset_process_caches()
+        print(f"{label}-export: seeded {items:,} items in {seed_seconds:.1f}s")
+        heavy = heavy_iterations(iterations, items)
+        with app.app_context():
+            bench = Bench(app, iterations)
+            bench.run('download_inventory', lambda: bench.stream('/download_inventory'), iterations=heavy)
+            bench.run('download_inventory_gzip', lambda: bench.stream('/download_inventory?gzip=1'), iterations=heavy)
+        return {'items': items, 'seed_seconds': round(seed_seconds, 2), 'scenarios': bench.results}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def memory_mb():
+    """This process's resident memory from /proc/self/smaps_rollup (Linux): Rss, its proportional
+    share Pss (shared pages divided among the processes mapping them), and the shared and private
+    parts. None where it isn't available."""
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            kb = {key: int(value.split()[0]) for key, value in (line.split(':', 1) for line in f if ':' in line)}
+    except (OSError, ValueError):
+        return None
+    return {'rss': round(kb['Rss'] / 1024, 1), 'pss': round(kb['Pss'] / 1024, 1),
+            'shared': round((kb['Shared_Clean'] + kb['Shared_Dirty']) / 1024, 1),
+            'private': round((kb['Private_Clean'] + kb['Private_Dirty']) / 1024, 1)}
+
+
+def _load_worker(data_dir, barrier, results):
+    from app.data_handler import DataStore
+    before = memory_mb()
+    snapshot = DataStore(data_dir).reload()
+    assert snapshot.error is None, snapshot.error
+    barrier.wait()  # every worker holds its copy (or mapping) of the data before any measures
+    results.put({'before': before, 'after': memory_mb()})
+    barrier.wait()
+
+
+def worker_memory(data_dir, workers):
+    """Starts `workers` fresh processes that each load `data_dir`, as separate web workers would,
+    and returns every worker's memory before and after the load."""
+    context = multiprocessing.get_context('spawn')
+    barrier, results = context.Barrier(workers), context.Queue()
+    processes = [context.Process(target=_load_worker, args=(data_dir, barrier, results)) for _ in range(workers)]
+    for process in processes: process.start()
+    measured = [results.get(timeout=600) for _ in processes]
+    for process in processes: process.join()
+    assert all(process.exitcode == 0 for process in processes), "An analytics load worker failed"
+    return measured
+
+
+def run_analytics(label, transactions, iterations, seed):
+    from app import create_app
+    from app.data_handler import DataStore
+
+    workdir = tempfile.mkdtemp(prefix=f'bench-tx{label}-')
+    feather_dir, csv_dir = os.path.join(workdir, 'feather'), os.path.join(workdir, 'csv')
+    try:
+        started = time.perf_counter()
+        args = generate_data.parse_args(['--seed', str(seed), '--out-dir', feather_dir, '--format', 'both', '--products', '200',
+                                         '--customers', '20000', '--transactions', str(transactions)])
+        generate_data.write_files(args, np.random.default_rng(seed), datetime.now())
+        os.makedirs(csv_dir)
+        for name in ('products', 'customers', 'transactions'):
+            shutil.move(os.path.join(feather_dir, f'{name}.csv'), csv_dir)
+        seed_seconds = time.perf_counter() - started
+        print(f"tx{label}: wrote {transactions:,} transactions in {seed_seconds:.1f}s")
+        app = create_app(bench_config(os.path.join(workdir, 'bench.db'), feather_dir))
+        ctx = app.app_context()
+        ctx.push()
+        try:
+            bench = Bench(app, iterations)
+            csv_store, feather_store = DataStore(csv_dir), DataStore(feather_dir)
+            bench.run('analytics_load_csv', csv_store.reload, iterations=3, count_queries=False)
+            bench.run('analytics_load_feather', feather_store.reload, iterations=3, count_queries=False)
+            # Lines appended to the loaded CSV: only they are parsed and folded into the insights.
+            ids = iter(range(transactions + 1, 10 ** 12, APPEND_ROWS))
+
+            def append_lines():
+                first = next(ids)
+                with open(os.path.join(csv_dir, 'transactions.csv'), 'a') as f:
+                    f.writelines(f"{i},{i % 20000 + 1},{i % 200 + 1},1,2025-06-01 10:00:00\n" for i in range(first, first + APPEND_ROWS))
+
+            before = dict(csv_store.metrics)
+            bench.run(f'analytics_append_{APPEND_ROWS // 1000}k_csv', lambda: csv_store._load(incremental=True),
+                      setup=append_lines, count_queries=False)
+            appends = csv_store.metrics['appends'] - before['appends']
+            assert appends == iterations + 1 and csv_store.metrics['appended_rows'] - before['appended_rows'] == appends * APPEND_ROWS, \
+                "The appended lines were reloaded from scratch instead of folded in"
+            bench.run('chatbot_insights', lambda: csv_store.snapshot().insights.sales_text(), count_queries=False)
+        finally:
+            ctx.pop()
+        del csv_store, feather_store  # the workers below shouldn't have to squeeze in next to this process's copies
+        # A CSV is parsed into private memory in every worker; a Feather file is mapped, and its
+        # pages are shared through the page cache, so the workers' Pss is a fraction of their Rss.
+        workers = {}
+        for fmt, data_dir in (('csv', csv_dir), ('feather', feather_dir)):
+            workers[fmt] = worker_memory(data_dir, LOAD_WORKERS)
+            for i, measured in enumerate(workers[fmt]):
+                if measured['after'] is None: continue
+                print(f"  {fmt + ' worker ' + str(i):<26} rss {measured['before']['rss']:>7.1f} -> {measured['after']['rss']:>7.1f} MB  "
+                      f"pss {measured['after']['pss']:>7.1f} MB  shared {measured['after']['shared']:>7.1f} MB  private {measured['after']['private']:>7.1f} MB")
+        return {'transactions': transactions, 'seed_seconds': round(seed_seconds, 2), 'scenarios': bench.results, 'workers': workers}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def over_budget(results):
+    """[(scale, scenario, metric, value, limit)] for every BUDGETS limit a scenario exceeded."""
+    return [(scale, name, metric, current['scenarios'][name][metric], limit)
+            for scale, current in results['scales'].items()
+            for name, limits in BUDGETS.items() if name in current['scenarios']
+            for metric, limit in limits.items() if current['scenarios'][name][metric] > limit]
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Prints p50 and query-count changes against the baseline. Returns the regressions found:
+    p50 slower by more than `threshold` (and by at least 1 ms), or more queries per operation."""
+    regressions = []
+    print(f"\nCompared with {baseline['meta'].get('revision')} ({baseline['meta'].get('created_at')}):")
+    for scale, current in results['scales'].items():
+        old = baseline['scales'].get(scale)
+        if old is None: continue
+        for name, now in current['scenarios'].items():
+            before = old['scenarios'].get(name)
+            if before is None: continue
+            ratio = now['p50_ms'] / before['p50_ms'] if before['p50_ms'] else 1.0
+            slower = ratio > 1 + threshold and now['p50_ms'] - before['p50_ms'] >= 1.0
+            more_queries = now['queries_per_op'] is not None and before['queries_per_op'] is not None and \
+                now['queries_per_op'] > before['queries_per_op'] + 0.5
+            flag = ' REGRESSION' if slower or more_queries else ''
+            print(f"  {scale:>5} {name:<26} p50 {before['p50_ms']:>9.2f} -> {now['p50_ms']:>9.2f} ms ({ratio:>5.2f}x)  "
+                  f"queries {before['queries_per_op']} -> {now['queries_per_op']}{flag}")
+            if flag: regressions.append((scale, name))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the end-to-end benchmarks.")
+    parser.add_argument('--scales', default='1k,100k', help=f"Comma-separated, from {', '.join(SCALES)}.")
+    parser.add_argument('--export-scales', default='1m', help=f"Export-only scales, from {', '.join(SCALES)}; '' for none.")
+    parser.add_argument('--analytics', default='10m', help=f"Comma-separated, from {', '.join(ANALYTICS_SCALES)}; '' for none.")
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default=os.path.join('benchmarks', 'results.json'))
+    parser.add_argument('--compare', default=None, help='A previous results/baseline JSON to compare against.')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Relative p50 slowdown reported as a regression.')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args(argv)
+
+    results = {'meta': {'revision': git_revision(), 'created_at': datetime.now().isoformat(timespec='seconds'),
+                        'python': platform.python_version(), 'platform': platform.platform(),
+                        'iterations': args.iterations, 'seed': args.seed},
+               'scales': {}}
+    for label in filter(None, args.scales.split(',')):
+        results['scales'][label] = run_scale(label, SCALES[label], args.iterations, args.seed)
+    for label in filter(None, args.export_scales.split(',')):
+        results['scales'][f'{label}-export'] = run_export(label, SCALES[label], args.iterations, args.seed)
+    for label in filter(None, args.analytics.split(',')):
+        results['scales'][f'tx{label}'] = run_analytics(label, ANALYTICS_SCALES[label], args.iterations, args.seed)
+    results['meta']['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote {args.out} (peak RSS {results['meta']['peak_rss_mb']} MB)")
+    failures = over_budget(results)
+    for scale, name, metric, value, limit in failures:
+        print(f"OVER BUDGET {scale} {name}: {metric} {value} > {limit}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions and args.fail_on_regression: sys.exit(1)
+    if failures: sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 # config.py
 
 import os
+import tempfile
 from dotenv import load_dotenv
 
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -13,13 +14,122 @@ class Config:
         'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Database engine (see app/database.py). Pool sizes are per process.
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    # Postgres only: abort statements running longer than this (0 = no limit)
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+    # SQLite only: WAL journal, how long a writer waits for the lock, fsync level and page cache
+    SQLITE_WAL = os.environ.get('SQLITE_WAL', 'true').lower() in ('1', 'true', 'yes')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 30000))
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64000))
+
     # Store Manager's email (recipient of alerts)
     STORE_MANAGER_EMAIL = os.environ.get('STORE_MANAGER_EMAIL')
 
     # API Keys for AI and Search
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
     SERPER_API_KEY = os.environ.get('SERPER_API_KEY')
+    # 'gemini' for the real services, 'stub' for offline fakes (tests, benchmarks)
+    AI_BACKEND = os.environ.get('AI_BACKEND', 'gemini')
+    GEMINI_MODEL = os.environ.get('GEMINI_MODEL', 'gemini-pro')
+    GEMINI_TIMEOUT = float(os.environ.get('GEMINI_TIMEOUT', 30))
+    SERPER_TIMEOUT = float(os.environ.get('SERPER_TIMEOUT', 10))
+    HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 10))
+    # Chatbot web-search tool: cached observations, trimmed to the top results (see app/search_tool.py)
+    SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', 3600))
+    SEARCH_CACHE_SIZE = int(os.environ.get('SEARCH_CACHE_SIZE', 512))
+    SEARCH_TOP_K = int(os.environ.get('SEARCH_TOP_K', 5))
+    SEARCH_SNIPPET_CHARS = int(os.environ.get('SEARCH_SNIPPET_CHARS', 300))
+
+    # Background chatbot jobs (see app/chat_jobs.py)
+    CHAT_WORKERS = int(os.environ.get('CHAT_WORKERS', 4))
+    CHAT_ANSWER_TTL = int(os.environ.get('CHAT_ANSWER_TTL', 120))
+    CHAT_JOB_TIMEOUT = int(os.environ.get('CHAT_JOB_TIMEOUT', 180))
+    CHAT_JOB_RETENTION_HOURS = int(os.environ.get('CHAT_JOB_RETENTION_HOURS', 24))
+    # Stream answers over Server-Sent Events to clients that ask for text/event-stream
+    CHAT_STREAMING = os.environ.get('CHAT_STREAMING', 'true').lower() in ('1', 'true', 'yes')
     
     # Email Configuration using SendGrid
     SENDGRID_API_KEY = os.environ.get('SENDGRID_API_KEY')
-    SENDER_EMAIL = os.environ.get('SENDER_EMAIL')
\ No newline at end of file
+    SENDER_EMAIL = os.environ.get('SENDER_EMAIL')
+    # 'sendgrid', 'console' (print) or 'memory' (a local fake sink, for tests and benchmarks)
+    MAIL_BACKEND = os.environ.get('MAIL_BACKEND', 'sendgrid')
+
+    # Notification outbox (see app/notifications.py)
+    NOTIFY_DRAIN_SECONDS = int(os.environ.get('NOTIFY_DRAIN_SECONDS', 30))
+    NOTIFY_BATCH_SIZE = int(os.environ.get('NOTIFY_BATCH_SIZE', 50))
+    NOTIFY_MAX_ATTEMPTS = int(os.environ.get('NOTIFY_MAX_ATTEMPTS', 6))
+    NOTIFY_BACKOFF_SECONDS = int(os.environ.get('NOTIFY_BACKOFF_SECONDS', 60))
+    NOTIFY_BACKOFF_MAX_SECONDS = int(os.environ.get('NOTIFY_BACKOFF_MAX_SECONDS', 3600))
+    NOTIFY_SENDING_TIMEOUT = int(os.environ.get('NOTIFY_SENDING_TIMEOUT', 300))
+    NOTIFY_RETENTION_DAYS = int(os.environ.get('NOTIFY_RETENTION_DAYS', 30))
+
+    # Carbon-footprint cache (see app/carbon.py)
+    CARBON_CACHE_TTL_HOURS = int(os.environ.get('CARBON_CACHE_TTL_HOURS', 24 * 30))
+    CARBON_NEGATIVE_TTL_HOURS = int(os.environ.get('CARBON_NEGATIVE_TTL_HOURS', 24))
+    CARBON_FAILURE_TTL_SECONDS = int(os.environ.get('CARBON_FAILURE_TTL_SECONDS', 300))  # after an outage or timeout, in memory only
+    CARBON_CACHE_SIZE = int(os.environ.get('CARBON_CACHE_SIZE', 1024))
+    CARBON_LOOKUP_CONCURRENCY = int(os.environ.get('CARBON_LOOKUP_CONCURRENCY', 8))
+    CARBON_LOOKUP_TIMEOUT = float(os.environ.get('CARBON_LOOKUP_TIMEOUT', 15))
+    CARBON_LOOKUP_RETRIES = int(os.environ.get('CARBON_LOOKUP_RETRIES', 2))
+    CARBON_LOOKUP_BACKOFF = float(os.environ.get('CARBON_LOOKUP_BACKOFF', 0.5))
+
+    # Stock intake (see app/stock.py)
+    STOCK_INTAKE_CHUNK_SIZE = int(os.environ.get('STOCK_INTAKE_CHUNK_SIZE', 5000))
+    STOCK_INTAKE_MAX_UNITS = int(os.environ.get('STOCK_INTAKE_MAX_UNITS', 100000))
+
+    # Sold items older than this are moved to inventory_item_archive by `flask archive-sold` (see app/archive.py)
+    ARCHIVE_SOLD_AFTER_DAYS = int(os.environ.get('ARCHIVE_SOLD_AFTER_DAYS', 90))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 5000))
+
+    # RFID tag allocation (see app/tags.py): give every host its own id to rule out tag collisions across hosts
+    RFID_HOST_ID = int(os.environ['RFID_HOST_ID']) if os.environ.get('RFID_HOST_ID') else None
+
+    # Sales terminal (see app/sales.py)
+    SALES_BATCH_MAX_TAGS = int(os.environ.get('SALES_BATCH_MAX_TAGS', 500))
+
+    # Rows fetched per batch by the streaming CSV export
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+    # Rows per page on the Full Inventory list
+    FULL_INVENTORY_PAGE_SIZE = int(os.environ.get('FULL_INVENTORY_PAGE_SIZE', 50))
+
+    # Analytics CSV/Feather files (loaded lazily on first use, reloaded when they change)
+    DATA_DIR = os.environ.get('DATA_DIR') or basedir
+    DATA_CHECK_INTERVAL = float(os.environ.get('DATA_CHECK_INTERVAL', 5))
+
+    # Max (product, expiry date) batches included in the chatbot's inventory context
+    CHATBOT_CONTEXT_MAX_ROWS = int(os.environ.get('CHATBOT_CONTEXT_MAX_ROWS', 40))
+    # Seconds a built inventory context is reused after stock changes (every sale changes it); 0 rebuilds on every change
+    CHATBOT_CONTEXT_MAX_AGE = int(os.environ.get('CHATBOT_CONTEXT_MAX_AGE', 10))
+
+    # Logging and instrumentation (see app/instrumentation.py). LOG_FORMAT: 'json' or 'text'.
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+    # Requests slower than this are logged as warnings (0 disables)
+    REQUEST_SLOW_MS = int(os.environ.get('REQUEST_SLOW_MS', 1000))
+    # A request sending the same SQL statement more than this many times is flagged as an N+1 (0 disables)
+    SQL_REPEAT_THRESHOLD = int(os.environ.get('SQL_REPEAT_THRESHOLD', 10))
+    # /metrics in the Prometheus text format; when METRICS_TOKEN is set it must be sent as a Bearer token
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Scheduled jobs (see app/scheduler.py). 'leader': only the process holding SCHEDULER_LOCK_FILE
+    # runs them; 'all': every process does; 'off': none does (run worker.py instead).
+    SCHEDULER_MODE = os.environ.get('SCHEDULER_MODE', 'leader')
+    SCHEDULER_LOCK_FILE = os.environ.get('SCHEDULER_LOCK_FILE') or os.path.join(tempfile.gettempdir(), 'green-inventory-scheduler.lock')
+    SCHEDULER_INTERVAL_MINUTES = int(os.environ.get('SCHEDULER_INTERVAL_MINUTES', 60))
+    SCHEDULER_STALE_MINUTES = int(os.environ.get('SCHEDULER_STALE_MINUTES', 30))
+    # The daily expiry alert is sent on the first check at or after this hour (server local time)
+    EXPIRY_ALERT_HOUR = int(os.environ.get('EXPIRY_ALERT_HOUR', 7))
+
+    # Expiry engine (see app/expiry.py): days-left buckets shown on the dashboard and in the alerts
+    EXPIRY_HORIZONS = [int(days) for days in os.environ.get('EXPIRY_HORIZONS', '0,1,2').split(',')]
+    # Alert recipient per location, e.g. "Aisle 1=ann@store.com;Cold Room=bob@store.com".
+    # Locations not listed here are reported to STORE_MANAGER_EMAIL.
+    LOCATION_MANAGERS = {location.strip(): email.strip() for location, email in
+                         (pair.split('=', 1) for pair in os.environ.get('LOCATION_MANAGERS', '').split(';') if '=' in pair)}
@@ -1,51 +1,229 @@
 # generate_data.py
-import pandas as pd
+# Synthetic data for the analytics CSVs and the inventory tables, sized for load tests.
+#
+#   python generate_data.py                                   # the original small dataset
+#   python generate_data.py --transactions 10000000 --format both --seed 7
+#   python generate_data.py --skip-files --seed-db --inventory-items 1000000 --locations 50
+#
+# Everything is drawn with NumPy from one seeded generator, so a given set of arguments always
+# produces the same data. Transactions are generated and written chunk by chunk, so memory stays
+# flat whatever --transactions is.
+import argparse
+import os
 import numpy as np
+import pandas as pd
 from faker import Faker
-import random
-from datetime import datetime, timedelta
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+except ImportError:  # Only needed for --format feather/both.
+    pa = None
+
+PRODUCT_NAMES = ['Organic Milk 1L', 'Cheddar Cheese 250g', 'Sourdough Bread', 'Free-Range Eggs (12)', 'Granny Smith Apples', 'Chicken Breast 500g', 'Basmati Rice 1kg', 'Organic Tomatoes', 'Avocado', 'Dark Chocolate Bar']
+CATEGORIES = ['Dairy', 'Bakery', 'Produce', 'Meat', 'Pantry', 'Snacks']
+# Typical shelf life per category, in days (for the seeded inventory's expiry dates)
+SHELF_LIFE_DAYS = {'Dairy': 10, 'Bakery': 4, 'Produce': 7, 'Meat': 5, 'Pantry': 365, 'Snacks': 180}
+GENDERS = ['Male', 'Female', 'Other']
+NAME_POOL_SIZE = 1000
 
-fake = Faker()
 
-# --- Configuration ---
-NUM_CUSTOMERS = 200
-NUM_PRODUCTS = 50
-NUM_TRANSACTIONS = 5000
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic products, customers and transactions.")
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--products', type=int, default=50)
+    parser.add_argument('--transactions', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=365, help='Transactions span this many days back from --end-date.')
+    parser.add_argument('--end-date', type=datetime.fromisoformat, default=None, help='Latest transaction date (default: now).')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for a reproducible dataset.')
+    parser.add_argument('--out-dir', default='.')
+    parser.add_argument('--format', choices=['csv', 'feather', 'both'], default='csv')
+    parser.add_argument('--chunk-size', type=int, default=1_000_000, help='Transactions generated and written per chunk.')
+    parser.add_argument('--skip-files', action='store_true', help="Don't write the analytics files.")
+    parser.add_argument('--seed-db', action='store_true', help='Also insert product types and inventory items into the app database.')
+    parser.add_argument('--inventory-items', type=int, default=10_000)
+    parser.add_argument('--locations', type=int, default=10)
+    parser.add_argument('--sold-fraction', type=float, default=0.3)
+    return parser.parse_args(argv)
+
 
 # --- Generate Products ---
-product_names = ['Organic Milk 1L', 'Cheddar Cheese 250g', 'Sourdough Bread', 'Free-Range Eggs (12)', 'Granny Smith Apples', 'Chicken Breast 500g', 'Basmati Rice 1kg', 'Organic Tomatoes', 'Avocado', 'Dark Chocolate Bar']
-products = {
-    'ProductID': range(1, NUM_PRODUCTS + 1),
-    'ProductName': [f"{random.choice(product_names)} v{i}" for i in range(1, NUM_PRODUCTS + 1)],
-    'Category': [random.choice(['Dairy', 'Bakery', 'Produce', 'Meat', 'Pantry', 'Snacks']) for _ in range(NUM_PRODUCTS)],
-    'CostPrice': np.round(np.random.uniform(1, 15, NUM_PRODUCTS), 2),
-    'SellingPrice': np.round(np.random.uniform(2, 30, NUM_PRODUCTS), 2)
-}
-products_df = pd.DataFrame(products)
+def generate_products(rng, count):
+    ids = np.arange(1, count + 1, dtype='int32')
+    base_names = np.array(PRODUCT_NAMES)[rng.integers(0, len(PRODUCT_NAMES), count)]
+    cost = rng.uniform(1, 15, count)
+    return pd.DataFrame({
+        'ProductID': ids,
+        'ProductName': pd.Categorical(np.char.add(np.char.add(base_names, ' v'), ids.astype(str))),
+        'Category': pd.Categorical(np.array(CATEGORIES)[rng.integers(0, len(CATEGORIES), count)], categories=CATEGORIES),
+        'CostPrice': np.round(cost, 2).astype('float32'),
+        'SellingPrice': np.round(cost * rng.uniform(1.1, 2.0, count), 2).astype('float32'),
+    })
+
 
 # --- Generate Customers ---
-customers = {
-    'CustomerID': range(1, NUM_CUSTOMERS + 1),
-    'Name': [fake.name() for _ in range(NUM_CUSTOMERS)],
-    'Age': np.random.randint(18, 70, NUM_CUSTOMERS),
-    'Gender': [random.choice(['Male', 'Female', 'Other']) for _ in range(NUM_CUSTOMERS)],
-    'JoinDate': [fake.date_this_decade() for _ in range(NUM_CUSTOMERS)]
-}
-customers_df = pd.DataFrame(customers)
+def generate_customers(rng, count, seed, end_date):
+    # Faker only fills small name pools; the customers are drawn from them with NumPy.
+    fake = Faker()
+    fake.seed_instance(seed)
+    first_names = np.array([fake.first_name() for _ in range(NAME_POOL_SIZE)])
+    last_names = np.array([fake.last_name() for _ in range(NAME_POOL_SIZE)])
+    names = np.char.add(np.char.add(first_names[rng.integers(0, NAME_POOL_SIZE, count)], ' '), last_names[rng.integers(0, NAME_POOL_SIZE, count)])
+    decade_start = np.datetime64(f"{end_date.year - end_date.year % 10}-01-01")
+    span = max((np.datetime64(end_date.date()) - decade_start).astype(int), 1)
+    return pd.DataFrame({
+        'CustomerID': np.arange(1, count + 1, dtype='int32'),
+        'Name': pd.array(names, dtype='string'),
+        'Age': rng.integers(18, 70, count).astype('int16'),
+        'Gender': pd.Categorical(np.array(GENDERS)[rng.integers(0, len(GENDERS), count)], categories=GENDERS),
+        'JoinDate': (decade_start + rng.integers(0, span, count).astype('timedelta64[D]')).astype('datetime64[ns]'),
+    })
+
 
 # --- Generate Transactions ---
-transactions = {
-    'TransactionID': range(1, NUM_TRANSACTIONS + 1),
-    'CustomerID': np.random.choice(customers['CustomerID'], NUM_TRANSACTIONS),
-    'ProductID': np.random.choice(products['ProductID'], NUM_TRANSACTIONS),
-    'Quantity': np.random.randint(1, 5, NUM_TRANSACTIONS),
-    'TransactionDate': [datetime.now() - timedelta(days=random.randint(0, 365)) for _ in range(NUM_TRANSACTIONS)]
-}
-transactions_df = pd.DataFrame(transactions)
-
-# --- Save to CSV ---
-products_df.to_csv('products.csv', index=False)
-customers_df.to_csv('customers.csv', index=False)
-transactions_df.to_csv('transactions.csv', index=False)
-
-print(f"Successfully generated: products.csv, customers.csv, transactions.csv")
\ No newline at end of file
+def day_weights(end_date, days):
+    """Relative sales volume for each of the `days` days before end_date: a yearly wave peaking in
+    December, busier weekends and a slight upward trend over the period."""
+    dates = pd.date_range(end=end_date.date(), periods=days, freq='D')
+    yearly = 1 + 0.35 * np.cos(2 * np.pi * (dates.dayofyear.to_numpy() - 355) / 365.25)
+    weekly = np.where(dates.dayofweek.to_numpy() >= 5, 1.3, 1.0)
+    trend = np.linspace(0.9, 1.1, days)
+    weights = yearly * weekly * trend
+    return dates.to_numpy(dtype='datetime64[ns]'), weights / weights.sum()
+
+
+def product_popularity(rng, count):
+    # Zipf-like: a few best sellers and a long tail of slow movers, in shuffled product order.
+    weights = 1 / np.arange(1, count + 1) ** 1.1
+    return rng.permutation(weights / weights.sum())
+
+
+def generate_transaction_chunks(rng, count, customers, products, end_date, days, chunk_size):
+    dates, date_p = day_weights(end_date, days)
+    popularity = product_popularity(rng, products)
+    for start in range(0, count, chunk_size):
+        size = min(chunk_size, count - start)
+        seconds = rng.integers(8 * 3600, 22 * 3600, size).astype('timedelta64[s]')
+        yield pd.DataFrame({
+            'TransactionID': np.arange(start + 1, start + size + 1, dtype='int32'),
+            'CustomerID': rng.integers(1, customers + 1, size, dtype='int32'),
+            'ProductID': (rng.choice(products, size, p=popularity) + 1).astype('int32'),
+            'Quantity': rng.integers(1, 5, size).astype('int16'),
+            'TransactionDate': rng.choice(dates, size, p=date_p) + seconds,
+        })
+
+
+# --- Save to CSV / Feather ---
+class ChunkWriter:
+    """Appends DataFrame chunks to <name>.csv and/or <name>.feather (uncompressed Arrow IPC, which
+    the app memory-maps; see data_handler.convert_to_columnar)."""
+
+    def __init__(self, out_dir, name, fmt):
+        self.csv_path = os.path.join(out_dir, f"{name}.csv") if fmt in ('csv', 'both') else None
+        self.feather_path = os.path.join(out_dir, f"{name}.feather") if fmt in ('feather', 'both') else None
+        self._feather = None
+        self._first = True
+
+    def write(self, df):
+        if self.csv_path:
+            df.to_csv(self.csv_path, mode='w' if self._first else 'a', header=self._first, index=False, date_format='%Y-%m-%d %H:%M:%S')
+        if self.feather_path:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._feather is None: self._feather = pa.ipc.new_file(self.feather_path, table.schema)
+            self._feather.write_table(table)
+        self._first = False
+
+    def close(self):
+        if self._feather is not None: self._feather.close()
+
+    def paths(self):
+        return [path for path in (self.csv_path, self.feather_path) if path]
+
+
+def write_files(args, rng, end_date):
+    if args.format != 'csv' and pa is None: raise SystemExit("pyarrow is required for --format feather/both (pip install pyarrow).")
+    os.makedirs(args.out_dir, exist_ok=True)
+    products_df = generate_products(rng, args.products)
+    written = []
+    for name, chunks in (('products', [products_df]),
+                         ('customers', [generate_customers(rng, args.customers, args.seed, end_date)]),
+                         ('transactions', generate_transaction_chunks(rng, args.transactions, args.customers, args.products,
+                                                                      end_date, args.days, args.chunk_size))):
+        writer = ChunkWriter(args.out_dir, name, args.format)
+        rows = 0
+        for chunk in chunks:
+            writer.write(chunk)
+            rows += len(chunk)
+        writer.close()
+        written += [f"{os.path.basename(path)} ({rows:,} rows)" for path in writer.paths()]
+    print(f"Successfully generated: {', '.join(written)}")
+    return products_df
+
+
+# --- Seed the app database ---
+def seed_database(app, rng, products_df, end_date, count, locations, sold_fraction):
+    """Inserts the products as product types (existing names are reused) and `count` inventory
+    units spread over them by popularity, in chunked executemany inserts and one transaction that
+    also rebuilds the stock ledger."""
+    from app import db
+    from app.models import ProductType, InventoryItem
+    from app.tags import allocate_tags
+    from app.inventory_version import bump_inventory_version
+    from app.ledger import rebuild_ledger
+
+    with app.app_context():
+        names = products_df['ProductName'].astype(str).tolist()
+        prices = products_df['SellingPrice'].astype(float).round(2).tolist()
+        existing = dict(db.session.query(ProductType.name, ProductType.id).filter(ProductType.name.in_(names)).all())
+        new_types = [{'name': name, 'default_price': price} for name, price in zip(names, prices) if name not in existing]
+        if new_types: db.session.execute(ProductType.__table__.insert(), new_types)
+        type_ids = dict(db.session.query(ProductType.name, ProductType.id).filter(ProductType.name.in_(names)).all())
+
+        product_index = rng.choice(len(names), count, p=product_popularity(rng, len(names)))
+        today = np.datetime64(end_date.date())
+        stock_in = today - rng.integers(0, 30, count).astype('timedelta64[D]')
+        shelf_life = products_df['Category'].astype(str).map(SHELF_LIFE_DAYS).to_numpy()[product_index]
+        expiry = stock_in + np.maximum(1, np.round(shelf_life * rng.uniform(0.6, 1.4, count))).astype('timedelta64[D]')
+        sold = rng.random(count) < sold_fraction
+        sold_at = np.minimum(stock_in.astype('datetime64[s]') + rng.integers(0, 86400 * 5, count).astype('timedelta64[s]'),
+                             np.datetime64(end_date.replace(microsecond=0)))
+        location = np.char.add('Aisle ', rng.integers(1, locations + 1, count).astype(str))
+
+        order = np.argsort(product_index, kind='stable')
+        counts = np.bincount(product_index, minlength=len(names))
+        tags = np.empty(count, dtype=object)
+        tags[order] = [tag for i, n in enumerate(counts) if n for tag in allocate_tags(type_ids[names[i]], int(n))]
+
+        table = InventoryItem.__table__
+        chunk_size = app.config['STOCK_INTAKE_CHUNK_SIZE']
+        for start in range(0, count, chunk_size):
+            end = min(start + chunk_size, count)
+            rows = [{'unique_rfid_tag': tags[i], 'price': prices[product_index[i]], 'stock_in_date': stock_in[i].item(),
+                     'expiry_date': expiry[i].item(), 'location': location[i], 'is_sold': bool(sold[i]),
+                     'sold_date': sold_at[i].item() if sold[i] else None, 'product_type_id': type_ids[names[product_index[i]]]}
+                    for i in range(start, end)]
+            db.session.execute(table.insert(), rows)
+        rebuild_ledger()
+        bump_inventory_version()
+        db.session.commit()
+    print(f"Seeded the database: {len(new_types)} new product types, {count:,} inventory items ({int(sold.sum()):,} sold) in {locations} locations.")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = np.random.default_rng(args.seed)
+    end_date = args.end_date or datetime.now()
+    products_df = generate_products(np.random.default_rng(args.seed), args.products) if args.skip_files else write_files(args, rng, end_date)
+    if args.seed_db:
+        from app import create_app
+        from config import Config
+
+        class SeedConfig(Config):
+            SCHEDULER_MODE = 'off'  # a one-shot CLI must not take the leader lock and run the scheduled jobs
+
+        seed_database(create_app(SeedConfig), np.random.default_rng(None if args.seed is None else args.seed + 1), products_df, end_date,
+                      args.inventory_items, args.locations, args.sold_fraction)
+
+
+if __name__ == '__main__':
+    main()
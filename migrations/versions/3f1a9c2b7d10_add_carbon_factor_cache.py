@@ -0,0 +1,29 @@
+"""Add carbon_factor cache table
+
+Revision ID: 3f1a9c2b7d10
+Revises: c056ae3cec5d
+Create Date: 2026-10-18 09:12:05.114210
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1a9c2b7d10'
+down_revision = 'c056ae3cec5d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('carbon_factor',
+    sa.Column('name_key', sa.String(length=100), nullable=False),
+    sa.Column('kg_co2e', sa.Float(), nullable=True),
+    sa.Column('fetched_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name_key')
+    )
+
+
+def downgrade():
+    op.drop_table('carbon_factor')
@@ -0,0 +1,29 @@
+"""Add inventory_counter table for the inventory version
+
+Revision ID: 5d7c0e3f9a21
+Revises: 8b2e4d6a1c93
+Create Date: 2026-10-18 11:04:18.902117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d7c0e3f9a21'
+down_revision = '8b2e4d6a1c93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    counters = op.create_table('inventory_counter',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(counters, [{'name': 'inventory', 'value': 0}])
+
+
+def downgrade():
+    op.drop_table('inventory_counter')
@@ -0,0 +1,31 @@
+"""Index the hot inventory_item predicates (is_sold, expiry_date, product_type_id)
+
+Revision ID: 8b2e4d6a1c93
+Revises: 3f1a9c2b7d10
+Create Date: 2026-10-18 10:02:41.530812
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d6a1c93'
+down_revision = '3f1a9c2b7d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Dashboard window and daily alert: unsold items by expiry date, covering the grouped columns.
+    op.create_index('ix_inventory_item_unsold_expiry', 'inventory_item', ['is_sold', 'expiry_date', 'product_type_id', 'location'], unique=False)
+    # CSV export, chatbot summary and product deletes: unsold items by product type, then expiry.
+    op.create_index('ix_inventory_item_unsold_product', 'inventory_item', ['is_sold', 'product_type_id', 'expiry_date'], unique=False)
+    # Dashboard totals: count and sum(price) of unsold items straight from the index.
+    op.create_index('ix_inventory_item_unsold_price', 'inventory_item', ['is_sold', 'price'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_inventory_item_unsold_price', table_name='inventory_item')
+    op.drop_index('ix_inventory_item_unsold_product', table_name='inventory_item')
+    op.drop_index('ix_inventory_item_unsold_expiry', table_name='inventory_item')
@@ -0,0 +1,37 @@
+"""Add chat_job table for background chatbot answers
+
+Revision ID: a41f6b8e2c57
+Revises: 5d7c0e3f9a21
+Create Date: 2026-10-18 11:31:52.640318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41f6b8e2c57'
+down_revision = '5d7c0e3f9a21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('chat_job',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('question_key', sa.String(length=64), nullable=False),
+    sa.Column('question', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('answer', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_chat_job_question_key', 'chat_job', ['question_key'], unique=False)
+    op.create_index('ix_chat_job_created_at', 'chat_job', ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_chat_job_created_at', table_name='chat_job')
+    op.drop_index('ix_chat_job_question_key', table_name='chat_job')
+    op.drop_table('chat_job')
@@ -0,0 +1,63 @@
+"""Add stock ledger and sold-item archive
+
+Revision ID: b9d4e2f7a613
+Revises: f3b8c1d5e920
+Create Date: 2026-10-18 17:05:12.418330
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9d4e2f7a613'
+down_revision = 'f3b8c1d5e920'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stock_ledger',
+    sa.Column('product_type_id', sa.Integer(), nullable=False),
+    sa.Column('location', sa.String(length=120), nullable=False),
+    sa.Column('expiry_date', sa.Date(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['product_type_id'], ['product_type.id'], ),
+    sa.PrimaryKeyConstraint('product_type_id', 'location', 'expiry_date')
+    )
+    op.create_index('ix_stock_ledger_expiry', 'stock_ledger', ['expiry_date', 'product_type_id', 'location', 'units'], unique=False)
+    # Book the stock already on hand.
+    op.execute(
+        "INSERT INTO stock_ledger (product_type_id, location, expiry_date, units, value) "
+        "SELECT product_type_id, COALESCE(location, ''), expiry_date, COUNT(id), SUM(price) FROM inventory_item "
+        "WHERE is_sold = false GROUP BY product_type_id, COALESCE(location, ''), expiry_date"
+    )
+
+    op.create_table('inventory_item_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('unique_rfid_tag', sa.String(length=100), nullable=False),
+    sa.Column('price', sa.Float(), nullable=False),
+    sa.Column('stock_in_date', sa.Date(), nullable=False),
+    sa.Column('expiry_date', sa.Date(), nullable=False),
+    sa.Column('location', sa.String(length=120), nullable=True),
+    sa.Column('sold_date', sa.DateTime(), nullable=True),
+    sa.Column('product_type_id', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('unique_rfid_tag')
+    )
+    op.create_index('ix_inventory_item_archive_sold_date', 'inventory_item_archive', ['sold_date'], unique=False)
+
+    # Expiry scans and stock totals now read the ledger; every sale no longer maintains these.
+    op.drop_index('ix_inventory_item_unsold_price', table_name='inventory_item')
+    op.drop_index('ix_inventory_item_unsold_expiry', table_name='inventory_item')
+
+
+def downgrade():
+    op.create_index('ix_inventory_item_unsold_expiry', 'inventory_item', ['is_sold', 'expiry_date', 'product_type_id', 'location'], unique=False)
+    op.create_index('ix_inventory_item_unsold_price', 'inventory_item', ['is_sold', 'price'], unique=False)
+    op.drop_index('ix_inventory_item_archive_sold_date', table_name='inventory_item_archive')
+    op.drop_table('inventory_item_archive')
+    op.drop_index('ix_stock_ledger_expiry', table_name='stock_ledger')
+    op.drop_table('stock_ledger')
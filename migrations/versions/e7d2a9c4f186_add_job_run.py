@@ -0,0 +1,32 @@
+"""Add job_run table for idempotent scheduled jobs
+
+Revision ID: e7d2a9c4f186
+Revises: a41f6b8e2c57
+Create Date: 2026-10-18 14:02:17.418205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7d2a9c4f186'
+down_revision = 'a41f6b8e2c57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job_run',
+    sa.Column('job_name', sa.String(length=50), nullable=False),
+    sa.Column('run_key', sa.String(length=50), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('detail', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('job_name', 'run_key')
+    )
+
+
+def downgrade():
+    op.drop_table('job_run')
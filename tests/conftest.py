@@ -0,0 +1,51 @@
+# tests/conftest.py
+# An app on a fresh SQLite file per test (a file, not :memory:, so other processes and threads can
+# share it), with the offline AI stub, the in-memory mail backend and no scheduler.
+
+from datetime import date, timedelta
+import pytest
+from config import Config
+from app import create_app, db
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.db')
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+        AI_BACKEND = 'stub'
+        MAIL_BACKEND = 'memory'
+        SCHEDULER_MODE = 'off'
+        DATA_DIR = str(tmp_path)
+        LOG_LEVEL = 'WARNING'
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def stock(app):
+    """stock(name, quantity, days_to_expiry=3, location='Aisle 1') receives units and returns their tags."""
+    from app.models import ProductType
+    from app.stock import receive_stock
+
+    def receive(name, quantity, days_to_expiry=3, location='Aisle 1'):
+        product = ProductType.query.filter_by(name=name).first()
+        if product is None:
+            product = ProductType(name=name, default_price=2.0)
+            db.session.add(product)
+            db.session.flush()
+        tags = receive_stock(product, quantity, date.today(), date.today() + timedelta(days=days_to_expiry), location)
+        db.session.commit()
+        return tags
+    return receive
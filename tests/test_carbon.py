@@ -0,0 +1,25 @@
+# tests/test_carbon.py
+from app import carbon
+
+
+class FailingModel:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        raise TimeoutError("deadline exceeded")
+
+
+def test_failed_lookups_are_not_retried_until_the_failure_ttl_expires(app):
+    app.config.update(CARBON_LOOKUP_RETRIES=1, CARBON_LOOKUP_BACKOFF=0)
+    model = FailingModel()
+    assert carbon.resolve_carbon_factors(['Outage Milk', 'Outage Bread'], model=model) == {'Outage Milk': None, 'Outage Bread': None}
+    assert model.calls == 4  # two products, one retry each
+    assert carbon.resolve_carbon_factors(['Outage Milk', 'Outage Bread'], model=model) == {'Outage Milk': None, 'Outage Bread': None}
+    assert model.calls == 4
+    # Nothing was persisted: once the memory entries expire the products are asked about again.
+    assert carbon.CarbonFactor.query.count() == 0
+    carbon._get_memory_cache().clear()
+    carbon.resolve_carbon_factors(['Outage Milk'], model=model)
+    assert model.calls == 6
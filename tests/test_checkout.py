@@ -0,0 +1,117 @@
+# tests/test_checkout.py
+import os
+import threading
+from datetime import date, timedelta
+import pytest
+from app import db, sales
+from app.ledger import check_ledger
+from app.models import InventoryItem, ProductType
+from app.sales import sell_items, sell_statement
+from app.stock import receive_stock
+
+
+def _statuses(results):
+    return [(result['tag'], result['status']) for result in results]
+
+
+def test_checkout_reports_every_scan_in_order(client, stock):
+    milk = stock('Milk', 3)
+    response = client.post('/api/sales/checkout', json={'tags': [milk[0], milk[0], 'nope', milk[1], 'nope', milk[0]]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['sold'] == 2
+    assert _statuses(body['results']) == [(milk[0], 'sold'), (milk[0], 'duplicate'), ('nope', 'unknown'),
+                                          (milk[1], 'sold'), ('nope', 'duplicate'), (milk[0], 'duplicate')]
+    assert [result['product'] for result in body['results']] == ['Milk', 'Milk', None, 'Milk', None, 'Milk']
+
+
+def test_already_sold_tags_are_reported_and_not_sold_again(app, stock):
+    milk = stock('Milk', 3)
+    sell_items([milk[0]])
+    results = sell_items([milk[0], milk[0], milk[2]])
+    assert _statuses(results) == [(milk[0], 'already_sold'), (milk[0], 'duplicate'), (milk[2], 'sold')]
+    assert db.session.query(db.func.count(InventoryItem.id)).filter(InventoryItem.is_sold == True).scalar() == 2
+    assert check_ledger() == []
+
+
+def test_checkout_rejects_empty_and_oversized_baskets(app, client, stock):
+    assert client.post('/api/sales/checkout', json={'tags': ['  ', '']}).status_code == 400
+    assert client.post('/api/sales/checkout', json=['not', 'an', 'object']).status_code == 400
+    tag = stock('Milk', 1)[0]
+    # The limit counts scans, repeats included.
+    too_many = [tag] * (app.config['SALES_BATCH_MAX_TAGS'] + 1)
+    assert client.post('/api/sales/checkout', json={'tags': too_many}).status_code == 400
+
+
+def test_concurrent_lanes_never_sell_a_tag_twice(app, stock):
+    tags = stock('Milk', 300)
+    outcomes, errors = [], []
+
+    def lane(basket):
+        try:
+            with app.app_context():
+                outcomes.append(sell_items(basket))
+        except Exception as e:
+            errors.append(e)
+
+    # Every lane scans the same tags, in different orders.
+    lanes = [threading.Thread(target=lane, args=(tags[i::2] + tags[:i],)) for i in range(6)]
+    for thread in lanes: thread.start()
+    for thread in lanes: thread.join()
+    assert errors == []
+    sold = [result['tag'] for results in outcomes for result in results if result['status'] == 'sold']
+    assert len(sold) == len(set(sold)) == 300
+    assert check_ledger() == []
+
+
+def test_postgres_checkout_skips_locked_rows():
+    from sqlalchemy.dialects import postgresql
+    sql = str(sell_statement(['a', 'b'], skip_locked=True).compile(dialect=postgresql.dialect()))
+    assert 'FOR UPDATE SKIP LOCKED' in sql
+    assert 'RETURNING' in sql
+    assert 'FOR UPDATE' not in str(sell_statement(['a', 'b'], skip_locked=False).compile(dialect=postgresql.dialect()))
+
+
+def test_rows_locked_by_another_lane_are_busy_not_already_sold(app, stock, monkeypatch):
+    # What SKIP LOCKED does on Postgres: the UPDATE leaves out a row another lane has locked.
+    milk = stock('Milk', 3)
+    monkeypatch.setattr(sales, 'sell_statement', lambda basket, skip_locked: sell_statement(
+        [tag for tag in basket if tag != milk[1]], skip_locked))
+    results = sales.sell_items(milk)
+    assert _statuses(results) == [(milk[0], 'sold'), (milk[1], 'busy'), (milk[2], 'sold')]
+    assert results[1]['product'] == 'Milk'
+    assert check_ledger() == []
+
+
+@pytest.mark.skipif(not os.environ.get('TEST_POSTGRES_URL'), reason='set TEST_POSTGRES_URL to an empty Postgres database')
+def test_postgres_lane_holding_a_row_lock(tmp_path):
+    from config import Config
+    from app import create_app
+
+    class PostgresConfig(Config):
+        SQLALCHEMY_DATABASE_URI = os.environ['TEST_POSTGRES_URL']
+        TESTING = True
+        AI_BACKEND = 'stub'
+        MAIL_BACKEND = 'memory'
+        SCHEDULER_MODE = 'off'
+        DATA_DIR = str(tmp_path)
+        LOG_LEVEL = 'WARNING'
+
+    app = create_app(PostgresConfig)
+    with app.app_context():
+        db.create_all()
+        try:
+            product = ProductType(name='Milk', default_price=2.0)
+            db.session.add(product)
+            db.session.flush()
+            tags = receive_stock(product, 2, date.today(), date.today() + timedelta(days=3), 'Aisle 1')
+            db.session.commit()
+            items = InventoryItem.__table__
+            with db.engine.connect() as other_lane:
+                other_lane.execute(db.select(items.c.id).where(items.c.unique_rfid_tag == tags[0]).with_for_update())
+                assert _statuses(sales.sell_items(tags)) == [(tags[0], 'busy'), (tags[1], 'sold')]
+                other_lane.rollback()
+            assert _statuses(sales.sell_items([tags[0]])) == [(tags[0], 'sold')]
+        finally:
+            db.session.remove()
+            db.drop_all()
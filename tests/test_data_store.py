@@ -0,0 +1,131 @@
+# tests/test_data_store.py
+import os
+import threading
+import time
+import pandas as pd
+import pytest
+from app.data_handler import DataStore
+
+
+def _write_datasets(data_dir, transactions):
+    pd.DataFrame({'ProductID': [1, 2], 'ProductName': ['Milk', 'Bread'], 'Category': ['Dairy', 'Bakery'],
+                  'CostPrice': [0.5, 1.0], 'SellingPrice': [1.0, 2.0]}).to_csv(data_dir / 'products.csv', index=False)
+    pd.DataFrame({'CustomerID': [1, 2], 'Name': ['A', 'B'], 'Age': [25, 50], 'Gender': ['Female', 'Male'],
+                  'JoinDate': ['2024-01-01', '2024-02-01']}).to_csv(data_dir / 'customers.csv', index=False)
+    _write_transactions(data_dir / 'transactions.csv', transactions)
+
+
+def _write_transactions(path, rows, mode='w'):
+    pd.DataFrame(rows, columns=['TransactionID', 'CustomerID', 'ProductID', 'Quantity', 'TransactionDate']) \
+        .to_csv(path, index=False, mode=mode, header=mode == 'w')
+
+
+def _touch_forward(path):
+    # Make sure the change is visible to a signature check even on coarse-mtime filesystems.
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    _write_datasets(tmp_path, [(1, 1, 1, 3, '2025-01-01'), (2, 2, 2, 1, '2025-01-02')])
+    return tmp_path
+
+
+def _wait_for_reloads():
+    for thread in threading.enumerate():
+        if thread.name == 'data-reload': thread.join(10)
+
+
+def test_concurrent_readers_start_one_reload(data_dir):
+    store = DataStore(str(data_dir), check_interval=0)
+    store.snapshot()
+    _write_transactions(data_dir / 'transactions.csv', [(1, 1, 1, 3, '2025-01-01')])
+    _touch_forward(data_dir / 'transactions.csv')
+    signature = store._signature
+
+    def slow_signature():  # widens the window between a reader's check and its reload
+        time.sleep(0.01)
+        return signature()
+    store._signature = slow_signature
+    barrier = threading.Barrier(16)
+
+    def reader():
+        barrier.wait()
+        store.snapshot()
+
+    readers = [threading.Thread(target=reader) for _ in range(16)]
+    for thread in readers: thread.start()
+    for thread in readers: thread.join()
+    _wait_for_reloads()
+    assert store.metrics['loads'] == 2
+    assert store.snapshot().insights.units_by_product.to_dict() == {1: 3}
+
+
+def _reload_now(store):
+    store._next_check = 0
+    store.snapshot()
+    _wait_for_reloads()
+    return store.snapshot()
+
+
+def _same_insights(snapshot, data_dir):
+    full = DataStore(str(data_dir)).reload()
+    return snapshot.insights.sales_text() == full.insights.sales_text() and \
+        snapshot.insights.units_by_product.to_dict() == full.insights.units_by_product.to_dict()
+
+
+def test_appended_csv_rows_are_folded_in_without_a_reload(data_dir):
+    store = DataStore(str(data_dir), check_interval=3600)
+    before = store.snapshot()
+    _write_transactions(data_dir / 'transactions.csv', [(3, 1, 2, 4, '2025-01-03'), (4, 2, 1, 2, '2025-01-04')], mode='a')
+    after = _reload_now(store)
+    assert store.metrics['appends'] == 1 and store.metrics['appended_rows'] == 2
+    assert after is not before and before.insights.units_by_product.to_dict() == {1: 3, 2: 1}  # copy-on-write
+    assert after.insights.units_by_product.to_dict() == {1: 5, 2: 5}
+    assert len(after.get_transactions_df()) == 4
+    assert _same_insights(after, data_dir)
+
+
+def test_a_partly_written_line_waits_for_its_newline(data_dir):
+    store = DataStore(str(data_dir), check_interval=3600)
+    store.snapshot()
+    with open(data_dir / 'transactions.csv', 'a') as f: f.write('3,1,2,4,2025-')
+    assert _reload_now(store).insights.units_by_product.to_dict() == {1: 3, 2: 1}
+    with open(data_dir / 'transactions.csv', 'a') as f: f.write('01-03\n')
+    assert _reload_now(store).insights.units_by_product.to_dict() == {1: 3, 2: 5}
+    assert store.metrics['appends'] == 2 and store.metrics['loads'] == 3
+
+
+def test_any_other_change_rebuilds_the_snapshot(data_dir):
+    store = DataStore(str(data_dir), check_interval=3600)
+    store.snapshot()
+    # Longer, but an existing row changed too.
+    _write_transactions(data_dir / 'transactions.csv', [(1, 1, 1, 9, '2025-01-01'), (2, 2, 2, 1, '2025-01-02'),
+                                                        (3, 1, 2, 4, '2025-01-03')])
+    _touch_forward(data_dir / 'transactions.csv')
+    snapshot = _reload_now(store)
+    assert store.metrics['appends'] == 0
+    assert snapshot.insights.units_by_product.to_dict() == {1: 9, 2: 5}
+
+
+def test_appended_feather_rows_are_folded_in(data_dir):
+    pytest.importorskip('pyarrow')
+    from app.data_handler import convert_to_columnar
+    convert_to_columnar(str(data_dir))
+    store = DataStore(str(data_dir), check_interval=3600)
+    assert store.snapshot().transactions_source == 'feather'
+    _write_transactions(data_dir / 'transactions.csv', [(3, 1, 2, 4, '2025-01-03')], mode='a')
+    convert_to_columnar(str(data_dir))  # rewrites every Feather file: not an append
+    assert _reload_now(store).insights.units_by_product.to_dict() == {1: 3, 2: 5}
+    assert store.metrics['appends'] == 0
+
+    from app.data_handler import _read_csv
+    transactions = _read_csv(str(data_dir / 'transactions.csv'), 'transactions')
+    extra = pd.DataFrame([(4, 2, 1, 2, '2025-01-04')], columns=transactions.columns).astype({'TransactionDate': 'datetime64[ns]'})
+    pd.concat([transactions, extra], ignore_index=True).astype(transactions.dtypes.to_dict()) \
+        .to_feather(data_dir / 'transactions.feather', compression='uncompressed')
+    _touch_forward(data_dir / 'transactions.feather')
+    snapshot = _reload_now(store)
+    assert store.metrics['appends'] == 1 and store.metrics['appended_rows'] == 1
+    assert snapshot.insights.units_by_product.to_dict() == {1: 5, 2: 5}
@@ -0,0 +1,33 @@
+# tests/test_query_plans.py
+from datetime import date
+from app import db
+from app.queries import check_query_plans, plan_problems
+
+
+def test_plan_problems_flags_scans_is_sold_searches_and_sorts():
+    assert plan_problems('full_inventory', ['SCAN inventory_item']) == ['full scan of inventory_item']
+    assert plan_problems('dashboard.stock_totals', ['SEARCH inventory_item USING INDEX ix_is_sold (is_sold=?)']) == \
+        ['index search on is_sold alone']
+    assert plan_problems('full_inventory', ['SEARCH inventory_item USING INDEX ix_inventory_item_listing (is_sold=?)',
+                                            'USE TEMP B-TREE FOR ORDER BY']) == \
+        ['index search on is_sold alone', 'sorts instead of reading in index order']
+    # Only the queries that stream in index order must not sort.
+    assert plan_problems('chatbot.inventory_summary', ['SCAN stock_ledger', 'USE TEMP B-TREE FOR ORDER BY']) == []
+
+
+def test_plan_problems_accepts_index_searches():
+    assert plan_problems('full_inventory', ['SEARCH inventory_item USING INDEX ix_inventory_item_listing (is_sold=? AND product_name>?)']) == []
+
+
+def test_hot_queries_stay_on_an_index(app, stock):
+    for n, name in enumerate(['Milk', 'Bread', 'Eggs', 'Apples']):
+        for days in range(1, 6):
+            stock(name, 200, days_to_expiry=days, location=f'Aisle {n}')
+    tags = stock('Cheese', 500)
+    client = app.test_client()
+    client.post('/api/sales/checkout', json={'tags': tags[:400]})
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+
+    results = check_query_plans(date.today())
+    assert {name: problems for name, (plan, problems) in results.items() if problems} == {}
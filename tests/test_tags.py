@@ -0,0 +1,50 @@
+# tests/test_tags.py
+import multiprocessing
+import os
+import pytest
+from app import tags
+from app.tags import allocate_tags
+
+
+def _allocate(blocks, block_size, results):
+    allocated = []
+    for _ in range(blocks): allocated += allocate_tags(7, block_size)
+    results.put((os.getpid(), allocated))
+
+
+def _node(tag):
+    return tag.split('-')[2]
+
+
+def test_tags_within_a_process_are_unique():
+    allocated = [tag for _ in range(500) for tag in allocate_tags(1, 100)]
+    assert len(set(allocated)) == len(allocated) == 50_000
+
+
+def test_tags_are_unique_across_forked_processes():
+    # Forked like gunicorn workers: each child must re-roll the node it inherited.
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    children = [context.Process(target=_allocate, args=(200, 100, results)) for _ in range(6)]
+    for child in children: child.start()
+    allocated = [tag for _ in range(200) for tag in allocate_tags(7, 100)]
+    nodes = {_node(allocated[0])}
+    for _ in children:
+        _, child_tags = results.get(timeout=60)
+        nodes.add(_node(child_tags[0]))
+        allocated += child_tags
+    for child in children: child.join()
+    assert all(child.exitcode == 0 for child in children)
+    assert len(nodes) == 7
+    assert len(allocated) == 7 * 200 * 100
+    assert len(set(allocated)) == len(allocated)
+
+
+def test_configured_host_id_replaces_the_random_bits():
+    try:
+        tags.configure(0xabc)
+        assert _node(allocate_tags(1, 1)[0]) == f"{os.getpid():x}000abc"
+        with pytest.raises(ValueError):
+            tags.configure(1 << 24)
+    finally:
+        tags.configure(None)
@@ -0,0 +1,26 @@
+# worker.py
+# Standalone scheduler process (the `worker:` line in the Procfile). Runs the scheduled jobs in the
+# foreground, so the web workers can start with SCHEDULER_MODE=off and no scheduler threads.
+
+import logging
+from apscheduler.schedulers.blocking import BlockingScheduler
+from app import create_app
+from app.scheduler import add_jobs
+from config import Config
+
+
+# Under the app logger, so the line goes through the handler configure_logging sets up (LOG_FORMAT).
+log = logging.getLogger('app.worker')
+
+
+class WorkerConfig(Config):
+    SCHEDULER_MODE = 'off'  # this process runs the jobs itself, below
+
+
+app = create_app(WorkerConfig)
+
+if __name__ == '__main__':
+    scheduler = BlockingScheduler()
+    add_jobs(scheduler, app, run_now=True)
+    log.info("Scheduler worker started")
+    scheduler.start()